@@ -0,0 +1,89 @@
+"""
+Compares the list-based chart ingestion that process_chart_data replaced with
+the current vectorized one.
+
+    python -m benchmarks.bench_process_chart_data
+"""
+
+import copy
+import timeit
+
+import numpy as np
+import pandas as pd
+from src.functions import epoch_to_datetime_tz
+from src.util.GraphHandler import process_chart_data
+
+
+def legacy_process_chart_data(chart: dict) -> tuple:
+    result = chart.get("result").pop()
+    meta = result.get("meta")
+    tz = meta.get("exchangeTimezoneName")
+    timezone_short = meta.get("timezone")
+    symbol = meta.get("symbol")
+    currency = meta.get("currency")
+    timestamps = result.get("timestamp")
+    datetime_idx = epoch_to_datetime_tz(timestamps, tz=tz)
+    quote = result.get("indicators").get("quote").pop()
+    lows = quote.get("low")
+    highs = quote.get("high")
+    opens = quote.get("open")
+    closes = quote.get("close")
+    volumes = quote.get("volume")
+    data = zip(opens, closes, highs, lows, volumes)
+    df = pd.DataFrame(
+        data, index=datetime_idx, columns=["Open", "Close", "High", "Low", "Volume"]
+    )
+    return symbol, currency, timezone_short, df
+
+
+def build_chart(bars: int) -> dict:
+    rng = np.random.default_rng(0)
+    closes = (100 + rng.standard_normal(bars).cumsum()).tolist()
+    quote = {
+        "open": closes,
+        "close": closes,
+        "high": [c + 0.5 for c in closes],
+        "low": [c - 0.5 for c in closes],
+        "volume": rng.integers(1000, 5000, bars).tolist(),
+    }
+    # Yahoo leaves gaps in intraday series as nulls
+    for key in quote:
+        quote[key][::50] = [None] * len(quote[key][::50])
+    return {
+        "result": [
+            {
+                "meta": {
+                    "symbol": "GME",
+                    "currency": "USD",
+                    "exchangeTimezoneName": "America/New_York",
+                    "timezone": "EDT",
+                },
+                "timestamp": list(range(1609770600, 1609770600 + bars * 300, 300)),
+                "indicators": {"quote": [quote]},
+            }
+        ]
+    }
+
+
+def main():
+    for bars in (78, 2000, 20000):
+        chart = build_chart(bars=bars)
+        # the legacy path pops from the chart, so it gets a fresh copy each run
+        charts = [copy.deepcopy(chart) for _ in range(20)]
+        legacy = timeit.timeit(
+            lambda: legacy_process_chart_data(charts.pop()), number=20
+        )
+        vectorized = timeit.timeit(lambda: process_chart_data(chart), number=20)
+        vectorized_32 = timeit.timeit(
+            lambda: process_chart_data(chart, dtype=np.float32), number=20
+        )
+        print(
+            f"{bars:>6} bars: legacy {legacy / 20 * 1000:8.2f} ms, "
+            f"vectorized {vectorized / 20 * 1000:8.2f} ms, "
+            f"float32 {vectorized_32 / 20 * 1000:8.2f} ms "
+            f"({legacy / vectorized:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+"""
+Compares the mplfinance chart renderer with the fast collections renderer.
+
+    python -m benchmarks.bench_render
+"""
+
+import timeit
+
+from benchmarks.bench_process_chart_data import build_chart
+from src.util.GraphHandler import RENDERERS
+
+
+def main():
+    for data_range, bars in (("1d", 78), ("5d", 390), ("max", 2000)):
+        chart = build_chart(bars=bars)
+        timings = {}
+        for name, renderer in RENDERERS.items():
+            renderer(chart, data_range)
+            timings[name] = timeit.timeit(
+                lambda: renderer(chart, data_range), number=10
+            )
+        print(
+            f"{data_range:>4} {bars:>5} bars: "
+            + ", ".join(f"{name} {t / 10 * 1000:.1f} ms" for name, t in timings.items())
+            + f" ({timings['full'] / timings['fast']:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
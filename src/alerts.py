@@ -0,0 +1,107 @@
+"""
+Price alerts.
+
+Alerts live in the alerts table and, while the bot runs, in the AlertEngine's
+in-memory AlertBook. The direction is fixed when the alert is created: a
+threshold above the live price fires when the price rises to it, one below
+fires when the price drops to it.
+"""
+
+from typing import List
+from discord.ext import commands
+from src import marketdata
+from src.positions import get_symbol_id, get_user_or_create
+from src.util.AlertBook import ABOVE, BELOW, Alert
+import src.database as db
+
+MAX_ALERTS_PER_USER = 25
+
+
+class TooManyAlerts(commands.CommandError):
+    pass
+
+
+class AlertNotFound(commands.CommandError):
+    pass
+
+
+def _to_alert(row: db.Alerts, user_id: str, symbol: str) -> Alert:
+    return Alert(row.alert_id, str(user_id), symbol, row.direction, row.price)
+
+
+def _alerts_query(session):
+    return (
+        session.query(db.Alerts, db.Users.user_id, db.Symbols.symbol)
+        .join(db.Users, db.Users.id == db.Alerts.user_id)
+        .join(db.Symbols, db.Symbols.symbol_id == db.Alerts.symbol_id)
+    )
+
+
+def _create(
+    session, user_id: str, username: str, symbol: str, direction: str, price: float
+) -> Alert:
+    user = get_user_or_create(session, user_id=user_id, username=username)[0]
+    count = session.query(db.Alerts).filter_by(user_id=user.id).count()
+    if count >= MAX_ALERTS_PER_USER:
+        raise TooManyAlerts
+    row = db.Alerts(
+        user_id=user.id,
+        symbol_id=get_symbol_id(session, symbol),
+        direction=direction,
+        price=price,
+    )
+    session.add(row)
+    session.flush()
+    return _to_alert(row, user_id, symbol.upper())
+
+
+def load_alerts(session, user_id: str = None) -> List[Alert]:
+    """
+    :param user_id: discord id of the user whose alerts are loaded, None for
+    every active alert
+    """
+    query = _alerts_query(session)
+    if user_id is not None:
+        query = query.filter(db.Users.user_id == str(user_id))
+    return [
+        _to_alert(row, discord_id, symbol)
+        for row, discord_id, symbol in query.order_by(db.Alerts.alert_id)
+    ]
+
+
+def _cancel(session, user_id: str, alert_id: int):
+    row = (
+        _alerts_query(session)
+        .filter(db.Alerts.alert_id == alert_id, db.Users.user_id == str(user_id))
+        .one_or_none()
+    )
+    if row is None:
+        raise AlertNotFound
+    session.delete(row[0])
+
+
+def delete_alerts(session, alert_ids: List[int]):
+    session.query(db.Alerts).filter(db.Alerts.alert_id.in_(alert_ids)).delete(
+        synchronize_session=False
+    )
+
+
+async def create_alert(user_id: str, username: str, symbol: str, price: float):
+    """
+    :return: tuple of the new Alert, the live price and its currency
+    """
+    symbol = symbol.upper()
+    live, currency = await marketdata.get_live(symbol)
+    direction = ABOVE if price >= live else BELOW
+    alert = await db.run_in_session(
+        _create, user_id, username, symbol, direction, price
+    )
+    return alert, live, currency
+
+
+async def get_alerts(user_id: str) -> List[Alert]:
+    return await db.run_in_session(load_alerts, user_id=user_id)
+
+
+async def cancel_alert(user_id: str, alert_id: int):
+    await db.run_in_session(_cancel, user_id, alert_id)
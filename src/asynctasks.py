@@ -1,20 +1,365 @@
 from discord.ext import tasks
-from financelite import Stock
+from financelite import DataRequestException
 from datetime import datetime
 from pytz import timezone
+from typing import List
+from src import alerts, leaderboard, marketdata
+from src.util.AlertBook import ABOVE, Alert, AlertBook
+from src.util.Paginator import Paginator
+import src.database as db
+import asyncio
 import discord
+import os
+import time
 
 est = timezone("US/Eastern")
 
+LIVE_CHERRYPICKS = ["regularMarketPrice", "currency"]
+LIVE_REFRESH_OPEN = float(os.getenv("LIVE_REFRESH_OPEN", "15"))
+LIVE_REFRESH_EXTENDED = float(os.getenv("LIVE_REFRESH_EXTENDED", "60"))
+# boards still need expiring while markets are closed
+LIVE_REFRESH_CLOSED = float(os.getenv("LIVE_REFRESH_CLOSED", "300"))
+MOVERS_REFRESH_OPEN = float(os.getenv("MOVERS_REFRESH_OPEN", "120"))
+MOVERS_REFRESH_EXTENDED = float(os.getenv("MOVERS_REFRESH_EXTENDED", "600"))
+MOVERS_REFRESH_CLOSED = float(os.getenv("MOVERS_REFRESH_CLOSED", "21600"))
+LEADERBOARD_REFRESH_OPEN = float(os.getenv("LEADERBOARD_REFRESH_OPEN", "60"))
+LEADERBOARD_REFRESH_EXTENDED = float(os.getenv("LEADERBOARD_REFRESH_EXTENDED", "300"))
+LEADERBOARD_REFRESH_CLOSED = float(os.getenv("LEADERBOARD_REFRESH_CLOSED", "21600"))
+ALERT_REFRESH_OPEN = float(os.getenv("ALERT_REFRESH_OPEN", "15"))
+ALERT_REFRESH_EXTENDED = float(os.getenv("ALERT_REFRESH_EXTENDED", "60"))
+ALERT_REFRESH_CLOSED = float(os.getenv("ALERT_REFRESH_CLOSED", "1800"))
 
-@tasks.loop(seconds=15.0)
-async def start_live(message, tickers: list):
-    now = datetime.now(tz=est).strftime("%c")
-    prices = discord.Embed(
-        title=f"Live ticker data @ {now}", colour=discord.Colour.green()
-    )
-    for ticker in tickers:
-        live, currency = Stock(ticker).get_live()
-        prices.add_field(name=ticker.upper(), value=f"${live} {currency}")
 
-    await message.edit(embed=prices)
+class LiveBoard:
+    def __init__(self, message: discord.Message, tickers: List[str], expires: float):
+        self.message = message
+        self.tickers = tickers
+        self.expires = expires
+        self.values = None
+
+    def render(self) -> discord.Embed:
+        now = datetime.now(tz=est).strftime("%c")
+        prices = discord.Embed(
+            title=f"Live ticker data @ {now}", colour=discord.Colour.green()
+        )
+        for ticker, (live, currency) in zip(self.tickers, self.values):
+            prices.add_field(name=ticker, value=f"${live} {currency}")
+        return prices
+
+
+class LiveTicker:
+    """
+    Single refresh loop shared by every live ticker board.
+    Each refresh looks up the union of all subscribed symbols through the
+    batched quote cache and only edits the boards whose prices actually
+    changed; a symbol whose quote fails keeps its last value. The
+    loop ticks at the open-market rate but refreshes less often outside
+    regular hours, as the market session calls for.
+    """
+
+    def __init__(self, tick: float = LIVE_REFRESH_OPEN):
+        self.boards = {}
+        self._due = 0.0
+        self.refresh = tasks.loop(seconds=tick)(self._refresh)
+
+    async def subscribe(
+        self, message: discord.Message, tickers: List[str], duration: float = 3600
+    ):
+        """
+        attaches a message to the engine and renders it right away
+        :param message: message to keep updated
+        :param tickers: tickers shown on the board
+        :param duration: seconds before the board stops updating
+        """
+        board = LiveBoard(
+            message, [t.upper() for t in tickers], time.monotonic() + duration
+        )
+        quotes = await self._fetch(board.tickers)
+        missing = [t for t in board.tickers if t not in quotes]
+        if missing:
+            raise DataRequestException(",".join(missing))
+        self.boards[message.id] = board
+        await self._update(board, quotes)
+        if not self.refresh.is_running():
+            self.refresh.start()
+
+    def unsubscribe(self, message: discord.Message):
+        self.boards.pop(message.id, None)
+
+    def symbols(self) -> List[str]:
+        return list(dict.fromkeys(t for b in self.boards.values() for t in b.tickers))
+
+    async def _fetch(self, symbols: List[str]) -> dict:
+        """
+        :return: dict of symbol to price and currency, leaving out symbols
+        whose quote could not be fetched
+        """
+        quotes = await marketdata.get_quote_map(symbols, cherrypicks=LIVE_CHERRYPICKS)
+        return {
+            symbol: (quote.get("regularMarketPrice"), quote.get("currency"))
+            for symbol, quote in quotes.items()
+        }
+
+    async def _update(self, board: LiveBoard, quotes: dict):
+        # a symbol that failed this refresh keeps showing its last value
+        previous = board.values or (None,) * len(board.tickers)
+        values = tuple(quotes.get(t, p) for t, p in zip(board.tickers, previous))
+        if values == board.values:
+            return
+        board.values = values
+        try:
+            await board.message.edit(embed=board.render())
+        except discord.NotFound:
+            self.unsubscribe(board.message)
+
+    async def _refresh(self):
+        now = time.monotonic()
+        for board in [b for b in self.boards.values() if b.expires <= now]:
+            self.unsubscribe(board.message)
+        if not self.boards:
+            return self.refresh.stop()
+        if now < self._due:
+            return
+        self._due = now + marketdata.market_hours.pick(
+            LIVE_REFRESH_OPEN, LIVE_REFRESH_EXTENDED, LIVE_REFRESH_CLOSED
+        )
+        try:
+            quotes = await self._fetch(self.symbols())
+        # financelite's DataRequestException derives from BaseException
+        except (Exception, DataRequestException) as e:
+            print(f"live ticker refresh failed: {e}")
+            return
+        await asyncio.gather(
+            *(self._update(b, quotes) for b in list(self.boards.values())),
+            return_exceptions=True,
+        )
+
+
+class MoversSnapshot:
+    """
+    Latest !movers embeds kept in memory and refreshed in the background,
+    so the command never waits on the scrape once the first snapshot exists.
+    The loop ticks every minute but only scrapes once the interval the market
+    session called for at the last scrape has passed.
+    """
+
+    def __init__(self, tick: float = 60.0):
+        self.embeds = None
+        self.as_of = None
+        self._due = 0.0
+        self._loading = None
+        self.refresh = tasks.loop(seconds=tick)(self._refresh)
+
+    async def get(self) -> tuple:
+        """
+        :return: embeds of the top gainers, losers and volume, fetched now only
+        if no snapshot was taken yet
+        """
+        if self.embeds is None:
+            await self.update()
+        if not self.refresh.is_running():
+            self.refresh.start()
+        return self.embeds
+
+    async def update(self):
+        # concurrent callers share one scrape
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+            self._loading.add_done_callback(lambda _: setattr(self, "_loading", None))
+        await asyncio.shield(self._loading)
+
+    async def _load(self):
+        embeds = await marketdata.get_movers()
+        as_of = datetime.now(tz=est)
+        for embed in embeds:
+            embed.set_footer(text=f"Data as of {as_of.strftime('%c')} ET")
+        self.embeds, self.as_of = embeds, as_of
+        self._due = time.monotonic() + marketdata.market_hours.pick(
+            MOVERS_REFRESH_OPEN, MOVERS_REFRESH_EXTENDED, MOVERS_REFRESH_CLOSED
+        )
+
+    async def _refresh(self):
+        if time.monotonic() < self._due:
+            return
+        try:
+            await self.update()
+        except Exception as e:
+            # the last snapshot keeps being served with its own timestamp
+            print(f"movers refresh failed: {e}")
+
+
+class LeaderboardSnapshot:
+    """
+    Rankings of every portfolio, kept up to date in the background.
+    The first load reads every position; afterwards only users who traded
+    since the last load are read again, while every refresh reprices all
+    held symbols in batched quote calls and moves the users whose P/L%
+    changed.
+    """
+
+    def __init__(self, tick: float = 60.0):
+        self.rankings = leaderboard.Rankings()
+        self.as_of = None
+        self._loaded = False
+        self._dirty = set()
+        self._due = 0.0
+        self._loading = None
+        self.refresh = tasks.loop(seconds=tick)(self._refresh)
+
+    def touch(self, user_id: str):
+        """
+        marks a user whose positions changed, to be read again on next use
+        """
+        self._dirty.add(str(user_id))
+
+    async def get(self) -> leaderboard.Rankings:
+        if not self._loaded or self._dirty:
+            await self.update()
+        if not self.refresh.is_running():
+            self.refresh.start()
+        return self.rankings
+
+    async def update(self):
+        # concurrent callers share one load
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(self._load())
+            self._loading.add_done_callback(lambda _: setattr(self, "_loading", None))
+        await asyncio.shield(self._loading)
+
+    async def _load(self):
+        dirty, self._dirty = self._dirty, set()
+        user_ids = list(dirty) if self._loaded else None
+        try:
+            rows = await db.run_in_session(leaderboard.load_holdings, user_ids=user_ids)
+            self.rankings.load(rows, user_ids)
+            quotes = await marketdata.get_quote_map(
+                self.rankings.symbols(),
+                cherrypicks=["regularMarketPrice", "currency"],
+            )
+            cad_to_usd = await marketdata.run_blocking(
+                marketdata.forex.rate, "CAD", "USD"
+            )
+        except BaseException:
+            self._dirty |= dirty
+            raise
+        self.rankings.rescore(quotes, rates=(1.0, cad_to_usd))
+        self._loaded = True
+        self.as_of = datetime.now(tz=est)
+        self._due = time.monotonic() + marketdata.market_hours.pick(
+            LEADERBOARD_REFRESH_OPEN,
+            LEADERBOARD_REFRESH_EXTENDED,
+            LEADERBOARD_REFRESH_CLOSED,
+        )
+
+    async def _refresh(self):
+        if time.monotonic() < self._due and not self._dirty:
+            return
+        try:
+            await self.update()
+        except Exception as e:
+            print(f"leaderboard refresh failed: {e}")
+
+
+class AlertEngine:
+    """
+    Single loop checking every active price alert.
+    Each check fetches every symbol with an alert once, in batched quote
+    calls, and looks up the crossed thresholds in the AlertBook; the users
+    of the fired alerts get a direct message. Like LiveTicker, the loop ticks
+    at the open-market rate and checks less often outside regular hours.
+    """
+
+    def __init__(self, tick: float = ALERT_REFRESH_OPEN):
+        self.book = AlertBook()
+        self.bot = None
+        self._due = 0.0
+        self.refresh = tasks.loop(seconds=tick)(self._refresh)
+
+    async def start(self, bot):
+        """
+        loads the stored alerts and starts checking them
+        :param bot: bot used to message users
+        """
+        self.bot = bot
+        for alert in await db.run_in_session(alerts.load_alerts):
+            self.book.add(alert)
+        if not self.refresh.is_running():
+            self.refresh.start()
+
+    def add(self, alert: Alert):
+        self.book.add(alert)
+
+    def remove(self, alert_id: int):
+        self.book.remove(alert_id)
+
+    async def check(self, prices: dict) -> List[Alert]:
+        """
+        fires the alerts crossed by the prices
+        :param prices: dict of symbol to live price
+        :return: list of fired alerts
+        """
+        fired = []
+        for symbol, price in prices.items():
+            fired += [(a, price) for a in self.book.trigger(symbol, price)]
+        if not fired:
+            return []
+        try:
+            await db.run_in_session(
+                alerts.delete_alerts, [a.alert_id for a, _ in fired]
+            )
+        except Exception as e:
+            # kept so the next check fires them again
+            for alert, _ in fired:
+                self.book.add(alert)
+            print(f"failed to clear fired alerts: {e}")
+            return []
+        await asyncio.gather(
+            *(self._notify(a, price) for a, price in fired), return_exceptions=True
+        )
+        return [a for a, _ in fired]
+
+    async def _notify(self, alert: Alert, price: float):
+        user = self.bot.get_user(int(alert.user_id))
+        if user is None:
+            user = await self.bot.fetch_user(int(alert.user_id))
+        moved = "risen to" if alert.direction == ABOVE else "dropped to"
+        await user.send(
+            embed=discord.Embed(
+                title=f"{alert.symbol} alert",
+                description=f"{alert.symbol} has {moved} {format(price, '.2f')}, "
+                f"crossing your alert at {format(alert.price, '.2f')}.",
+                colour=discord.Colour.gold(),
+            )
+        )
+
+    async def _refresh(self):
+        now = time.monotonic()
+        if not self.book or now < self._due:
+            return
+        self._due = now + marketdata.market_hours.pick(
+            ALERT_REFRESH_OPEN, ALERT_REFRESH_EXTENDED, ALERT_REFRESH_CLOSED
+        )
+        try:
+            prices = await marketdata.get_prices(self.book.symbols())
+        except Exception as e:
+            print(f"alert check failed: {e}")
+            return
+        await self.check(prices)
+
+
+@tasks.loop(hours=1)
+async def refresh_forex():
+    # the dataset is only downloaded again once the copy on disk is stale
+    if not marketdata.forex.stale():
+        return
+    try:
+        await marketdata.run_blocking(marketdata.forex.load)
+    except Exception as e:
+        print(f"forex refresh failed: {e}")
+
+
+live_ticker = LiveTicker()
+movers_snapshot = MoversSnapshot()
+leaderboard_snapshot = LeaderboardSnapshot()
+alert_engine = AlertEngine()
+paginator = Paginator()
@@ -0,0 +1,86 @@
+from discord.ext import commands
+from financelite import DataRequestException
+from src.util.SentryHelper import uncaught
+from src.util.Embedder import Embedder
+from src.alerts import *
+from src.asynctasks import alert_engine
+
+ALERT_USAGE = (
+    "`!alert [ticker (GME)] [price (40.50)]`\n"
+    "`!alert list`\n"
+    "`!alert cancel [alert id (3)]`"
+)
+
+
+class Alerts(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @commands.group(
+        invoke_without_command=True,
+        help="Requires a ticker and a price. Example !alert GME 40.50",
+        brief="Messages you when a ticker's price reaches the given price",
+    )
+    async def alert(self, ctx, ticker: str, price: float):
+        if price <= 0:
+            raise commands.BadArgument
+        ticker = ticker.upper()
+        try:
+            alert, live, currency = await create_alert(
+                user_id=str(ctx.author.id),
+                username=ctx.author.name,
+                symbol=ticker,
+                price=price,
+            )
+        except DataRequestException:
+            return await ctx.send(
+                embed=Embedder.error(f"{ticker} is not a valid ticker")
+            )
+        alert_engine.add(alert)
+        await ctx.send(
+            embed=Embedder.embed(
+                title=f"Alert #{alert.alert_id} set for {ticker}",
+                message=f"You will be messaged when {ticker} goes {alert.direction} "
+                f"{format(price, '.2f')} {currency}\n"
+                f"`Live: {format(live, '.2f')} {currency}`",
+            )
+        )
+
+    @alert.command(name="list", brief="Lists your active alerts")
+    async def alert_list(self, ctx):
+        active = await get_alerts(str(ctx.author.id))
+        if not active:
+            return await ctx.send(embed=Embedder.approve("You have no active alerts."))
+        lines = [
+            f"#{a.alert_id} {a.symbol} {a.direction} {format(a.price, '.2f')}"
+            for a in active
+        ]
+        await ctx.send(
+            embed=Embedder.embed(
+                title=f"{ctx.author.name}'s alerts", message="\n".join(lines)
+            )
+        )
+
+    @alert.command(name="cancel", brief="Cancels one of your alerts by its id")
+    async def alert_cancel(self, ctx, alert_id: int):
+        await cancel_alert(str(ctx.author.id), alert_id)
+        alert_engine.remove(alert_id)
+        await ctx.send(embed=Embedder.approve(f"Alert #{alert_id} cancelled."))
+
+    @alert.error
+    @alert_list.error
+    @alert_cancel.error
+    async def alert_error(self, ctx, error: Exception):
+        if isinstance(error, commands.BadArgument):
+            msg = f"Bad argument;\n{ALERT_USAGE}"
+        elif isinstance(error, commands.MissingRequiredArgument):
+            msg = f"Missing arguments;\n{ALERT_USAGE}"
+        elif isinstance(error, TooManyAlerts):
+            msg = f"You can have at most {MAX_ALERTS_PER_USER} active alerts."
+        elif isinstance(error, AlertNotFound):
+            msg = "No active alert of yours has that id.\nSee `!alert list`."
+        elif isinstance(error, commands.CommandInvokeError):
+            msg = uncaught(error.original)
+        else:
+            msg = uncaught(error)
+        await ctx.send(embed=Embedder.error(msg))
@@ -1,9 +1,21 @@
 from src.util.Embedder import Embedder
 from src.util.SentryHelper import uncaught
-from src.util.GraphHandler import plot
+from src.util.Indicators import rsi
+from src.util.GraphHandler import (
+    render,
+    RenderQueueFull,
+    chart_cache,
+    STYLE_KEY,
+    CHART_TYPES,
+    CHART_RENDERER,
+    RENDERERS,
+)
 from src.positions import *
 from src.functions import *
 from financelite import *
+from src import marketdata
+from src.asynctasks import live_ticker, movers_snapshot
+import numpy as np
 import pytz
 import dateparser
 
@@ -17,16 +29,13 @@ class Information(commands.Cog):
         brief="Returns the top gainers, losses and volume from the US.",
     )
     async def movers(self, ctx):
-        day_gainers, day_losers, top_volume = get_movers()
+        day_gainers, day_losers, top_volume = await movers_snapshot.get()
         await ctx.send(embed=day_gainers)
         await ctx.send(embed=day_losers)
         await ctx.send(embed=top_volume)
 
     @commands.command()
     async def info(self, ctx, *args):
-        group = Group()
-        for arg in args:
-            group.add_ticker(arg)
         cherrypicks = [
             "shortName",
             "exchange",
@@ -42,7 +51,7 @@ class Information(commands.Cog):
             "fiftyTwoWeekRange",
         ]
         try:
-            group_info = group.get_quotes(cherrypicks=cherrypicks)
+            group_info = await marketdata.get_quotes(args, cherrypicks=cherrypicks)
         except DataRequestException:
             msg = "Invalid ticker(s). Please check if you have correct tickers."
             return await ctx.send(embed=Embedder.error(msg))
@@ -66,7 +75,7 @@ class Information(commands.Cog):
     )
     async def news(self, ctx, ticker: str, region: str = "US", lang: str = "en-US"):
         try:
-            items = News(region=region, lang=lang).get_news(ticker, count=9)
+            items = await marketdata.get_news(ticker, region=region, lang=lang, count=9)
         except NoNewsFoundException:
             return await ctx.send(
                 embed=Embedder.error("No news was found with this ticker")
@@ -86,9 +95,8 @@ class Information(commands.Cog):
 
     @commands.command()
     async def live(self, ctx, ticker: str):
-        stock = Stock(ticker)
         try:
-            live_price, currency = stock.get_live()
+            live_price, currency = await marketdata.get_live(ticker)
         except DataRequestException as e:
             return await ctx.send(
                 embed=Embedder.error(f"{str(e).upper()} is not a valid ticker")
@@ -99,30 +107,54 @@ class Information(commands.Cog):
         )
         await ctx.send(embed=embed)
 
+    @commands.command(
+        help="Requires at least one ticker. Example !liveboard TSLA GME",
+        brief="Posts a board of live prices that keeps itself updated for an hour",
+    )
+    async def liveboard(self, ctx, ticker: str, *tickers: str):
+        message = await ctx.send(embed=Embedder.embed("Live ticker data", "Loading..."))
+        try:
+            await live_ticker.subscribe(message, [ticker, *tickers])
+        except DataRequestException:
+            await message.edit(
+                embed=Embedder.error("Invalid ticker(s). Please check your tickers.")
+            )
+
     @commands.command()
     async def hist(self, ctx, ticker: str, data_range: str):
-        stock = Stock(ticker)
         try:
-            hist_dictionary = stock.get_hist(data_range=data_range)
-            hist_data, currency, start, end = hist_dictionary.values()
-            start, end = epoch_to_datetime_tz([start, end], tz="EST")
+            hist_dictionary = await marketdata.get_hist(ticker, data_range)
+            currency = hist_dictionary["currency"]
+            start, end = epoch_to_datetime_tz(
+                [hist_dictionary["start_time"], hist_dictionary["end_time"]], tz="EST"
+            )
             time_delta_days = (end - start).days
             start = start.strftime("%a, %b %d, %Y")
             end = end.strftime("%a, %b %d, %Y")
-            diff = hist_data[-1] - hist_data[0]
+            closes = np.array(hist_dictionary["hist"], dtype=np.float64)
+            closes = closes[~np.isnan(closes)]
+            if not len(closes):
+                raise DataRequestException(ticker)
+            diff = closes[-1] - closes[0]
             is_positive = ""
             if diff < 0:
                 colour = discord.Colour.red()
             else:
                 is_positive = "+"
                 colour = discord.Colour.green()
-            diff_percent = diff / hist_data[0] * 100
+            diff_percent = diff / closes[0] * 100
             embed = discord.Embed(
                 title=f"{ticker.upper()} from {start} to {end}",
                 description=f"{is_positive}{format(diff, '.2f')} {currency} "
                 f"({is_positive}{format(diff_percent, '.2f')}%)\nFrom **{time_delta_days} days ago** to today.",
                 colour=colour,
             )
+            # the stored RSI is smoothed over all history, not just this range
+            strength = hist_dictionary["rsi"]
+            if strength is None:
+                strength = rsi(closes)[-1]
+            if not np.isnan(strength):
+                embed.add_field(name="RSI (14)", value=format(strength, ".1f"))
             await ctx.send(embed=embed)
         except DataRequestException:
             return await ctx.send(
@@ -152,8 +184,24 @@ class Information(commands.Cog):
         await ctx.send(embed=Embedder.error(uncaught(error)))
 
     @commands.command()
-    async def graph(self, ctx, ticker: str, data_range: str = "1d"):
-        stock = Stock(ticker)
+    async def graph(
+        self,
+        ctx,
+        ticker: str,
+        data_range: str = "1d",
+        plot_type: str = "candle",
+        renderer: str = CHART_RENDERER,
+    ):
+        plot_type, renderer = plot_type.lower(), renderer.lower()
+        if plot_type not in CHART_TYPES:
+            return await ctx.send(
+                embed=Embedder.error(f"Chart types: [{', '.join(CHART_TYPES)}]")
+            )
+        if renderer not in RENDERERS:
+            return await ctx.send(
+                embed=Embedder.error(f"Renderers: [{', '.join(RENDERERS)}]")
+            )
+        style = f"{STYLE_KEY}-{plot_type}-{renderer}"
         if data_range in ["1d", "5d"]:
             interval = "5m"
         elif data_range in ["1mo", "3mo", "6mo"]:
@@ -162,11 +210,30 @@ class Information(commands.Cog):
             interval = "1d"
         else:
             interval = "1wk"
-        try:
-            chart = stock.get_chart(interval=interval, range=data_range)
-        except DataRequestException:
-            return await ctx.send(embed=Embedder.error("Invalid ticker"))
-        in_mem = io.BytesIO(plot(chart))
+        # the cache's disk tier blocks, so it is read and written off the loop
+        image = await marketdata.run_blocking(
+            chart_cache.get_fresh, ticker, data_range, interval, style
+        )
+        if image is None:
+            try:
+                chart = await marketdata.get_chart(ticker, interval, data_range)
+            except DataRequestException:
+                return await ctx.send(embed=Embedder.error("Invalid ticker"))
+            key = chart_cache.content_key(ticker, data_range, interval, chart, style)
+            image = await marketdata.run_blocking(chart_cache.get, key)
+            if image is None:
+                try:
+                    image = await render(chart, data_range, plot_type, renderer)
+                except RenderQueueFull:
+                    return await ctx.send(
+                        embed=Embedder.error(
+                            "Too many charts are being drawn, try again soon."
+                        )
+                    )
+            await marketdata.run_blocking(
+                chart_cache.put, key, image, ticker, data_range, interval, style
+            )
+        in_mem = io.BytesIO(image)
         chart = discord.File(in_mem, filename=f"{ticker.upper()}-{data_range}.png")
         in_mem.close()
         await ctx.send(file=chart)
@@ -176,8 +243,26 @@ class Information(commands.Cog):
         if isinstance(error, commands.MissingRequiredArgument):
             return await ctx.send(
                 embed=Embedder.error(
-                    "`!graph ticker data_range`\n"
+                    "`!graph ticker data_range [candle|line] [full|fast]`\n"
                     "Data ranges: [1d, 5d, 1mo, 3mo, 6mo, 1y, 2y, 5y, ytd, max]"
                 )
             )
         await ctx.send(embed=Embedder.error(uncaught(error)))
+
+    @commands.command(hidden=True)
+    @commands.is_owner()
+    async def cachestats(self, ctx):
+        stats = marketdata.quote_cache.stats() | marketdata.quote_batcher.stats()
+        stats["hit_rate"] = format(stats["hit_rate"], ".2%")
+        stats["average_batch_size"] = format(stats["average_batch_size"], ".1f")
+        await ctx.send(embed=Embedder.embed("Quote Cache", format_stats(stats)))
+        stats = chart_cache.stats()
+        stats["hit_rate"] = format(stats["hit_rate"], ".2%")
+        stats["bytes_held"] = humanize_number(stats["bytes_held"])
+        await ctx.send(embed=Embedder.embed("Chart Cache", format_stats(stats)))
+
+
+def format_stats(stats: dict) -> str:
+    return "\n".join(
+        f"{key.replace('_', ' ').title()}: {value}" for key, value in stats.items()
+    )
@@ -3,6 +3,17 @@ from src.util.SentryHelper import uncaught
 from src.util.Embedder import Embedder
 from src.positions import *
 from src.functions import *
+from src.asynctasks import leaderboard_snapshot, paginator
+from functools import partial
+
+LEADERBOARD_MAX = 25
+
+
+def portfolio_page(portfolio: PortfolioPages, index: int) -> str:
+    return (
+        f"```diff\n{portfolio[index]}\n```"
+        f"`Page: {index + 1}/{len(portfolio)} ({portfolio.page_size} positions per page)`"
+    )
 
 
 class Positions(commands.Cog):
@@ -15,7 +26,7 @@ class Positions(commands.Cog):
         username = ctx.message.author.name
         ticker = ticker.upper()
         try:
-            bought_price, currency = buy_position(
+            bought_price, currency = await buy_position(
                 user_id=user_id,
                 username=username,
                 symbol=ticker,
@@ -26,6 +37,7 @@ class Positions(commands.Cog):
             return await ctx.send(
                 embed=Embedder.error("Currently USD and CAD stocks are supported")
             )
+        leaderboard_snapshot.touch(user_id)
         if bought_price:
             total = bought_price * amount
             embed = Embedder.embed(
@@ -53,7 +65,7 @@ class Positions(commands.Cog):
         username = ctx.message.author.name
         ticker = ticker.upper()
         try:
-            sold_price, currency = sell_position(
+            sold_price, currency = await sell_position(
                 user_id=user_id,
                 username=username,
                 symbol=ticker,
@@ -64,6 +76,7 @@ class Positions(commands.Cog):
             return await ctx.send(
                 embed=Embedder.error("Currently USD and CAD stocks are supported")
             )
+        leaderboard_snapshot.touch(user_id)
         total = sold_price * amount
         embed = Embedder.embed(
             title=f"Successfully Sold ${ticker}",
@@ -94,71 +107,21 @@ class Positions(commands.Cog):
         user_id = ctx.author.id
         username = ctx.author.name
         mobile = bool(mobile)
-        portfolio, summary = get_portfolio(
+        portfolio, summary = await get_portfolio(
             user_id=user_id, username=username, mobile=mobile
         )
-        len_pf = len(portfolio)
         if mobile:
             await ctx.send(embed=portfolio)
             return await ctx.send(embed=summary)
-        if len_pf > 1:
-            message = await ctx.send(
-                f"```diff\n{portfolio[0]}\n```"
-                + f"`Page: 1/{len_pf} (10 positions per page)`"
-            )
+        if len(portfolio) > 1:
+            message = await ctx.send(portfolio_page(portfolio, 0))
             await ctx.send(f"```diff\n{summary}\n```")
-            await message.add_reaction("⏮")
-            await message.add_reaction("◀")
-            await message.add_reaction("▶")
-            await message.add_reaction("⏭")
-            await message.add_reaction("❌")
-
-            def check(reaction, user):
-                return user == ctx.author
-
-            def info_format(current):
-                return f"`Page: {current}/{len_pf} (10 positions per page)`"
-
-            i = 0
-            reaction = None
-
-            while True:
-                if str(reaction) == "⏮":
-                    i = 0
-                    await message.edit(
-                        content=f"```diff\n{portfolio[i]}\n```"
-                        + f"`{info_format(i + 1)}`"
-                    )
-                elif str(reaction) == "◀":
-                    if i > 0:
-                        i -= 1
-                        await message.edit(
-                            content=f"```diff\n{portfolio[i]}\n```"
-                            + f"`{info_format(i + 1)}`"
-                        )
-                elif str(reaction) == "▶":
-                    if i < len_pf - 1:
-                        i += 1
-                        await message.edit(
-                            content=f"```diff\n{portfolio[i]}\n```"
-                            + f"`{info_format(i + 1)}`"
-                        )
-                elif str(reaction) == "⏭":
-                    i = -1
-                    await message.edit(
-                        content=f"```diff\n{portfolio[i]}\n```"
-                        + f"`{info_format(len_pf)}`"
-                    )
-                elif str(reaction) == "❌":
-                    return await message.clear_reactions()
-                try:
-                    reaction, user = await self.bot.wait_for(
-                        "reaction_add", timeout=30.0, check=check
-                    )
-                    await message.remove_reaction(reaction, user)
-                except Exception:
-                    break
-            await message.clear_reactions()
+            await paginator.start(
+                message,
+                ctx.author.id,
+                len(portfolio),
+                partial(portfolio_page, portfolio),
+            )
         else:
             await ctx.send(f"```diff\n{portfolio[0]}\n```")
             await ctx.send(f"```diff\n{summary}\n```")
@@ -172,3 +135,39 @@ class Positions(commands.Cog):
         else:
             msg = uncaught(error)
         await ctx.send(embed=Embedder.error(msg))
+
+    @commands.command(
+        help="Optionally takes how many users to show. Example !leaderboard 10",
+        brief="Ranks every portfolio by its P/L(%) in USD",
+    )
+    async def leaderboard(self, ctx, count: int = 10):
+        if not 0 < count <= LEADERBOARD_MAX:
+            raise commands.BadArgument
+        rankings = await leaderboard_snapshot.get()
+        lines = [
+            f"{rank}. {username} {'+' if score > 0 else ''}{two_decimal(score)}%"
+            for rank, (_, username, score) in enumerate(rankings.top(count), 1)
+        ]
+        embed = Embedder.embed(
+            title="Portfolio Leaderboard (P/L %)",
+            message="\n".join(lines) or "Nobody holds any positions yet.",
+        )
+        mine = rankings.rank(ctx.author.id)
+        if mine:
+            rank, score = mine
+            embed.add_field(
+                name="Your rank",
+                value=f"{rank} of {len(rankings.tree)} "
+                f"({'+' if score > 0 else ''}{two_decimal(score)}%)",
+            )
+        as_of = leaderboard_snapshot.as_of.strftime("%c")
+        embed.set_footer(text=f"Prices as of {as_of} ET")
+        await ctx.send(embed=embed)
+
+    @leaderboard.error
+    async def leaderboard_error(self, ctx, error: Exception):
+        if isinstance(error, commands.BadArgument):
+            msg = f"Bad argument;\n`!leaderboard [count (1-{LEADERBOARD_MAX})]`"
+        else:
+            msg = uncaught(error)
+        await ctx.send(embed=Embedder.error(msg))
@@ -1,17 +1,41 @@
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy import Column, Integer, create_engine, Text, Float, BigInteger, Boolean
+from sqlalchemy import (
+    Column,
+    Integer,
+    create_engine,
+    Text,
+    Float,
+    BigInteger,
+    Boolean,
+    String,
+    ForeignKey,
+    Index,
+    DateTime,
+    inspect,
+)
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql.expression import ClauseElement
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+import asyncio
+import threading
 
 Base = declarative_base()
 Session = sessionmaker()
+# every database call runs here; sized to the connection pool so a worker
+# never waits for a connection
+_executor = None
+_engine = None
+_url = None
 
 
 class Users(Base):
     __tablename__ = "users"
 
-    id = Column(BigInteger(), primary_key=True)
-    user_id = Column(Text())
+    id = Column(BigInteger().with_variant(Integer(), "sqlite"), primary_key=True)
+    user_id = Column(String(32), nullable=False, unique=True, index=True)
     username = Column(Text())
 
 
@@ -19,28 +43,181 @@ class Symbols(Base):
     __tablename__ = "symbols"
 
     symbol_id = Column(Integer(), primary_key=True)
-    symbol = Column(Text())
+    symbol = Column(String(32), nullable=False, unique=True, index=True)
 
 
 class Positions(Base):
     __tablename__ = "positions"
+    __table_args__ = (
+        Index("ix_positions_user_id_symbol_id", "user_id", "symbol_id", unique=True),
+    )
 
     position_id = Column(Integer(), primary_key=True)
-    user_id = Column(Integer())
-    symbol_id = Column(Integer())
+    user_id = Column(
+        BigInteger().with_variant(Integer(), "sqlite"),
+        ForeignKey("users.id", name="fk_positions_user_id"),
+        nullable=False,
+    )
+    symbol_id = Column(
+        Integer(),
+        ForeignKey("symbols.symbol_id", name="fk_positions_symbol_id"),
+        nullable=False,
+    )
     total_price = Column(Float())
     average_price = Column(Float())
     amount = Column(Integer())
 
 
-def connect(url):
+class Trades(Base):
     """
-    creates the engine and session
+    Append-only ledger of every buy and sell; positions can be rebuilt from it.
+    """
+
+    __tablename__ = "trades"
+    __table_args__ = (
+        Index("ix_trades_user_id_symbol_id", "user_id", "symbol_id", "trade_id"),
+    )
+
+    trade_id = Column(BigInteger().with_variant(Integer(), "sqlite"), primary_key=True)
+    user_id = Column(
+        BigInteger().with_variant(Integer(), "sqlite"),
+        ForeignKey("users.id", name="fk_trades_user_id"),
+        nullable=False,
+    )
+    symbol_id = Column(
+        Integer(),
+        ForeignKey("symbols.symbol_id", name="fk_trades_symbol_id"),
+        nullable=False,
+    )
+    side = Column(String(4), nullable=False)
+    amount = Column(Integer(), nullable=False)
+    price = Column(Float(), nullable=False)
+    currency = Column(String(3))
+    created_at = Column(DateTime(), nullable=False, default=datetime.utcnow)
+
+
+class Alerts(Base):
+    """
+    Active price alerts; an alert is deleted once it fires or is cancelled.
+    """
+
+    __tablename__ = "alerts"
+
+    alert_id = Column(BigInteger().with_variant(Integer(), "sqlite"), primary_key=True)
+    user_id = Column(
+        BigInteger().with_variant(Integer(), "sqlite"),
+        ForeignKey("users.id", name="fk_alerts_user_id"),
+        nullable=False,
+        index=True,
+    )
+    symbol_id = Column(
+        Integer(),
+        ForeignKey("symbols.symbol_id", name="fk_alerts_symbol_id"),
+        nullable=False,
+    )
+    direction = Column(String(5), nullable=False)
+    price = Column(Float(), nullable=False)
+    created_at = Column(DateTime(), nullable=False, default=datetime.utcnow)
+
+
+class SymbolCache:
+    """
+    In-process bidirectional symbol <-> symbol_id map.
+    Symbols are append-only, so a cached pair never goes stale.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._symbols = {}
+        self._lock = threading.Lock()
+
+    def add(self, symbol_id: int, symbol: str):
+        with self._lock:
+            self._ids[symbol] = symbol_id
+            self._symbols[symbol_id] = symbol
+
+    def get_id(self, symbol: str):
+        return self._ids.get(symbol)
+
+    def get_symbol(self, symbol_id: int):
+        return self._symbols.get(symbol_id)
+
+
+symbol_cache = SymbolCache()
+
+
+def cache_symbol(session, symbol_id: int, symbol: str):
+    """
+    queues a symbol pair for the symbol cache; it is added once the session
+    commits, so a rolled back insert never reaches the cache
+    """
+    session.info.setdefault("symbols", []).append((symbol_id, symbol))
+
+
+def connect(url, pool_size: int = 5, max_overflow: int = 10):
+    """
+    creates the engine, session and database executor and upgrades the schema;
+    blocking, so it runs once at startup before the bot connects, and
+    connecting again to the same url does nothing
     :param url: sqlalchemy url
+    :param pool_size: connections kept open in the pool
+    :param max_overflow: extra connections allowed under load
     """
-    engine = create_engine(url, pool_pre_ping=True)
+    from src import migrations
+
+    global _executor, _engine, _url
+    if url == _url:
+        return
+    if _executor is not None:
+        # work queued on the old database finishes before it is dropped
+        _executor.shutdown(wait=True)
+        _engine.dispose()
+    if make_url(url).get_backend_name() == "sqlite":
+        engine = create_engine(url, pool_pre_ping=True)
+        workers = 1
+    else:
+        engine = create_engine(
+            url, pool_pre_ping=True, pool_size=pool_size, max_overflow=max_overflow
+        )
+        workers = pool_size + max_overflow
+    _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="database")
+    _engine, _url = engine, url
     Session.configure(bind=engine)
+    existing = inspect(engine).has_table(Users.__tablename__)
     Base.metadata.create_all(engine)
+    if existing:
+        migrations.upgrade(engine)
+    else:
+        migrations.stamp(engine)
+
+
+async def run_in_session(func, *args, **kwargs):
+    """
+    runs func(session, *args, **kwargs) on the database executor, committing
+    when it returns and rolling back when it raises
+    :param func: blocking callable taking a session as its first argument
+    :return: whatever func returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, partial(_session_scope, func, *args, **kwargs)
+    )
+
+
+def _session_scope(func, *args, **kwargs):
+    session = Session()
+    try:
+        result = func(session, *args, **kwargs)
+        session.commit()
+        for symbol_id, symbol in session.info.pop("symbols", ()):
+            symbol_cache.add(symbol_id, symbol)
+        return result
+    except BaseException:
+        session.info.pop("symbols", None)
+        session.rollback()
+        raise
+    finally:
+        session.close()
 
 
 def get_or_create(session, model, defaults=None, **kwargs):
@@ -64,14 +241,14 @@ def get_or_create(session, model, defaults=None, **kwargs):
         params.update(defaults or {})
         instance = model(**params)
         try:
-            session.add(instance)
-            session.commit()
+            # a savepoint keeps the caller's transaction intact if we lose a race
+            with session.begin_nested():
+                session.add(instance)
         except Exception as e:
             # The actual exception depends on the specific database so we catch all exceptions.
             # This is similar to the official documentation:
             # https://docs.sqlalchemy.org/en/latest/orm/session_transaction.html
             print(f"exception: {e}")
-            session.rollback()
             instance = session.query(model).filter_by(**kwargs).one()
             return instance, False
         else:
@@ -11,63 +11,48 @@ load_dotenv()
 token = os.getenv("RAPID-API-KEY")
 
 
-def get_movers() -> tuple:
-    """
-    :return: Embedded details on the top 6 gainers, losers and volume in the US for the day.
-    """
-    day_gainers = {}
-    day_losers = {}
-    top_volume = {}
-    for k, v in get_day_gainers().to_dict().items():
-        if k in ["Name", "Symbol", "Price (Intraday)", "Change", "% Change"]:
-            day_gainers[k] = v
-        if len(day_gainers) == 5:
-            break
+MOVERS_ROWS = 6
 
-    for k, v in get_day_losers().to_dict().items():
-        if k in ["Name", "Symbol", "Price (Intraday)", "Change", "% Change"]:
-            day_losers[k] = v
-        if len(day_losers) == 5:
-            break
-
-    for k, v in get_day_most_active().to_dict().items():
-        if k in ["Name", "Symbol", "Price (Intraday)", "Change", "% Change", "Volume"]:
-            top_volume[k] = v
-        if len(top_volume) == 6:
-            break
 
-    gainers = discord.Embed(title="Day Gainers:", colour=discord.Colour.green())
-    for i in range(0, 6):
-        gainers.add_field(
-            name=f"**{day_gainers['Name'][i]}**",
-            value=f"> Ticker: {day_gainers['Symbol'][i]}\n"
-            f"> Price: ${day_gainers['Price (Intraday)'][i]}\n"
-            f"> Change: +{day_gainers['Change'][i]}\n"
-            f"> % Change: +{round(day_gainers['% Change'][i], 2)}%\n",
+def movers_embed(
+    table, title: str, colour: discord.Colour = discord.Embed.Empty, volume=False
+) -> discord.Embed:
+    """
+    :param table: DataFrame from one of yahoo_fin's day mover tables
+    :param volume: also show each row's traded volume
+    :return: embed of the first MOVERS_ROWS rows of the table
+    """
+    embed = discord.Embed(title=title, colour=colour)
+    for row in table.head(MOVERS_ROWS).to_dict("records"):
+        sign = "+" if row["Change"] > 0 else ""
+        value = (
+            f"> Ticker: {row['Symbol']}\n"
+            f"> Price: ${row['Price (Intraday)']}\n"
+            f"> Change: {sign}{row['Change']}\n"
+            f"> % Change: {sign}{round(row['% Change'], 2)}%\n"
         )
+        if volume:
+            value += f"> Volume: {humanize_number(row['Volume'], 1)}\n"
+        embed.add_field(name=f"**{row['Name']}**", value=value)
+    return embed
 
-    losers = discord.Embed(title="Day Losers:", colour=discord.Colour.red())
-    for i in range(0, 6):
-        losers.add_field(
-            name=f"**{day_losers['Name'][i]}**",
-            value=f"> Ticker: {day_losers['Symbol'][i]}\n"
-            f"> Price: ${day_losers['Price (Intraday)'][i]}\n"
-            f"> Change: {day_losers['Change'][i]}\n"
-            f"> % Change: {round(day_losers['% Change'][i], 2)}%\n",
-        )
 
-    volume = discord.Embed(title="Top Volume:")
-    for i in range(0, 6):
-        volume.add_field(
-            name=f"**{top_volume['Name'][i]}**",
-            value=f"> Ticker: {top_volume['Symbol'][i]}\n"
-            f"> Price: ${top_volume['Price (Intraday)'][i]}\n"
-            f"> Change: {top_volume['Change'][i]}\n"
-            f"> % Change: {round(top_volume['% Change'][i], 2)}%\n"
-            f"> Volume: {humanize_number(top_volume['Volume'][i], 1)}\n",
-        )
+def build_movers(day_gainers, day_losers, most_active) -> tuple:
+    """
+    :return: embeds of the top gainers, losers and volume for the day
+    """
+    return (
+        movers_embed(day_gainers, "Day Gainers:", discord.Colour.green()),
+        movers_embed(day_losers, "Day Losers:", discord.Colour.red()),
+        movers_embed(most_active, "Top Volume:", volume=True),
+    )
+
 
-    return gainers, losers, volume
+def get_movers() -> tuple:
+    """
+    :return: Embedded details on the top 6 gainers, losers and volume in the US for the day.
+    """
+    return build_movers(get_day_gainers(), get_day_losers(), get_day_most_active())
 
 
 def humanize_number(value: Union[int, float], fraction_point: int = 1) -> str:
@@ -0,0 +1,181 @@
+"""
+Leaderboard.
+
+Every portfolio is valued in bulk: all positions are held as parallel arrays,
+priced from one deduplicated symbol set and summed per user by the valuation
+engine. Users are ranked by P/L% in USD in a RankTree, and a rescore only
+moves the users whose score changed.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from src import valuation
+from src.util.RankTree import RankTree
+import src.database as db
+
+
+def load_holdings(session, user_ids: List[str] = None) -> list:
+    """
+    :param user_ids: discord ids of the users to load, None for everyone
+    :return: list of (discord id, username, symbol, amount, total price,
+    currency of the position's latest trade)
+    """
+    currency = (
+        session.query(db.Trades.currency)
+        .filter(
+            db.Trades.user_id == db.Positions.user_id,
+            db.Trades.symbol_id == db.Positions.symbol_id,
+        )
+        .order_by(db.Trades.trade_id.desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    query = (
+        session.query(
+            db.Users.user_id,
+            db.Users.username,
+            db.Symbols.symbol,
+            db.Positions.amount,
+            db.Positions.total_price,
+            currency,
+        )
+        .join(db.Users, db.Users.id == db.Positions.user_id)
+        .join(db.Symbols, db.Symbols.symbol_id == db.Positions.symbol_id)
+    )
+    if user_ids is not None:
+        query = query.filter(db.Users.user_id.in_(user_ids))
+    return [tuple(row) for row in query]
+
+
+class Rankings:
+    """
+    Holdings of every user as parallel arrays of owner index, symbol index,
+    amount and book value, with the users ranked by their latest score.
+    """
+
+    def __init__(self):
+        self.tree = RankTree()
+        self.names = {}
+        self._users = []
+        self._user_index = {}
+        self._symbols = []
+        self._symbol_index = {}
+        # last known currency of each symbol, for rescoring without a quote
+        self._currencies = {}
+        self.owner = np.empty(0, dtype=np.intp)
+        self.symbol = np.empty(0, dtype=np.intp)
+        self.amount = np.empty(0, dtype=np.int64)
+        self.book_value = np.empty(0, dtype=np.float64)
+        self._scores = np.empty(0, dtype=np.float64)
+
+    @staticmethod
+    def _index(key: str, keys: list, index: dict) -> int:
+        if key not in index:
+            index[key] = len(keys)
+            keys.append(key)
+        return index[key]
+
+    def load(self, rows: list, user_ids: List[str] = None):
+        """
+        replaces the holdings of some users
+        :param rows: holdings from load_holdings
+        :param user_ids: users whose holdings rows replaces, None for everyone
+        """
+        if user_ids is None:
+            keep = np.zeros(len(self.owner), dtype=bool)
+        else:
+            replaced = [self._user_index[u] for u in user_ids if u in self._user_index]
+            keep = ~np.isin(self.owner, replaced)
+        owner, symbol = [], []
+        for user_id, username, ticker, _, _, currency in rows:
+            self.names[user_id] = username
+            if currency:
+                self._currencies.setdefault(ticker, currency)
+            owner.append(self._index(user_id, self._users, self._user_index))
+            symbol.append(self._index(ticker, self._symbols, self._symbol_index))
+        self.owner = np.concatenate([self.owner[keep], np.array(owner, np.intp)])
+        self.symbol = np.concatenate([self.symbol[keep], np.array(symbol, np.intp)])
+        self.amount = np.concatenate(
+            [self.amount[keep], np.array([r[3] for r in rows], np.int64)]
+        )
+        self.book_value = np.concatenate(
+            [self.book_value[keep], np.array([r[4] for r in rows], np.float64)]
+        )
+
+    def symbols(self) -> List[str]:
+        """
+        :return: every symbol currently held, once
+        """
+        return [self._symbols[i] for i in np.unique(self.symbol).tolist()]
+
+    def rescore(self, quotes: dict, rates) -> int:
+        """
+        values every portfolio and moves the users whose score changed
+        :param quotes: dict of symbol to quote with regularMarketPrice and
+        currency; positions without one count at their book value, in the
+        symbol's last known currency
+        :param rates: array indexed like valuation.CURRENCIES converting each
+        currency to USD
+        :return: number of users whose score changed
+        """
+        size = len(self._users)
+        quoted = [quotes.get(s) or {} for s in self._symbols]
+        price = np.array(
+            [q.get("regularMarketPrice") for q in quoted], dtype=np.float64
+        )
+        for symbol, quote in zip(self._symbols, quoted):
+            if quote.get("currency"):
+                self._currencies[symbol] = quote["currency"]
+        currency = valuation.currency_codes(
+            [self._currencies.get(s) for s in self._symbols]
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            average = np.where(self.amount > 0, self.book_value / self.amount, 0.0)
+        live = price[self.symbol]
+        live = np.where(np.isnan(live), average, live)
+        positions = valuation.Valuation(
+            self.symbol,
+            self.amount,
+            self.book_value,
+            average,
+            live,
+            currency[self.symbol],
+        )
+        book_value, live_total = positions.by_group(self.owner, size, rates)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            scores = np.where(
+                book_value > 0, (live_total - book_value) / book_value * 100, 0.0
+            )
+        # users left without positions drop off the board
+        scores[np.bincount(self.owner, minlength=size) == 0] = np.nan
+        previous = np.full(size, np.nan)
+        previous[: len(self._scores)] = self._scores
+        changed = np.flatnonzero(
+            (scores != previous) & ~(np.isnan(scores) & np.isnan(previous))
+        )
+        for i, score in zip(changed.tolist(), scores[changed].tolist()):
+            if np.isnan(score):
+                self.tree.remove(self._users[i])
+            else:
+                self.tree.set(self._users[i], score)
+        self._scores = scores
+        return len(changed)
+
+    def top(self, n: int) -> List[tuple]:
+        """
+        :return: list of (discord id, username, score) of the n best users
+        """
+        return [
+            (user_id, self.names.get(user_id), score)
+            for user_id, score in self.tree.top(n)
+        ]
+
+    def rank(self, user_id: str) -> Optional[tuple]:
+        """
+        :return: tuple of the user's 1-based rank and score, None when the
+        user holds no positions
+        """
+        rank = self.tree.rank(str(user_id))
+        return None if rank is None else (rank, self.tree.score(str(user_id)))
@@ -0,0 +1,114 @@
+"""
+Trade ledger.
+
+Every buy and sell is appended to the trades table in the same transaction
+that updates the matching position, so positions are an incrementally
+maintained view of the ledger that rebuild_positions can recreate at any time.
+Run a rebuild with `python -m src.ledger`.
+"""
+
+import asyncio
+import os
+from itertools import groupby
+from dotenv import load_dotenv
+from sqlalchemy import select
+import src.database as db
+
+BUY = "buy"
+SELL = "sell"
+
+
+def apply_trade(
+    amount: int, total_price: float, side: str, quantity: int, price: float
+) -> tuple:
+    """
+    applies one trade to a position using average cost
+    :param amount: shares held before the trade
+    :param total_price: book value before the trade
+    :param side: BUY or SELL
+    :param quantity: shares traded
+    :param price: price per share
+    :return: tuple of amount, total price and average price after the trade
+    """
+    if side == BUY:
+        amount += quantity
+        total_price += price * quantity
+    else:
+        # selling at average cost leaves the average untouched
+        average = total_price / amount if amount else 0.0
+        amount -= quantity
+        total_price = average * amount
+    average = total_price / amount if amount else 0.0
+    return amount, float(total_price), average
+
+
+def record_trade(
+    session,
+    user_id: int,
+    symbol_id: int,
+    side: str,
+    amount: int,
+    price: float,
+    currency: str,
+):
+    session.add(
+        db.Trades(
+            user_id=user_id,
+            symbol_id=symbol_id,
+            side=side,
+            amount=amount,
+            price=price,
+            currency=currency,
+        )
+    )
+
+
+def rebuild_positions(session, batch_size: int = 10000) -> int:
+    """
+    recreates every position by replaying the ledger in one ordered pass
+    :param session: existing session
+    :param batch_size: ledger rows fetched per round trip
+    :return: number of positions written
+    """
+    trades = db.Trades.__table__
+    positions = db.Positions.__table__
+    result = session.execute(
+        select(
+            trades.c.user_id,
+            trades.c.symbol_id,
+            trades.c.side,
+            trades.c.amount,
+            trades.c.price,
+        )
+        .order_by(trades.c.user_id, trades.c.symbol_id, trades.c.trade_id)
+        .execution_options(stream_results=True)
+    )
+    rows = (row for partition in result.partitions(batch_size) for row in partition)
+    rebuilt = []
+    for (user_id, symbol_id), group in groupby(rows, key=lambda r: r[:2]):
+        amount, total_price, average_price = 0, 0.0, 0.0
+        for trade in group:
+            amount, total_price, average_price = apply_trade(
+                amount, total_price, trade.side, trade.amount, trade.price
+            )
+        if amount > 0:
+            rebuilt.append(
+                dict(
+                    user_id=user_id,
+                    symbol_id=symbol_id,
+                    total_price=total_price,
+                    average_price=average_price,
+                    amount=amount,
+                )
+            )
+    session.execute(positions.delete())
+    for i in range(0, len(rebuilt), batch_size):
+        session.execute(positions.insert(), rebuilt[i : i + batch_size])
+    return len(rebuilt)
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    db.connect(os.getenv("DATABASE_URL"))
+    count = asyncio.run(db.run_in_session(rebuild_positions))
+    print(f"rebuilt {count} positions from the trade ledger")
@@ -0,0 +1,369 @@
+"""
+Async facade over financelite and yahoo_fin.
+
+Both libraries are blocking, so every call is handed to a bounded thread pool
+and awaited; a slow upstream request only occupies one worker instead of the
+whole event loop. Quotes go through a shared QuoteCache so repeated lookups
+of the same symbol are served from memory, and the misses of every caller are
+merged by a QuoteBatcher into one multi-symbol request per batch window.
+Exchange rates come from one process-wide ForexRates table.
+Daily and longer bars are kept in a local SeriesStore, so long chart and
+history ranges only download the bars after the last stored one.
+"""
+
+import asyncio
+import math
+import os
+import re
+import time as clock
+from concurrent.futures import Executor, ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from typing import Callable, Dict, List
+
+from dateutil.relativedelta import relativedelta
+from financelite import DataRequestException, Group, News, Stock
+from pytz import timezone
+from src import functions
+from src.util.ForexRates import ForexRates
+from src.util.QuoteBatcher import QuoteBatcher
+from src.util.MarketHours import MarketHours
+from src.util.QuoteCache import QuoteCache
+from src.util.SeriesStore import EARLIEST, SeriesStore
+
+MARKET_DATA_WORKERS = int(os.getenv("MARKET_DATA_WORKERS", "8"))
+QUOTE_WORKERS = int(os.getenv("QUOTE_WORKERS", "4"))
+QUOTE_CACHE_SIZE = int(os.getenv("QUOTE_CACHE_SIZE", "2048"))
+QUOTE_TTL_OPEN = float(os.getenv("QUOTE_TTL_OPEN", "15"))
+QUOTE_TTL_EXTENDED = float(os.getenv("QUOTE_TTL_EXTENDED", "60"))
+QUOTE_TTL_CLOSED = float(os.getenv("QUOTE_TTL_CLOSED", "21600"))
+QUOTE_BATCH_WINDOW = float(os.getenv("QUOTE_BATCH_WINDOW", "0.05"))
+QUOTE_BATCH_SIZE = int(os.getenv("QUOTE_BATCH_SIZE", "100"))
+QUOTE_ERROR_TTL = float(os.getenv("QUOTE_ERROR_TTL", "300"))
+SERIES_STORE_PATH = os.getenv("SERIES_STORE_PATH", "data/series.sqlite3")
+SERIES_REFRESH = float(os.getenv("SERIES_REFRESH", "60"))
+FOREX_URL = os.getenv(
+    "FOREX_URL", "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.zip"
+)
+FOREX_PATH = os.getenv("FOREX_PATH", "data/eurofxref-hist.zip")
+FOREX_MAX_AGE = float(os.getenv("FOREX_MAX_AGE", "86400"))
+
+# intraday bars are short-lived upstream and always fetched directly
+STORED_INTERVALS = ("1d", "1wk", "1mo")
+# ranges a tail fetch can ask for, with the days each one reaches back
+TAIL_RANGES = [
+    ("5d", 5),
+    ("1mo", 28),
+    ("3mo", 89),
+    ("6mo", 181),
+    ("1y", 365),
+    ("2y", 730),
+    ("5y", 1826),
+    ("10y", 3652),
+]
+RANGE_PATTERN = re.compile("^([1-9][0-9]*)(d|wk|mo|y)$", re.IGNORECASE)
+# a stored close moving this much on a refetch means history was adjusted
+SPLIT_TOLERANCE = 0.01
+
+est = timezone("US/Eastern")
+
+_executor = ThreadPoolExecutor(
+    max_workers=MARKET_DATA_WORKERS, thread_name_prefix="market-data"
+)
+# quote fetches get their own pool so blocking callers on _executor that wait
+# on the cache can never starve the fetches they are waiting for
+_quote_executor = ThreadPoolExecutor(
+    max_workers=QUOTE_WORKERS, thread_name_prefix="quote-fetch"
+)
+
+
+market_hours = MarketHours()
+
+
+def quote_ttl() -> float:
+    # while every market is closed a quote holds until the next session starts
+    return market_hours.pick(QUOTE_TTL_OPEN, QUOTE_TTL_EXTENDED, QUOTE_TTL_CLOSED)
+
+
+def fetch_quotes(symbols: List[str]) -> Dict[str, dict]:
+    """
+    fetches full quotes for the symbols in a single upstream request
+    :param symbols: list of upper-cased ticker symbols
+    :return: dict of symbol to quote, keyed by the symbol Yahoo returned on
+    each quote; symbols Yahoo returned nothing for are left out
+    """
+    group = Group()
+    for symbol in symbols:
+        group.add_ticker(symbol)
+    try:
+        quotes = group.get_quotes()
+    except DataRequestException:
+        raise DataRequestException(",".join(symbols))
+    wanted = set(symbols)
+    by_symbol = {}
+    for quote in quotes:
+        symbol = (quote.get("symbol") or "").upper()
+        if symbol in wanted:
+            by_symbol[symbol] = quote
+    return by_symbol
+
+
+quote_batcher = QuoteBatcher(
+    loader=fetch_quotes,
+    executor=_quote_executor,
+    window=QUOTE_BATCH_WINDOW,
+    max_batch=QUOTE_BATCH_SIZE,
+    isolate_errors=(DataRequestException,),
+    missing_error=DataRequestException,
+)
+
+quote_cache = QuoteCache(
+    fetch=quote_batcher.fetch,
+    ttl_func=quote_ttl,
+    max_size=QUOTE_CACHE_SIZE,
+    # delisted symbols left in alerts or positions aren't asked for every tick
+    cache_errors=(DataRequestException,),
+    error_ttl=QUOTE_ERROR_TTL,
+)
+
+series_store = SeriesStore(SERIES_STORE_PATH) if SERIES_STORE_PATH else None
+
+forex = ForexRates(FOREX_URL, FOREX_PATH, max_age=FOREX_MAX_AGE)
+
+
+def range_start(data_range: str, now: float) -> tuple:
+    """
+    :param data_range: Yahoo range such as 5d, 3mo, 5y, ytd or max
+    :param now: epoch the range ends at
+    :return: tuple of the epoch the range starts at and, for ranges counted in
+    trading days, the number of bars, otherwise None
+    """
+    data_range = data_range.lower()
+    if data_range == "max":
+        return EARLIEST, None
+    today = datetime.fromtimestamp(now, tz=est)
+    if data_range == "ytd":
+        return int(est.localize(datetime(today.year, 1, 1)).timestamp()), None
+    match = RANGE_PATTERN.match(data_range)
+    if not match:
+        raise DataRequestException(f"Invalid range parameter: {data_range}")
+    count, unit = int(match.group(1)), match.group(2)
+    if unit == "d":
+        # enough calendar days to hold that many sessions around a long weekend
+        return int(now - (math.ceil(count * 7 / 5) + 4) * 86400), count
+    delta = {
+        "wk": relativedelta(weeks=count),
+        "mo": relativedelta(months=count),
+        "y": relativedelta(years=count),
+    }[unit]
+    return int((today - delta).timestamp()), None
+
+
+def _tail_range(seconds: float) -> str:
+    for data_range, days in TAIL_RANGES:
+        if seconds < days * 86400:
+            return data_range
+    return "max"
+
+
+def _fetch_full(symbol: str, interval: str, data_range: str, now: float) -> dict:
+    start, bars = range_start(data_range, now)
+    if bars:
+        # a count of sessions says nothing about how far back it reaches, so a
+        # calendar range holding them is fetched and the newest bars are read
+        chart = Stock(symbol).get_chart(
+            interval=interval, range=_tail_range(now - start)
+        )
+    else:
+        chart = Stock(symbol).get_chart(interval=interval, range=data_range)
+    timestamps = chart.get("result")[-1].get("timestamp")
+    if not timestamps:
+        return chart
+    series_store.write(
+        symbol, interval, chart, now, covered_from=min(start, timestamps[0])
+    )
+    # read back rather than returned as fetched, so it carries the indicators
+    return series_store.read(
+        symbol, interval, start=None if bars else timestamps[0], bars=bars
+    )
+
+
+def _fetch_tail(symbol: str, interval: str, last_ts: int, now: float) -> bool:
+    """
+    fetches the bars from the last stored one on into the store
+    :return: False when stored history no longer matches upstream
+    """
+    chart = Stock(symbol).get_chart(interval=interval, range=_tail_range(now - last_ts))
+    result = chart.get("result")[-1]
+    timestamps = result.get("timestamp") or []
+    closes = result.get("indicators").get("quote")[-1].get("close")
+    for ts, close in zip(timestamps, closes):
+        if ts >= last_ts or close is None:
+            break
+        # the first complete bar both copies hold shows splits and restatements
+        stored = series_store.close_at(symbol, interval, ts)
+        if stored is not None and abs(close - stored) > abs(stored) * SPLIT_TOLERANCE:
+            return False
+        if stored is not None:
+            break
+    series_store.write(symbol, interval, chart, now)
+    return True
+
+
+def load_chart(ticker: str, interval: str, data_range: str, now: float = None) -> dict:
+    """
+    Stock.get_chart backed by the series store: a range the store already
+    covers only downloads the bars since the last stored one, at most once
+    per SERIES_REFRESH seconds
+    :param now: epoch of the request, defaults to the current time
+    :return: chart dict shaped like Stock.get_chart's output
+    """
+    symbol = ticker.upper()
+    if series_store is None or interval not in STORED_INTERVALS:
+        return Stock(symbol).get_chart(interval=interval, range=data_range)
+    now = now or clock.time()
+    start, bars = range_start(data_range, now)
+    coverage = series_store.coverage(symbol, interval)
+    if coverage is None or coverage[0] > start:
+        return _fetch_full(symbol, interval, data_range, now)
+    covered_from, last_ts, fetched_at = coverage
+    if now - fetched_at >= SERIES_REFRESH:
+        if not _fetch_tail(symbol, interval, last_ts, now):
+            series_store.drop(symbol, interval)
+            return _fetch_full(symbol, interval, data_range, now)
+    return series_store.read(symbol, interval, start=None if bars else start, bars=bars)
+
+
+def load_hist(ticker: str, data_range: str) -> dict:
+    """
+    Stock.get_hist backed by the series store
+    :return: dict of closes, currency, the first and last bar's epoch and the
+    stored RSI of the last bar, None when the chart wasn't stored
+    :raises DataRequestException: when the range holds no bars
+    """
+    if not RANGE_PATTERN.match(data_range):
+        raise DataRequestException(f"Invalid range parameter: {data_range}")
+    result = load_chart(ticker, "1d", data_range).get("result")[-1]
+    timestamps = result.get("timestamp")
+    quotes = (result.get("indicators") or {}).get("quote") or [{}]
+    closes = quotes[-1].get("close")
+    # Yahoo answers symbols without any bars with an empty chart
+    if not timestamps or not closes:
+        raise DataRequestException(ticker)
+    technical = result.get("indicators").get("technical") or [{}]
+    strength = technical[-1].get("rsi") or [None]
+    return dict(
+        hist=closes,
+        currency=result.get("meta").get("currency"),
+        start_time=timestamps[0],
+        end_time=timestamps[-1],
+        rsi=strength[-1],
+    )
+
+
+def _cherry_pick(quote: dict, cherrypicks: List[str] = None) -> dict:
+    if not cherrypicks:
+        return quote
+    return {k: v for k, v in quote.items() if k in cherrypicks}
+
+
+async def run_in(executor: Executor, func: Callable, *args, **kwargs):
+    """
+    runs a blocking callable on the given executor and awaits its result
+    :param executor: executor to run on
+    :param func: blocking callable
+    :return: whatever func returns
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
+
+
+async def run_blocking(func: Callable, *args, **kwargs):
+    """
+    runs a blocking callable on the market data pool
+    :param func: blocking callable
+    :return: whatever func returns
+    """
+    return await run_in(_executor, func, *args, **kwargs)
+
+
+async def _wait(future):
+    # shielded so a cancelled command can't cancel a fetch other callers share
+    return await asyncio.shield(asyncio.wrap_future(future))
+
+
+async def get_live(ticker: str) -> tuple:
+    quote = await _wait(quote_cache.get_one(ticker))
+    return quote.get("regularMarketPrice"), quote.get("currency")
+
+
+async def get_quotes(tickers: List[str], cherrypicks: List[str] = None) -> List[dict]:
+    futures = quote_cache.get(tickers)
+    results = []
+    for ticker in tickers:
+        quote = await _wait(futures[ticker.upper()])
+        results.append(_cherry_pick(quote, cherrypicks))
+    return results
+
+
+async def get_quote_map(
+    tickers: List[str], cherrypicks: List[str] = None
+) -> Dict[str, dict]:
+    """
+    looks up each ticker through the quote cache on its own, so a bad symbol
+    only fails its own lookup; the batcher still merges the misses into
+    shared upstream requests
+    :return: dict of upper-cased symbol to quote, leaving out symbols whose
+    quote could not be fetched
+    """
+    symbols = list(dict.fromkeys(t.upper() for t in tickers))
+    futures = {symbol: quote_cache.get_one(symbol) for symbol in symbols}
+    quotes = await asyncio.gather(
+        *(_wait(futures[s]) for s in symbols), return_exceptions=True
+    )
+    return {
+        symbol: _cherry_pick(quote, cherrypicks)
+        for symbol, quote in zip(symbols, quotes)
+        if isinstance(quote, dict)
+    }
+
+
+async def get_prices(tickers: List[str]) -> Dict[str, float]:
+    """
+    :return: dict of upper-cased symbol to live price, leaving out symbols
+    without one
+    """
+    quotes = await get_quote_map(tickers)
+    return {
+        symbol: quote.get("regularMarketPrice")
+        for symbol, quote in quotes.items()
+        if quote.get("regularMarketPrice") is not None
+    }
+
+
+async def get_chart(ticker: str, interval: str, data_range: str) -> dict:
+    return await run_blocking(load_chart, ticker, interval, data_range)
+
+
+async def get_hist(ticker: str, data_range: str) -> dict:
+    return await run_blocking(load_hist, ticker, data_range)
+
+
+async def get_news(
+    ticker: str, region: str = "US", lang: str = "en-US", count: int = 10
+) -> List[dict]:
+    news = News(region=region, lang=lang)
+    return await run_blocking(news.get_news, ticker, count=count)
+
+
+async def get_movers() -> tuple:
+    """
+    scrapes the three day mover tables concurrently
+    :return: embeds of the top gainers, losers and volume for the day
+    """
+    tables = await asyncio.gather(
+        run_blocking(functions.get_day_gainers),
+        run_blocking(functions.get_day_losers),
+        run_blocking(functions.get_day_most_active),
+    )
+    return functions.build_movers(*tables)
@@ -0,0 +1,221 @@
+"""
+Schema migrations for databases created before a schema change.
+
+Fresh databases get the current schema from Base.metadata.create_all and are
+stamped with the latest version. Existing ones run every migration newer than
+the version recorded in schema_version, one transaction per migration.
+Run manually with `python -m src.migrations`.
+"""
+
+import os
+from dotenv import load_dotenv
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    create_engine,
+    func,
+    inspect,
+    literal,
+    select,
+    text,
+)
+from sqlalchemy.schema import AddConstraint
+import src.database as db
+
+metadata = MetaData()
+schema_version = Table(
+    "schema_version", metadata, Column("version", Integer(), nullable=False)
+)
+
+MIGRATIONS = []
+
+
+def migration(version: int):
+    """
+    registers the decorated function as the migration to the given version
+    :param version: schema version after the migration ran
+    """
+
+    def register(func):
+        MIGRATIONS.append((version, func))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return func
+
+    return register
+
+
+def current_version(connection) -> int:
+    return connection.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+
+def head() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def stamp(engine):
+    """
+    marks a freshly created database as up to date
+    :param engine: sqlalchemy engine
+    """
+    metadata.create_all(engine)
+    with engine.begin() as connection:
+        if current_version(connection) < head():
+            connection.execute(schema_version.insert().values(version=head()))
+
+
+def upgrade(engine):
+    """
+    runs every migration newer than the database's schema version
+    :param engine: sqlalchemy engine
+    """
+    metadata.create_all(engine)
+    for version, func in MIGRATIONS:
+        with engine.begin() as connection:
+            if version <= current_version(connection):
+                continue
+            print(f"migrating database to version {version}: {func.__name__}")
+            func(connection)
+            connection.execute(schema_version.insert().values(version=version))
+
+
+def _merge_duplicates(connection, table, key, id_column, references):
+    """
+    keeps the lowest id per key and repoints references to it before deleting
+    the other rows
+    :param table: table holding the duplicates
+    :param key: column that should be unique
+    :param id_column: primary key column of table
+    :param references: columns in other tables referencing id_column
+    """
+    duplicates = connection.execute(
+        select(key).group_by(key).having(func.count() > 1)
+    ).scalars()
+    for value in list(duplicates):
+        ids = connection.execute(
+            select(id_column).where(key == value).order_by(id_column)
+        ).scalars()
+        keep, *others = list(ids)
+        for reference in references:
+            connection.execute(
+                reference.table.update()
+                .where(reference.in_(others))
+                .values({reference.name: keep})
+            )
+        connection.execute(table.delete().where(id_column.in_(others)))
+
+
+def _merge_duplicate_positions(connection):
+    positions = db.Positions.__table__
+    duplicates = connection.execute(
+        select(positions.c.user_id, positions.c.symbol_id)
+        .group_by(positions.c.user_id, positions.c.symbol_id)
+        .having(func.count() > 1)
+    ).all()
+    for user_id, symbol_id in duplicates:
+        rows = connection.execute(
+            select(positions)
+            .where(positions.c.user_id == user_id, positions.c.symbol_id == symbol_id)
+            .order_by(positions.c.position_id)
+        ).all()
+        keep, *others = rows
+        amount = sum(row.amount for row in rows)
+        total_price = sum(row.total_price for row in rows)
+        connection.execute(
+            positions.update()
+            .where(positions.c.position_id == keep.position_id)
+            .values(
+                amount=amount,
+                total_price=total_price,
+                average_price=total_price / amount if amount else 0.0,
+            )
+        )
+        connection.execute(
+            positions.delete().where(
+                positions.c.position_id.in_([row.position_id for row in others])
+            )
+        )
+
+
+MYSQL_COLUMN_CHANGES = [
+    "ALTER TABLE users MODIFY user_id VARCHAR(32) NOT NULL",
+    "ALTER TABLE symbols MODIFY symbol VARCHAR(32) NOT NULL",
+    "ALTER TABLE positions MODIFY user_id BIGINT NOT NULL, MODIFY symbol_id INT NOT NULL",
+]
+
+
+@migration(1)
+def add_keys_and_constraints(connection):
+    users = db.Users.__table__
+    symbols = db.Symbols.__table__
+    positions = db.Positions.__table__
+
+    connection.execute(symbols.update().values(symbol=func.upper(symbols.c.symbol)))
+    _merge_duplicates(
+        connection,
+        symbols,
+        symbols.c.symbol,
+        symbols.c.symbol_id,
+        [positions.c.symbol_id],
+    )
+    _merge_duplicates(
+        connection, users, users.c.user_id, users.c.id, [positions.c.user_id]
+    )
+    _merge_duplicate_positions(connection)
+    connection.execute(
+        positions.delete().where(
+            positions.c.user_id.is_(None)
+            | positions.c.symbol_id.is_(None)
+            | positions.c.user_id.not_in(select(users.c.id))
+            | positions.c.symbol_id.not_in(select(symbols.c.symbol_id))
+        )
+    )
+
+    if connection.dialect.name == "mysql":
+        for statement in MYSQL_COLUMN_CHANGES:
+            connection.execute(text(statement))
+
+    inspector = inspect(connection)
+    for table in (users, symbols, positions):
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                index.create(connection)
+
+    # SQLite can't add constraints to an existing table
+    if connection.dialect.name != "sqlite":
+        existing = {fk["name"] for fk in inspector.get_foreign_keys(positions.name)}
+        for constraint in positions.foreign_key_constraints:
+            if constraint.name not in existing:
+                connection.execute(AddConstraint(constraint))
+
+
+@migration(2)
+def seed_trade_ledger(connection):
+    """
+    positions predating the ledger get one opening buy at their average price,
+    so replaying the ledger reproduces them
+    """
+    trades = db.Trades.__table__
+    positions = db.Positions.__table__
+    if connection.execute(select(func.count()).select_from(trades)).scalar():
+        return
+    connection.execute(
+        trades.insert().from_select(
+            ["user_id", "symbol_id", "side", "amount", "price", "created_at"],
+            select(
+                positions.c.user_id,
+                positions.c.symbol_id,
+                literal("buy"),
+                positions.c.amount,
+                positions.c.average_price,
+                func.now(),
+            ).where(positions.c.amount > 0),
+        )
+    )
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    upgrade(create_engine(os.getenv("DATABASE_URL")))
@@ -1,14 +1,16 @@
 import src.database as db
 import discord
-from financelite import Stock, Group
-from src.database import Session
+from src import ledger, marketdata, valuation
 from discord.ext import commands
 from tabulate import tabulate
-from currency_converter import CurrencyConverter
-from cached_property import cached_property_with_ttl
-from typing import List, Union
+from typing import List, Optional, Union
+from sqlalchemy.exc import IntegrityError
+from weakref import WeakValueDictionary
+from collections import OrderedDict
+import asyncio
+import numpy as np
 
-CURRENCY_EXCHANGE_DB = "https://www.ecb.int/stats/eurofxref/eurofxref-hist.zip"
+_user_locks = WeakValueDictionary()
 
 
 class NotEnoughPositionsToSell(Exception):
@@ -27,76 +29,128 @@ class WalletHasNoBookValues(BaseException):
     pass
 
 
-def buy_position(user_id: str, username: str, symbol: str, amount: int, price: float):
-    session = Session()
-    bought_price, currency = Stock(ticker=symbol).get_live()
-    if currency not in ["USD", "CAD"]:
-        raise NotAmerican
-    bought_price = price if price else bought_price
-    try:
-        symbol = get_symbol_or_create(session, symbol)
-        symbol_id = symbol[0].symbol_id
-        user = get_user_or_create(session, user_id=user_id, username=username)
-        user_id = user[0].id
-        ex_total, ex_amount = 0, 0
-        existing = get_existing_position(
-            session=session, user_id=user_id, symbol_id=symbol_id
+async def buy_position(
+    user_id: str, username: str, symbol: str, amount: int, price: float
+):
+    async with user_lock(user_id):
+        bought_price, currency = await marketdata.get_live(symbol)
+        if currency not in ["USD", "CAD"]:
+            raise NotAmerican
+        bought_price = price if price else bought_price
+        await db.run_in_session(
+            _buy,
+            user_id,
+            username,
+            symbol,
+            amount=amount,
+            price=bought_price,
+            currency=currency,
         )
-        if existing:
-            ex_total, ex_amount = existing.total_price, existing.amount
-        new_total_price = float(ex_total + bought_price * amount)
-        new_amount = ex_amount + amount
-        new_average_price = new_total_price / new_amount
-        if existing:
-            existing.total_price = new_total_price
-            existing.amount = new_amount
-            existing.average_price = new_average_price
-        else:
-            position_row = db.Positions(
-                user_id=user_id,
-                symbol_id=symbol_id,
-                total_price=new_total_price,
-                average_price=new_average_price,
-                amount=new_amount,
+    return bought_price, currency
+
+
+def _buy(
+    session,
+    user_id: str,
+    username: str,
+    symbol: str,
+    amount: int,
+    price: float,
+    currency: str,
+):
+    symbol_id = get_symbol_id(session, symbol)
+    user = get_user_or_create(session, user_id=user_id, username=username)
+    user_id = user[0].id
+    existing = get_existing_position(
+        session=session, user_id=user_id, symbol_id=symbol_id
+    )
+    if not existing:
+        position_row = db.Positions(
+            user_id=user_id,
+            symbol_id=symbol_id,
+            total_price=0.0,
+            average_price=0.0,
+            amount=0,
+        )
+        try:
+            with session.begin_nested():
+                session.add(position_row)
+            existing = position_row
+        except IntegrityError:
+            # another process inserted the position first; lock theirs instead
+            existing = get_existing_position(
+                session=session, user_id=user_id, symbol_id=symbol_id
             )
-            session.add(position_row)
-        return bought_price, currency
-    finally:
-        session.commit()
-        session.close()
+    existing.amount, existing.total_price, existing.average_price = ledger.apply_trade(
+        existing.amount, existing.total_price, ledger.BUY, amount, price
+    )
+    ledger.record_trade(
+        session, user_id, symbol_id, ledger.BUY, amount, price, currency
+    )
 
 
-def sell_position(user_id: str, username: str, symbol: str, amount: int, price: float):
+async def sell_position(
+    user_id: str, username: str, symbol: str, amount: int, price: float
+):
     # TODO: maybe add cash attr for users
-    session = Session()
-    sold_price, currency = Stock(symbol).get_live()
-    if currency not in ["USD", "CAD"]:
-        raise NotAmerican
-    sold_price = price if price else sold_price
-    try:
-        symbol = get_symbol_or_create(session, symbol)
-        symbol_id = symbol[0].symbol_id
-        user = get_user_or_create(session, user_id=user_id, username=username)
-        user_id = user[0].id
-        existing = get_existing_position(
-            session=session, user_id=user_id, symbol_id=symbol_id
+    async with user_lock(user_id):
+        sold_price, currency = await marketdata.get_live(symbol)
+        if currency not in ["USD", "CAD"]:
+            raise NotAmerican
+        sold_price = price if price else sold_price
+        await db.run_in_session(
+            _sell,
+            user_id,
+            username,
+            symbol,
+            amount=amount,
+            price=sold_price,
+            currency=currency,
         )
-        if existing:
-            ex_total, ex_amount = existing.total_price, existing.amount
-            if ex_amount < amount:
-                raise NotEnoughPositionsToSell
-            elif ex_amount == amount:
-                session.delete(existing)
-                return sold_price, currency
-            new_amount = ex_amount - amount
-            existing.total_price = ex_total - sold_price * new_amount
-            existing.amount = new_amount
-            return sold_price, currency
-        else:
-            raise NotEnoughPositionsToSell
-    finally:
-        session.commit()
-        session.close()
+    return sold_price, currency
+
+
+def _sell(
+    session,
+    user_id: str,
+    username: str,
+    symbol: str,
+    amount: int,
+    price: float,
+    currency: str,
+):
+    # selling never creates anything: an unknown symbol or user holds nothing
+    symbol_id = find_symbol_id(session, symbol)
+    user = find_user(session, user_id=user_id, username=username)
+    if symbol_id is None or user is None:
+        raise NotEnoughPositionsToSell
+    user_id = user.id
+    existing = get_existing_position(
+        session=session, user_id=user_id, symbol_id=symbol_id
+    )
+    if not existing or existing.amount < amount:
+        raise NotEnoughPositionsToSell
+    ledger.record_trade(
+        session, user_id, symbol_id, ledger.SELL, amount, price, currency
+    )
+    if existing.amount == amount:
+        session.delete(existing)
+        return
+    existing.amount, existing.total_price, existing.average_price = ledger.apply_trade(
+        existing.amount, existing.total_price, ledger.SELL, amount, price
+    )
+
+
+def user_lock(user_id: str) -> asyncio.Lock:
+    """
+    trades of one user are serialized in-process so they never contend for
+    the same position row
+    :return: lock shared by every pending trade of the user
+    """
+    lock = _user_locks.get(str(user_id))
+    if lock is None:
+        lock = _user_locks[str(user_id)] = asyncio.Lock()
+    return lock
 
 
 def calculate_pl(live: float, book_value: float) -> tuple:
@@ -139,10 +193,6 @@ class CurrencyWallet:
         self.cad_book_value = 0.0
         self.cad_live = 0.0
 
-    @cached_property_with_ttl(ttl=3600)
-    def _currency_converter(self):
-        return CurrencyConverter(CURRENCY_EXCHANGE_DB)
-
     def add_currency(self, currency: str, book_value: float, live: float):
         if currency == "USD":
             self.usd_book_value += book_value
@@ -151,10 +201,14 @@ class CurrencyWallet:
             self.cad_book_value += book_value
             self.cad_live += live
 
+    def add_valuation(self, positions: valuation.Valuation):
+        for currency, book_value, live in zip(
+            valuation.CURRENCIES, *positions.by_currency()
+        ):
+            self.add_currency(currency, float(book_value), float(live))
+
     def _forex(self, init: str, final: str, value: float):
-        return self._currency_converter.convert(
-            amount=value, currency=init, new_currency=final
-        )
+        return marketdata.forex.convert(value, init, final)
 
     def summary(self) -> dict:
         book_value_in_usd = self.usd_book_value + self._forex(
@@ -205,46 +259,45 @@ class CurrencyWallet:
         return summary
 
 
-def handle_positions(
-    pos_group: Group,
-    pos_dict: dict,
-    currency_wallet: CurrencyWallet,
-    format_type: Union[discord.Embed, List],
+def format_positions(
+    positions: valuation.Valuation, format_type: Union[discord.Embed, List]
 ):
-    live_info = pos_group.get_quotes(
-        cherrypicks=["symbol", "regularMarketPrice", "currency"]
-    )
-
-    for info in live_info:
-        symbol = info.get("symbol")
-        live = info.get("regularMarketPrice")
-        amount = pos_dict.get(symbol).get("amount")
-        book_value = pos_dict.get(symbol).get("book_value")
-        average = pos_dict.get(symbol).get("average")
-        currency = info.get("currency")
-        live_total = live * amount
-        pl, pl_percent = calculate_pl(live=live_total, book_value=book_value)
-        pl = two_decimal(pl)
-        pl_percent = two_decimal(pl_percent)
-        currency_wallet.add_currency(
-            currency=currency, book_value=book_value, live=live_total
+    """
+    renders valued positions as embed fields or table rows
+    :param positions: Valuation of the positions
+    :param format_type: embed to add fields to, or list to append rows to
+    """
+    signs = np.sign(positions.live - positions.average).tolist()
+    columns = [
+        np.char.mod("%.2f", values).tolist()
+        for values in (
+            positions.average,
+            positions.live,
+            positions.book_value,
+            positions.live_total,
+            positions.pl,
+            positions.pl_percent,
         )
-        if live > average:
+    ]
+    amounts = positions.amount.tolist()
+    for i, symbol in enumerate(positions.symbols):
+        average, live, book_value, live_total, pl, pl_percent = (c[i] for c in columns)
+        amount, sign = amounts[i], signs[i]
+        currency = valuation.CURRENCIES[positions.currency[i]]
+        if sign > 0:
             symbol = "+" + symbol
             pl = "+" + pl
             pl_percent = f"+{pl_percent}"
-        elif average > live:
+        elif sign < 0:
             symbol = "-" + symbol
-        else:
-            pass
         if isinstance(format_type, discord.Embed):
             format_type.add_field(
                 name=f"**{symbol}**",
                 value=f"> Amount: x {amount}\n"
-                f"> Average Price: {two_decimal(average)}\n"
-                f"> Live Price: {two_decimal(live)}\n"
-                f"> Book Value: {two_decimal(book_value)}\n"
-                f"> Current Total: {two_decimal(live_total)}\n"
+                f"> Average Price: {average}\n"
+                f"> Live Price: {live}\n"
+                f"> Book Value: {book_value}\n"
+                f"> Current Total: {live_total}\n"
                 f"> P/L (%): {pl} ({pl_percent}%)\n"
                 f"> Currency: {currency}",
             )
@@ -253,130 +306,192 @@ def handle_positions(
                 [
                     symbol,
                     f"x {amount}",
-                    two_decimal(average),
-                    two_decimal(live),
-                    two_decimal(book_value),
-                    two_decimal(live_total),
+                    average,
+                    live,
+                    book_value,
+                    live_total,
                     f"{pl} ({pl_percent}%)",
                     currency,
                 ]
             )
 
 
-def get_portfolio(user_id: str, username: str, mobile: bool):
-    session = Session()
-    try:
-        user = get_user_or_create(session=session, user_id=user_id, username=username)
-        user_id = user[0].id
-        positions = session.query(db.Positions).filter_by(user_id=user_id).all()
-        if not positions:
-            raise NoPositionsException
-        pf_list = (
-            list()
-            if not mobile
-            else discord.Embed(
-                title=f"{username}'s Portfolio", colour=discord.Colour.green()
-            )
+class PortfolioPages:
+    """
+    Pages of the portfolio table, each rendered the first time it is shown.
+    Only the last few rendered pages are kept.
+    """
+
+    HEADERS = [
+        "Symbol",
+        "Amount",
+        "Average Price",
+        "Live Price",
+        "Book Value",
+        "Current Total",
+        "P/L (%)",
+        "Currency",
+    ]
+
+    def __init__(
+        self, positions: valuation.Valuation, page_size: int = 10, cache_size: int = 4
+    ):
+        """
+        :param positions: Valuation of the positions shown
+        :param page_size: positions per page
+        :param cache_size: rendered pages kept
+        """
+        self.positions = positions
+        self.page_size = page_size
+        self._cache_size = cache_size
+        self._pages = OrderedDict()
+
+    def __len__(self) -> int:
+        return max(1, -(-len(self.positions) // self.page_size))
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        if index in self._pages:
+            self._pages.move_to_end(index)
+            return self._pages[index]
+        start = index * self.page_size
+        rows = []
+        format_positions(self.positions.slice(start, start + self.page_size), rows)
+        page = tabulate(rows, headers=self.HEADERS, disable_numparse=True)
+        self._pages[index] = page
+        if len(self._pages) > self._cache_size:
+            self._pages.popitem(last=False)
+        return page
+
+
+async def get_portfolio(user_id: str, username: str, mobile: bool):
+    """
+    :return: tuple of the portfolio, an embed when mobile and PortfolioPages
+    otherwise, and the summary
+    """
+    pos_dict = await db.run_in_session(load_positions, user_id=user_id)
+    if not pos_dict:
+        raise NoPositionsException
+    currency_wallet = CurrencyWallet()
+    live_info = await marketdata.get_quotes(
+        list(pos_dict), cherrypicks=["symbol", "regularMarketPrice", "currency"]
+    )
+    positions = valuation.value_positions(pos_dict, live_info)
+    currency_wallet.add_valuation(positions)
+    if mobile:
+        portfolio = discord.Embed(
+            title=f"{username}'s Portfolio", colour=discord.Colour.green()
         )
-        currency_wallet = CurrencyWallet()
-        pos_group = Group()
-        pos_dict = dict()
-
-        for item in positions:
-            symbol = (
-                session.query(db.Symbols)
-                .filter_by(symbol_id=item.symbol_id)
-                .one()
-                .symbol
-            )
-            pos_group.add_ticker(symbol)
-            pos_dict[symbol] = dict(
-                book_value=item.total_price,
-                average=item.average_price,
-                amount=item.amount,
-            )
-
-        handle_positions(
-            pos_group=pos_group,
-            pos_dict=pos_dict,
-            currency_wallet=currency_wallet,
-            format_type=pf_list,
+        format_positions(positions, portfolio)
+    else:
+        portfolio = PortfolioPages(positions)
+
+    wallet_summary = await marketdata.run_blocking(currency_wallet.summary)
+    if mobile:
+        summary = discord.Embed(
+            title=f"{username}'s Portfolio Summary", colour=discord.Colour.green()
         )
-        if mobile:
-            portfolio_table = pf_list
-        else:
-            headers = [
-                "Symbol",
-                "Amount",
-                "Average Price",
-                "Live Price",
-                "Book Value",
-                "Current Total",
-                "P/L (%)",
-                "Currency",
-            ]
-            pf_len = len(pf_list)
-            if pf_len > 10:
-                chunking = pf_len // 10
-                if pf_len % 10:
-                    chunking += 1
-            else:
-                chunking = 1
-            portfolio_table = []
-            for _ in range(chunking):
-                chunk = pf_list[:10]
-                portfolio_table.append(
-                    tabulate(
-                        chunk,
-                        headers=headers,
-                        disable_numparse=True,
-                    )
-                )
-                del pf_list[:10]
-
-        wallet_summary = currency_wallet.summary()
-        if mobile:
-            summary = discord.Embed(
-                title=f"{username}'s Portfolio Summary", colour=discord.Colour.green()
-            )
-            summary_handler(wallet_summary, summary)
-        else:
-            summary = []
-            summary_handler(wallet_summary, summary)
-            summary = tabulate(
-                summary,
-                headers=["Currency", "Book Value", "Current Total", "P/L(%)"],
-                stralign="left",
-                disable_numparse=True,
-            )
-        return portfolio_table, summary
-    finally:
-        session.close()
+        summary_handler(wallet_summary, summary)
+    else:
+        summary = []
+        summary_handler(wallet_summary, summary)
+        summary = tabulate(
+            summary,
+            headers=["Currency", "Book Value", "Current Total", "P/L(%)"],
+            stralign="left",
+            disable_numparse=True,
+        )
+    return portfolio, summary
 
 
 def get_symbol_or_create(session, symbol: str):
-    symbol_default = {"symbol": symbol.upper()}
-    return db.get_or_create(
-        session=session, model=db.Symbols, defaults=symbol_default, symbol=symbol
-    )
+    return db.get_or_create(session=session, model=db.Symbols, symbol=symbol.upper())
+
+
+def find_symbol_id(session, symbol: str) -> Optional[int]:
+    """
+    :return: id of an existing symbol, None when it was never stored
+    """
+    symbol = symbol.upper()
+    symbol_id = db.symbol_cache.get_id(symbol)
+    if symbol_id is None:
+        row = session.query(db.Symbols).filter_by(symbol=symbol).one_or_none()
+        if row is None:
+            return None
+        symbol_id = row.symbol_id
+        db.cache_symbol(session, symbol_id, symbol)
+    return symbol_id
+
+
+def get_symbol_id(session, symbol: str) -> int:
+    symbol = symbol.upper()
+    symbol_id = find_symbol_id(session, symbol)
+    if symbol_id is None:
+        symbol_id = get_symbol_or_create(session, symbol)[0].symbol_id
+        db.cache_symbol(session, symbol_id, symbol)
+    return symbol_id
+
+
+def find_user(session, user_id: str, username: str):
+    """
+    :return: existing Users row, None when the user never traded
+    """
+    user = session.query(db.Users).filter_by(user_id=str(user_id)).one_or_none()
+    if user is not None and user.username != username:
+        user.username = username
+    return user
 
 
 def get_user_or_create(session, user_id: str, username: str):
-    user_default = {"user_id": f"{user_id}", "username": username}
-    return db.get_or_create(
+    user, created = db.get_or_create(
         session=session,
         model=db.Users,
-        defaults=user_default,
-        user_id=user_id,
-        username=username,
+        defaults={"username": username},
+        user_id=str(user_id),
+    )
+    if user.username != username:
+        user.username = username
+    return user, created
+
+
+def get_positions_with_symbols(session, user_id: str) -> list:
+    """
+    loads a user's positions together with their symbols in a single query
+    :return: list of (Positions, symbol) tuples
+    """
+    return (
+        session.query(db.Positions, db.Symbols.symbol)
+        .join(db.Users, db.Users.id == db.Positions.user_id)
+        .join(db.Symbols, db.Symbols.symbol_id == db.Positions.symbol_id)
+        .filter(db.Users.user_id == str(user_id))
+        .all()
     )
 
 
+def load_positions(session, user_id: str) -> dict:
+    """
+    :return: dict of symbol to the user's book value, average and amount
+    """
+    pos_dict = dict()
+    for item, symbol in get_positions_with_symbols(session=session, user_id=user_id):
+        db.cache_symbol(session, item.symbol_id, symbol)
+        pos_dict[symbol] = dict(
+            book_value=item.total_price,
+            average=item.average_price,
+            amount=item.amount,
+        )
+    return pos_dict
+
+
 def get_existing_position(session, user_id, symbol_id: int):
     existing = (
         session.query(db.Positions)
         .filter_by(user_id=user_id, symbol_id=symbol_id)
-        .first()
+        .with_for_update()
+        .one_or_none()
     )
     return existing
 
@@ -0,0 +1,97 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import namedtuple
+from typing import List
+
+ABOVE = "above"
+BELOW = "below"
+
+Alert = namedtuple("Alert", ["alert_id", "user_id", "symbol", "direction", "price"])
+
+
+class _Thresholds:
+    # alerts of one symbol and direction, sorted by threshold price
+    def __init__(self):
+        self.keys = []
+
+    def add(self, alert: Alert):
+        insort(self.keys, (alert.price, alert.alert_id))
+
+    def remove(self, alert: Alert):
+        i = bisect_left(self.keys, (alert.price, alert.alert_id))
+        if i < len(self.keys) and self.keys[i] == (alert.price, alert.alert_id):
+            del self.keys[i]
+
+    def pop_upto(self, price: float) -> list:
+        # thresholds at or below price, crossed by a rise
+        i = bisect_right(self.keys, (price, float("inf")))
+        fired, self.keys[:i] = self.keys[:i], []
+        return fired
+
+    def pop_from(self, price: float) -> list:
+        # thresholds at or above price, crossed by a drop
+        i = bisect_left(self.keys, (price, float("-inf")))
+        fired, self.keys[i:] = self.keys[i:], []
+        return fired
+
+
+class AlertBook:
+    """
+    In-memory index of active price alerts.
+    Thresholds are kept sorted per symbol and direction, so checking a symbol
+    against its latest price is a bisect plus the alerts that actually fire,
+    however many alerts are waiting on it.
+    """
+
+    def __init__(self):
+        self._alerts = {}
+        self._above = {}
+        self._below = {}
+
+    def __len__(self) -> int:
+        return len(self._alerts)
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._alerts
+
+    def _side(self, alert: Alert) -> dict:
+        return self._above if alert.direction == ABOVE else self._below
+
+    def add(self, alert: Alert):
+        if alert.alert_id in self._alerts:
+            return
+        self._alerts[alert.alert_id] = alert
+        self._side(alert).setdefault(alert.symbol, _Thresholds()).add(alert)
+
+    def remove(self, alert_id: int):
+        alert = self._alerts.pop(alert_id, None)
+        if alert is None:
+            return
+        side = self._side(alert)
+        thresholds = side[alert.symbol]
+        thresholds.remove(alert)
+        if not thresholds.keys:
+            del side[alert.symbol]
+
+    def symbols(self) -> List[str]:
+        return list(dict.fromkeys([*self._above, *self._below]))
+
+    def trigger(self, symbol: str, price: float) -> List[Alert]:
+        """
+        removes and returns the alerts of a symbol crossed by price
+        :param symbol: upper-cased ticker symbol
+        :param price: latest price of the symbol
+        """
+        fired = []
+        for side, pop in (
+            (self._above, _Thresholds.pop_upto),
+            (self._below, _Thresholds.pop_from),
+        ):
+            thresholds = side.get(symbol)
+            if thresholds is None:
+                continue
+            fired += [
+                self._alerts.pop(alert_id) for _, alert_id in pop(thresholds, price)
+            ]
+            if not thresholds.keys:
+                del side[symbol]
+        return fired
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+# how long a rendered chart is served without asking Yahoo, per bar interval
+INTERVAL_TTL = {"1m": 30, "5m": 60, "1h": 900, "1d": 3600, "1wk": 6 * 3600}
+
+
+class ChartCache:
+    """
+    Content-addressed cache of rendered chart PNGs.
+    Images are stored under a key built from what was drawn (symbol, range,
+    interval, last bar, style), so a re-fetched chart whose data did not move
+    reuses the old image. A per-request index serves repeat requests within
+    the interval's TTL without fetching at all. Memory is bounded in bytes
+    (LRU); an optional directory keeps a second, larger tier across restarts.
+    Lookups can touch the disk, so callers on the event loop run them in an
+    executor.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = 64 * 1024 * 1024,
+        directory: str = None,
+        max_disk_bytes: int = 512 * 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """
+        :param max_bytes: memory budget for PNG bytes
+        :param directory: on-disk tier location, disabled when None
+        :param max_disk_bytes: disk budget, the files least recently written or
+        read from disk are pruned past it
+        :param clock: monotonic time source
+        """
+        self._max_bytes = max_bytes
+        self._directory = directory
+        self._max_disk_bytes = max_disk_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        self._images = OrderedDict()
+        self._index = {}
+        self.bytes_held = 0
+        self.hits = 0
+        self.content_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        # the directory is scanned on the first write, not at import time
+        self._disk_bytes = None
+        # the index is swept of expired requests once it doubles
+        self._sweep_at = 1024
+
+    @staticmethod
+    def content_key(
+        symbol: str, data_range: str, interval: str, chart: dict, style: str
+    ) -> str:
+        """
+        :param chart: chart dict from Stock.get_chart
+        :param style: identifies how the chart is drawn
+        :return: key of the image this chart renders to
+        """
+        result = chart.get("result")[0]
+        last_bar = result.get("timestamp")[-1]
+        # the newest bar keeps its timestamp while it is still forming
+        last_close = result.get("indicators").get("quote")[0].get("close")[-1]
+        raw = (
+            f"{symbol.upper()}|{data_range}|{interval}|{last_bar}|{last_close}|{style}"
+        )
+        return hashlib.sha1(raw.encode()).hexdigest()
+
+    def get_fresh(
+        self, symbol: str, data_range: str, interval: str, style: str
+    ) -> Optional[bytes]:
+        """
+        :return: the image last served for this request if still within its TTL
+        """
+        request = (symbol.upper(), data_range, interval, style)
+        with self._lock:
+            entry = self._index.get(request)
+            if not entry or entry[1] <= self._clock():
+                return None
+        image = self._load(entry[0])
+        if image is not None:
+            with self._lock:
+                self.hits += 1
+        return image
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        :return: the image stored under a content key, if any
+        """
+        image = self._load(key)
+        with self._lock:
+            if image is None:
+                self.misses += 1
+            else:
+                self.content_hits += 1
+        return image
+
+    def put(
+        self,
+        key: str,
+        image: bytes,
+        symbol: str,
+        data_range: str,
+        interval: str,
+        style: str,
+    ):
+        """
+        stores an image and points the request index at it
+        """
+        request = (symbol.upper(), data_range, interval, style)
+        expires_at = self._clock() + INTERVAL_TTL.get(interval, 300)
+        with self._lock:
+            self._index[request] = (key, expires_at)
+            if len(self._index) >= self._sweep_at:
+                self._sweep_index()
+            self._remember(key, image)
+        if self._directory:
+            self._write(key, image)
+
+    def stats(self) -> dict:
+        with self._lock:
+            served = self.hits + self.content_hits
+            lookups = served + self.misses
+            return {
+                "images": len(self._images),
+                "bytes_held": self.bytes_held,
+                "hits": self.hits,
+                "content_hits": self.content_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": served / lookups if lookups else 0.0,
+            }
+
+    def _sweep_index(self):
+        now = self._clock()
+        for request in [r for r, (_, at) in self._index.items() if at <= now]:
+            del self._index[request]
+        self._sweep_at = max(1024, 2 * len(self._index))
+
+    def _remember(self, key: str, image: bytes):
+        old = self._images.pop(key, None)
+        if old is not None:
+            self.bytes_held -= len(old)
+        self._images[key] = image
+        self.bytes_held += len(image)
+        while self.bytes_held > self._max_bytes and len(self._images) > 1:
+            _, evicted = self._images.popitem(last=False)
+            self.bytes_held -= len(evicted)
+
+    def _load(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+        if not self._directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                image = f.read()
+            # pruning goes by mtime, so a read keeps the file
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, image)
+        return image
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self._directory, f"{key}.png")
+
+    def _write(self, key: str, image: bytes):
+        path = self._path(key)
+        # writes come from several executor threads
+        with self._disk_lock:
+            if os.path.exists(path):
+                return
+            if self._disk_bytes is None:
+                os.makedirs(self._directory, exist_ok=True)
+                self._disk_bytes = sum(size for _, size, _ in self._disk_files())
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                f.write(image)
+            os.replace(tmp, path)
+            self._disk_bytes += len(image)
+            if self._disk_bytes > self._max_disk_bytes:
+                self._prune_disk()
+
+    def _disk_files(self) -> list:
+        files = []
+        for entry in os.scandir(self._directory):
+            if entry.name.endswith(".png"):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return files
+
+    def _prune_disk(self):
+        files = sorted(self._disk_files())
+        self._disk_bytes = sum(size for _, size, _ in files)
+        # prune down to 90% so every write past the budget doesn't rescan
+        for _, size, path in files:
+            if self._disk_bytes <= self._max_disk_bytes * 0.9:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self._disk_bytes -= size
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+
+
+def resample_ohlc(df: pd.DataFrame, target: int) -> pd.DataFrame:
+    """
+    merges consecutive bars so at most `target` candles remain
+    :param df: OHLCV DataFrame from process_chart_data
+    :param target: maximum number of candles
+    :return: DataFrame with first open, max high, min low, last close and summed
+    volume per bucket, indexed by each bucket's first timestamp; any other
+    column, such as a moving average, keeps the value at the bucket's close
+    """
+    n = len(df)
+    if target <= 0 or n <= target:
+        return df
+    size = -(-n // target)
+    starts = np.arange(0, n, size)
+    ends = np.minimum(starts + size, n) - 1
+    columns = {
+        "Open": df["Open"].to_numpy()[starts],
+        "Close": df["Close"].to_numpy()[ends],
+        "High": np.maximum.reduceat(df["High"].to_numpy(), starts),
+        "Low": np.minimum.reduceat(df["Low"].to_numpy(), starts),
+        "Volume": np.add.reduceat(df["Volume"].to_numpy(), starts),
+    }
+    for column in df.columns:
+        if column not in columns:
+            columns[column] = df[column].to_numpy()[ends]
+    return pd.DataFrame(columns, index=df.index[starts])
+
+
+def lttb(y: np.ndarray, threshold: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets: picks the points that best keep the shape
+    of a line when drawn with fewer of them
+    :param y: series values, assumed evenly spaced
+    :param threshold: number of points to keep
+    :return: sorted indices of the kept points
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    x = np.arange(n, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0], kept[-1] = 0, n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        # the next bucket is represented by its average point
+        next_x = x[end:next_end].mean() if next_end > end else x[-1]
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        kept[i + 1] = previous
+    return kept
+
+
+def downsample(df: pd.DataFrame, target: int, chart_type: str) -> pd.DataFrame:
+    """
+    :param df: OHLCV DataFrame from process_chart_data
+    :param target: maximum number of bars to draw
+    :param chart_type: "line" keeps LTTB-picked closes, anything else resamples OHLC
+    """
+    if not target or len(df) <= target:
+        return df
+    if chart_type == "line":
+        return df.iloc[lttb(df["Close"].to_numpy(), target)]
+    return resample_ohlc(df, target)
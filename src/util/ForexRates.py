@@ -0,0 +1,86 @@
+import os
+import threading
+import time
+from typing import Iterable
+
+import requests
+from currency_converter import CurrencyConverter
+
+
+class ForexRates:
+    """
+    Latest exchange rates between a few currencies, from the ECB reference
+    rate dataset. The dataset is downloaded to disk at most once per max_age
+    and parsed once into a table of every currency pair, so a conversion is a
+    dict lookup. A failed download falls back to the copy on disk, so the bot
+    can start without network as long as it ran once before.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        path: str,
+        currencies: Iterable[str] = ("USD", "CAD"),
+        max_age: float = 86400,
+    ):
+        """
+        :param url: ECB dataset zip
+        :param path: where the downloaded copy is kept
+        :param currencies: currencies in the rate table
+        :param max_age: seconds before the copy on disk is downloaded again
+        """
+        self._url = url
+        self._path = path
+        self._currencies = tuple(currencies)
+        self._max_age = max_age
+        self._lock = threading.Lock()
+        self._rates = None
+
+    def stale(self) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self._path) > self._max_age
+        except OSError:
+            return True
+
+    def _download(self):
+        response = requests.get(self._url, timeout=30)
+        response.raise_for_status()
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(response.content)
+        os.replace(tmp, self._path)
+
+    def load(self):
+        """
+        downloads the dataset when the copy on disk is missing or stale, then
+        rebuilds the rate table from the copy on disk
+        """
+        with self._lock:
+            if self.stale():
+                try:
+                    self._download()
+                except Exception as e:
+                    if not os.path.exists(self._path):
+                        raise
+                    print(f"forex download failed, using the copy on disk: {e}")
+            converter = CurrencyConverter(self._path)
+            self._rates = {
+                (init, final): converter.convert(1.0, init, final)
+                for init in self._currencies
+                for final in self._currencies
+            }
+
+    def rate(self, init: str, final: str) -> float:
+        """
+        :return: units of final currency per unit of init currency, loading
+        the dataset first if it never was
+        """
+        if self._rates is None:
+            self.load()
+        return self._rates[(init, final)]
+
+    def convert(self, value: float, init: str, final: str) -> float:
+        return value * self.rate(init, final)
@@ -1,8 +1,66 @@
+import hashlib
 import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
+import matplotlib
+
+matplotlib.use("Agg")
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PolyCollection
+from matplotlib.figure import Figure
 import pandas as pd
 import mplfinance as mpf
-from src.functions import epoch_to_datetime_tz
+from src.marketdata import run_in, run_blocking
+from src.util.ChartCache import ChartCache
+from src.util.SeriesMap import SeriesMap, SeriesRef
+from src.util.Downsample import downsample
+from src.util.Indicators import sma
+
+CHART_WORKERS = int(os.getenv("CHART_WORKERS", "2"))
+CHART_QUEUE_SIZE = int(os.getenv("CHART_QUEUE_SIZE", "8"))
+CHART_CACHE_BYTES = int(os.getenv("CHART_CACHE_BYTES", str(64 * 1024 * 1024)))
+CHART_CACHE_DIR = os.getenv("CHART_CACHE_DIR")
+SERIES_MAP_DIR = os.getenv("SERIES_MAP_DIR", "data/series")
+CHART_MAX_BARS = int(os.getenv("CHART_MAX_BARS", "300"))
+CHART_RENDERER = os.getenv("CHART_RENDERER", "full")
+
+# most bars drawn per data range, longer histories are resampled down to it
+RANGE_TARGETS = {
+    "1d": 120,
+    "5d": 200,
+    "1mo": 200,
+    "3mo": 250,
+    "6mo": 250,
+    "ytd": 260,
+    "1y": 260,
+    "2y": 260,
+    "5y": 260,
+    "10y": 260,
+    "max": CHART_MAX_BARS,
+}
+CHART_TYPES = ("candle", "line")
+MOVING_AVERAGES = {50: "#1f77b4", 100: "#ff7f0e", 200: "#2ca02c"}
+FRAME_COLUMNS = ("Open", "Close", "High", "Low", "Volume") + tuple(
+    f"SMA{window}" for window in MOVING_AVERAGES
+)
+
+logger = logging.getLogger(__name__)
+
+_render_pool = None
+_queued = 0
+_fast_figure = None
+
+
+class RenderQueueFull(Exception):
+    pass
+
 
 STYLE = {
     "base_mpl_style": "fast",
@@ -34,37 +92,126 @@ STYLE = {
 }
 
 
-def process_chart_data(chart: dict) -> tuple:
-    result = chart.get("result").pop()
-    meta = result.get("meta")
-    tz = meta.get("exchangeTimezoneName")
-    timezone_short = meta.get("timezone")
-    symbol = meta.get("symbol")
-    currency = meta.get("currency")
-    timestamps = result.get("timestamp")
-    datetime_idx = epoch_to_datetime_tz(timestamps, tz=tz)
-    quote = result.get("indicators").get("quote").pop()
-    lows = quote.get("low")
-    highs = quote.get("high")
-    opens = quote.get("open")
-    closes = quote.get("close")
-    volumes = quote.get("volume")
-    data = zip(opens, closes, highs, lows, volumes)
+# part of every chart cache key, so restyled charts are never served stale
+STYLE_KEY = hashlib.sha1(repr(STYLE).encode()).hexdigest()[:12]
+
+chart_cache = ChartCache(max_bytes=CHART_CACHE_BYTES, directory=CHART_CACHE_DIR)
+# render workers read published series from here instead of unpickling charts
+series_map = SeriesMap(SERIES_MAP_DIR) if SERIES_MAP_DIR else None
+
+
+def chart_columns(chart: dict, dtype=np.float64) -> tuple:
+    """
+    pulls the OHLCV columns out of a chart dict, dropping bars Yahoo returned
+    without prices, along with the moving averages of MOVING_AVERAGES the
+    series store kept for them, NaN when it didn't
+    :param chart: chart dict from Stock.get_chart or SeriesStore.read
+    :param dtype: float dtype of the price columns, np.float32 halves memory
+    :return: tuple of the chart meta and dict of column name to array
+    """
+    result = chart.get("result")[-1]
+    quote = result.get("indicators").get("quote")[-1]
+    # None becomes NaN when converted straight to a float array
+    columns = {
+        column: np.array(quote.get(column.lower()), dtype=dtype)
+        for column in ("Open", "Close", "High", "Low")
+    }
+    volume = np.array(quote.get("volume"), dtype=np.float64)
+    valid = ~np.isnan(np.vstack(list(columns.values()))).any(axis=0)
+    columns = {column: values[valid] for column, values in columns.items()}
+    columns["Volume"] = np.nan_to_num(volume[valid]).astype(np.int64)
+    columns["Timestamp"] = np.asarray(result.get("timestamp"), dtype=np.int64)[valid]
+    technical = (result.get("indicators").get("technical") or [{}])[-1]
+    for window in MOVING_AVERAGES:
+        stored = technical.get(f"sma{window}")
+        columns[f"SMA{window}"] = (
+            np.array(stored, dtype=dtype)[valid]
+            if stored
+            else np.full(len(columns["Timestamp"]), np.nan, dtype=dtype)
+        )
+    return result.get("meta"), columns
+
+
+def _frame(meta: dict, columns: dict) -> tuple:
+    tz = meta.get("exchangeTimezoneName") or "UTC"
+    index = pd.to_datetime(columns["Timestamp"], unit="s", utc=True).tz_convert(tz)
     df = pd.DataFrame(
-        data, index=datetime_idx, columns=["Open", "Close", "High", "Low", "Volume"]
+        {column: columns[column] for column in FRAME_COLUMNS},
+        index=index,
+        copy=False,
     )
-    return symbol, currency, timezone_short, df
+    return meta.get("symbol"), meta.get("currency"), meta.get("timezone"), df
+
+
+def process_chart_data(chart: dict, dtype=np.float64) -> tuple:
+    """
+    turns a chart dict into an OHLCV DataFrame indexed in the exchange timezone,
+    dropping bars Yahoo returned without prices
+    :param chart: chart dict from Stock.get_chart
+    :param dtype: float dtype of the price columns, np.float32 halves memory
+    :return: tuple of symbol, currency, short timezone name and the DataFrame
+    """
+    return _frame(*chart_columns(chart, dtype))
+
+
+def load_series(chart) -> tuple:
+    """
+    :param chart: chart dict, or SeriesRef to a series published to series_map
+    :return: same tuple as process_chart_data; published series are views of
+    the mapped file rather than copies
+    """
+    if isinstance(chart, SeriesRef):
+        return _frame(*series_map.slice(chart))
+    return process_chart_data(chart)
+
 
+def publish(chart: dict):
+    """
+    writes the chart's bars to series_map for the render workers
+    :return: SeriesRef to pass to a renderer in place of the chart, or the
+    chart itself when it can't be published
+    """
+    meta, columns = chart_columns(chart)
+    interval = meta.get("dataGranularity")
+    if series_map is None or not interval or not meta.get("symbol"):
+        return chart
+    return series_map.publish(meta.get("symbol"), interval, meta, columns)
 
-def plot(chart: dict) -> bytes:
-    data = process_chart_data(chart)
-    symbol, currency, tz, df = data
+
+def plot(chart, data_range: str = None, plot_type: str = "candle") -> bytes:
+    """
+    draws the chart, resampled to at most RANGE_TARGETS[data_range] bars
+    :param chart: chart dict from Stock.get_chart or a SeriesRef
+    :param data_range: range the chart was fetched for
+    :param plot_type: one of CHART_TYPES, line charts are downsampled with LTTB
+    :return: png image in bytes
+    """
+    symbol, currency, tz, df = load_series(chart)
+    bars = len(df)
+    df = downsample(df, RANGE_TARGETS.get(data_range, CHART_MAX_BARS), plot_type)
+    logger.debug(
+        "%s %s %s chart: drawing %d of %d bars",
+        symbol,
+        data_range,
+        plot_type,
+        len(df),
+        bars,
+    )
     index = df.index
-    plot_type = "candle"
+    closes = df["Close"].to_numpy()
+    averages = {}
+    for window, color in MOVING_AVERAGES.items():
+        values = df[f"SMA{window}"].to_numpy()
+        # intraday charts aren't stored, their averages span the drawn bars
+        if not np.isfinite(values).any():
+            values = sma(closes, window)
+        # windows longer than the series would only add empty lines
+        if np.isfinite(values).any():
+            averages[f"{window} MA"] = mpf.make_addplot(values, color=color, width=1)
     fig, axes = mpf.plot(
         df,
         type=plot_type,
-        mav=(50, 100, 200),
+        addplot=list(averages.values()),
         volume=True,
         style=STYLE,
         title=f"\n{symbol} Stock Price from {index[0].strftime('%Y-%m-%d')} to {index[-1].strftime('%Y-%m-%d')} {tz}",
@@ -72,11 +219,13 @@ def plot(chart: dict) -> bytes:
         ylabel_lower="Volume",
         returnfig=True,
     )
-    axes[0].legend(
-        ["50 MA", "100 MA", "200 MA"],
-        loc="lower left",
-        bbox_to_anchor=(1, 1),
-    )
+    if averages:
+        axes[0].legend(
+            axes[0].lines[-len(averages) :],
+            list(averages),
+            loc="lower left",
+            bbox_to_anchor=(1, 1),
+        )
     close = df["Close"]
     max_idx, min_idx = close.idxmax(), close.idxmin()
     max_val, min_val = df.at[max_idx, "Close"], df.at[min_idx, "Close"]
@@ -108,8 +257,264 @@ def plot(chart: dict) -> bytes:
     )
 
     buffer = io.BytesIO()
-    fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    try:
+        fig.savefig(buffer, format="png", bbox_inches="tight", dpi=200)
+    finally:
+        plt.close(fig)
     buffer.seek(0)
     img_in_bytes = buffer.read()
     buffer.close()
     return img_in_bytes
+
+
+# plot_fast draws under these settings only, mplfinance leaves its own style
+# behind in the global rcParams
+FAST_STYLE = [
+    "default",
+    {
+        **STYLE["rc"],
+        "axes.edgecolor": "#f0f0f0",
+        "axes.facecolor": STYLE["facecolor"],
+        "figure.facecolor": STYLE["facecolor"],
+        "savefig.facecolor": STYLE["facecolor"],
+        "axes.grid": True,
+        "grid.color": STYLE["gridcolor"],
+        "grid.linestyle": STYLE["gridstyle"],
+        "figure.titleweight": "bold",
+    },
+]
+
+
+def _fast_axes() -> tuple:
+    """
+    builds the figure plot_fast draws on once per process; it is styled here
+    and only its data artists are replaced on later calls
+    :return: tuple of figure, price axes and volume axes
+    """
+    global _fast_figure
+    if _fast_figure is None:
+        # not created through pyplot, so it is never tracked or closed by it
+        fig = Figure(figsize=(12, 8))
+        FigureCanvasAgg(fig)
+        price, volume = fig.subplots(
+            2,
+            1,
+            sharex=True,
+            gridspec_kw={"height_ratios": (3, 1), "hspace": 0.05},
+        )
+        for axes in (price, volume):
+            axes.set_axisbelow(True)
+        volume.set_ylabel("Volume")
+        fig.subplots_adjust(left=0.08, right=0.95, top=0.92, bottom=0.08)
+        _fast_figure = fig, price, volume
+    return _fast_figure
+
+
+def _x_ticks(index: pd.DatetimeIndex, count: int = 6) -> tuple:
+    positions = np.linspace(0, len(index) - 1, min(count, len(index))).astype(int)
+    intraday = index[-1] - index[0] < pd.Timedelta(days=2)
+    fmt = "%H:%M" if intraday else "%Y-%m-%d"
+    return positions, [index[i].strftime(fmt) for i in positions]
+
+
+def _boxes(x: np.ndarray, bottom: np.ndarray, top: np.ndarray, half: float):
+    left, right = x - half, x + half
+    return np.stack(
+        [
+            np.column_stack([left, bottom]),
+            np.column_stack([left, top]),
+            np.column_stack([right, top]),
+            np.column_stack([right, bottom]),
+        ],
+        axis=1,
+    )
+
+
+def plot_fast(
+    chart, data_range: str = None, plot_type: str = "candle", dpi: int = 100
+) -> bytes:
+    """
+    draws the chart with raw matplotlib collections on a reused figure,
+    skipping mplfinance, moving averages and the tight bounding box pass.
+    Not thread safe, meant for the single-threaded render workers.
+    :param chart: chart dict from Stock.get_chart or a SeriesRef
+    :param data_range: range the chart was fetched for
+    :param plot_type: one of CHART_TYPES
+    :param dpi: output resolution
+    :return: png image in bytes
+    """
+    symbol, currency, tz, df = load_series(chart)
+    bars = len(df)
+    df = downsample(df, RANGE_TARGETS.get(data_range, CHART_MAX_BARS), plot_type)
+    logger.debug(
+        "%s %s %s fast chart: drawing %d of %d bars",
+        symbol,
+        data_range,
+        plot_type,
+        len(df),
+        bars,
+    )
+    with plt.style.context(FAST_STYLE):
+        fig, price, volume = _fast_axes()
+        for axes in (price, volume):
+            for artist in [*axes.collections, *axes.lines, *axes.texts]:
+                artist.remove()
+
+        colors = STYLE["marketcolors"]
+        opens, closes = df["Open"].to_numpy(), df["Close"].to_numpy()
+        highs, lows = df["High"].to_numpy(), df["Low"].to_numpy()
+        volumes = df["Volume"].to_numpy()
+        x = np.arange(len(df), dtype=np.float64)
+        up = closes >= opens
+
+        if plot_type == "line":
+            price.plot(x, closes, color=colors["candle"]["up"], linewidth=1.2)
+        else:
+            wicks = np.stack(
+                [np.column_stack([x, lows]), np.column_stack([x, highs])], axis=1
+            )
+            price.add_collection(
+                LineCollection(wicks, colors=colors["wick"]["up"], linewidths=0.8)
+            )
+            bodies = np.where(up, colors["candle"]["up"], colors["candle"]["down"])
+            price.add_collection(
+                PolyCollection(
+                    _boxes(
+                        x, np.minimum(opens, closes), np.maximum(opens, closes), 0.3
+                    ),
+                    facecolors=bodies,
+                    edgecolors=bodies,
+                    linewidths=0.5,
+                )
+            )
+        volume.add_collection(
+            PolyCollection(
+                _boxes(x, np.zeros(len(df)), volumes, 0.3),
+                facecolors=np.where(
+                    up, colors["volume"]["up"], colors["volume"]["down"]
+                ),
+                linewidths=0,
+            )
+        )
+
+        low, high = lows.min(), highs.max()
+        margin = (high - low) * 0.05 or 1.0
+        price.set_xlim(-1, len(df))
+        price.set_ylim(low - margin, high + margin)
+        volume.set_ylim(0, volumes.max() * 1.1 or 1)
+        price.set_ylabel(f"$ Price in {currency}")
+        positions, labels = _x_ticks(df.index)
+        volume.set_xticks(positions)
+        volume.set_xticklabels(labels)
+        price.annotate(
+            f"Recent Close @ {format(closes[-1], '.2f')}",
+            xy=(x[-1], closes[-1]),
+            xytext=(-20, 30),
+            textcoords="offset pixels",
+            horizontalalignment="right",
+            arrowprops=dict(arrowstyle="->"),
+        )
+        fig.suptitle(
+            f"{symbol} Stock Price from {df.index[0].strftime('%Y-%m-%d')} "
+            f"to {df.index[-1].strftime('%Y-%m-%d')} {tz}"
+        )
+
+        buffer = io.BytesIO()
+        fig.savefig(
+            buffer,
+            format="png",
+            dpi=dpi,
+            # zlib level 1 encodes several times faster for a slightly larger file
+            pil_kwargs={"compress_level": 1},
+        )
+    return buffer.getvalue()
+
+
+RENDERERS = {"full": plot, "fast": plot_fast}
+
+
+def _warm_up():
+    """
+    runs once per render worker so imports, font lookups and style validation
+    are paid before the first real request
+    """
+    from src.util import GraphHandler
+
+    epoch = 1609770600
+    quote = {key: [1.0, 2.0, 1.5] for key in ("open", "close", "high", "low")}
+    quote["volume"] = [1, 2, 3]
+    chart = {
+        "result": [
+            {
+                "meta": {"exchangeTimezoneName": "UTC", "timezone": "UTC"},
+                "timestamp": [epoch, epoch + 60, epoch + 120],
+                "indicators": {"quote": [quote]},
+            }
+        ]
+    }
+    for renderer in GraphHandler.RENDERERS.values():
+        renderer(chart)
+
+
+def start_renderers() -> ProcessPoolExecutor:
+    """
+    starts the render worker processes if they are not running yet
+    :return: the render process pool
+    """
+    global _render_pool
+    if _render_pool is None:
+        # spawn instead of fork: the bot process is full of threads
+        _render_pool = ProcessPoolExecutor(
+            max_workers=CHART_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_up,
+        )
+        for _ in range(CHART_WORKERS):
+            _render_pool.submit(int)
+    return _render_pool
+
+
+def _restart_renderers(broken: ProcessPoolExecutor) -> ProcessPoolExecutor:
+    """
+    replaces a render pool that lost a worker, unless a concurrent render
+    already did
+    :return: the render process pool
+    """
+    global _render_pool
+    if _render_pool is broken:
+        _render_pool = None
+        broken.shutdown(wait=False, cancel_futures=True)
+    return start_renderers()
+
+
+async def render(
+    chart: dict,
+    data_range: str = None,
+    plot_type: str = "candle",
+    renderer: str = CHART_RENDERER,
+) -> bytes:
+    """
+    renders the chart on the render process pool
+    :param chart: chart dict from Stock.get_chart
+    :param data_range: range the chart was fetched for
+    :param plot_type: one of CHART_TYPES
+    :param renderer: key of RENDERERS, "fast" skips mplfinance
+    :return: png image in bytes
+    :raises RenderQueueFull: when CHART_QUEUE_SIZE renders are already queued
+    """
+    global _queued
+    if _queued >= CHART_QUEUE_SIZE:
+        raise RenderQueueFull
+    _queued += 1
+    try:
+        # workers map the published bars instead of each unpickling a copy
+        chart = await run_blocking(publish, chart)
+        pool = start_renderers()
+        try:
+            return await run_in(pool, RENDERERS[renderer], chart, data_range, plot_type)
+        except BrokenProcessPool:
+            # a dead worker breaks the whole pool; retry once on a fresh one
+            pool = _restart_renderers(pool)
+            return await run_in(pool, RENDERERS[renderer], chart, data_range, plot_type)
+    finally:
+        _queued -= 1
@@ -0,0 +1,272 @@
+"""
+Technical indicators over price series.
+
+The functions compute a whole series at once in O(n) vectorized passes, the
+Rolling classes advance the same indicators one value at a time so a stored
+series can be extended with new bars without recomputing its history.
+"""
+
+import math
+from collections import deque
+
+import numpy as np
+
+# largest factor the smoothing weights of one block may span
+_SMOOTH_RANGE = 1e100
+
+# indicators kept alongside stored series
+SMA_WINDOWS = (50, 100, 200)
+RSI_PERIOD = 14
+# rsi_gain and rsi_loss are the Wilder averages an RSI is resumed from
+INDICATOR_COLUMNS = tuple(f"sma{window}" for window in SMA_WINDOWS) + (
+    "rsi",
+    "rsi_gain",
+    "rsi_loss",
+)
+
+
+def sma(values, window: int) -> np.ndarray:
+    """
+    simple moving average, NaN until `window` values have been seen
+    :param values: price series
+    :param window: number of values averaged
+    """
+    values = np.asarray(values, dtype=np.float64)
+    result = np.full(len(values), np.nan)
+    if window <= 0 or len(values) < window:
+        return result
+    sums = np.cumsum(values)
+    result[window - 1] = sums[window - 1]
+    result[window:] = sums[window:] - sums[:-window]
+    return result / window
+
+
+def _smooth(values: np.ndarray, alpha: float, seed: int) -> np.ndarray:
+    # exponential smoothing seeded with the mean of the first `seed` values
+    result = np.full(len(values), np.nan)
+    if len(values) < seed:
+        return result
+    current = values[:seed].mean()
+    result[seed - 1] = current
+    decay = 1 - alpha
+    if decay <= 0:
+        result[seed:] = values[seed:]
+        return result
+    # s[k] = decay ** (k + 1) * (s[-1] + alpha * sum(x[j] / decay ** (j + 1)))
+    # is a cumulative sum; blocks keep the weights within floating point range
+    block = max(1, int(np.log(_SMOOTH_RANGE) / -np.log(decay)))
+    powers = decay ** np.arange(1, block + 1)
+    for start in range(seed, len(values), block):
+        chunk = values[start : start + block]
+        scale = powers[: len(chunk)]
+        smoothed = scale * (current + alpha * np.cumsum(chunk / scale))
+        result[start : start + len(chunk)] = smoothed
+        current = smoothed[-1]
+    return result
+
+
+def ema(values, span: int) -> np.ndarray:
+    """
+    exponential moving average with alpha = 2 / (span + 1), seeded with the
+    SMA of the first `span` values
+    :param values: price series
+    :param span: number of values the average is centred on
+    """
+    return _smooth(np.asarray(values, dtype=np.float64), 2 / (span + 1), span)
+
+
+def vwap(high, low, close, volume) -> np.ndarray:
+    """
+    volume weighted average of the typical price since the first bar
+    """
+    typical = (
+        np.asarray(high, dtype=np.float64)
+        + np.asarray(low, dtype=np.float64)
+        + np.asarray(close, dtype=np.float64)
+    ) / 3
+    volume = np.asarray(volume, dtype=np.float64)
+    traded = np.cumsum(volume)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(traded > 0, np.cumsum(typical * volume) / traded, np.nan)
+
+
+def _wilder(values: np.ndarray, period: int) -> tuple:
+    # rsi with the smoothed gains and losses it came from, aligned to values
+    result = np.full(len(values), np.nan)
+    gain, loss = result.copy(), result.copy()
+    if len(values) <= period:
+        return result, gain, loss
+    change = np.diff(values)
+    gain[1:] = _smooth(np.clip(change, 0, None), 1 / period, period)
+    loss[1:] = _smooth(np.clip(-change, 0, None), 1 / period, period)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result[1:] = np.where(
+            loss[1:] == 0, 100.0, 100 - 100 / (1 + gain[1:] / loss[1:])
+        )
+    result[np.isnan(gain)] = np.nan
+    return result, gain, loss
+
+
+def rsi(values, period: int = 14) -> np.ndarray:
+    """
+    relative strength index with Wilder's smoothing, NaN for the first
+    `period` values
+    :param values: price series
+    :param period: smoothing period
+    """
+    return _wilder(np.asarray(values, dtype=np.float64), period)[0]
+
+
+def series_indicators(closes) -> dict:
+    """
+    every INDICATOR_COLUMNS indicator over a whole series; bars without a
+    close are skipped and get NaN
+    :param closes: closes with None or NaN for missing ones
+    :return: dict of column name to array as long as closes
+    """
+    closes = np.array(closes, dtype=np.float64)
+    valid = ~np.isnan(closes)
+    values = closes[valid]
+    computed = {f"sma{window}": sma(values, window) for window in SMA_WINDOWS}
+    computed["rsi"], computed["rsi_gain"], computed["rsi_loss"] = _wilder(
+        values, RSI_PERIOD
+    )
+    result = {}
+    for column in INDICATOR_COLUMNS:
+        result[column] = np.full(len(closes), np.nan)
+        result[column][valid] = computed[column]
+    return result
+
+
+class RollingSMA:
+    def __init__(self, window: int):
+        self.window = window
+        self._values = deque(maxlen=window)
+        self._sum = 0.0
+
+    def append(self, value: float) -> float:
+        """
+        :return: the average including value, NaN until the window is full
+        """
+        if len(self._values) == self.window:
+            self._sum -= self._values[0]
+        self._values.append(value)
+        self._sum += value
+        if len(self._values) < self.window:
+            return math.nan
+        return self._sum / self.window
+
+
+class _RollingSmooth:
+    def __init__(self, alpha: float, seed: int):
+        self.alpha = alpha
+        self._seed = seed
+        self._seen = 0
+        self._total = 0.0
+        self.value = math.nan
+
+    def resume(self, value: float):
+        """
+        continues from a seeded average instead of the values behind it
+        """
+        self._seen = self._seed
+        self.value = value
+
+    def append(self, value: float) -> float:
+        self._seen += 1
+        if self._seen <= self._seed:
+            self._total += value
+            if self._seen == self._seed:
+                self.value = self._total / self._seed
+        else:
+            self.value += self.alpha * (value - self.value)
+        return self.value
+
+
+class RollingEMA(_RollingSmooth):
+    def __init__(self, span: int):
+        super().__init__(2 / (span + 1), span)
+
+
+class RollingVWAP:
+    def __init__(self):
+        self._traded = 0.0
+        self._value = 0.0
+
+    def append(self, high: float, low: float, close: float, volume: float) -> float:
+        self._traded += volume
+        self._value += (high + low + close) / 3 * volume
+        return self._value / self._traded if self._traded else math.nan
+
+
+class RollingRSI:
+    def __init__(self, period: int = 14):
+        self._gain = _RollingSmooth(1 / period, period)
+        self._loss = _RollingSmooth(1 / period, period)
+        self._last = None
+
+    @property
+    def gain(self) -> float:
+        return self._gain.value
+
+    @property
+    def loss(self) -> float:
+        return self._loss.value
+
+    def resume(self, last: float, gain: float, loss: float):
+        """
+        :param last: the latest value seen
+        :param gain: Wilder average gain at that value
+        :param loss: Wilder average loss at that value
+        """
+        self._last = last
+        self._gain.resume(gain)
+        self._loss.resume(loss)
+
+    def append(self, value: float) -> float:
+        last, self._last = self._last, value
+        if last is None:
+            return math.nan
+        change = value - last
+        gain = self._gain.append(max(change, 0.0))
+        loss = self._loss.append(max(-change, 0.0))
+        if math.isnan(gain):
+            return math.nan
+        return 100.0 if loss == 0 else 100 - 100 / (1 + gain / loss)
+
+
+class IndicatorState:
+    """
+    INDICATOR_COLUMNS of one series advanced a bar at a time, matching what
+    series_indicators computes over the whole series
+    """
+
+    def __init__(self, closes=(), gain: float = None, loss: float = None):
+        """
+        :param closes: the series' closes so far, only the last max(SMA_WINDOWS)
+        are needed
+        :param gain: Wilder average gain at the last close, None replays closes
+        into the RSI instead, which needs all of them
+        :param loss: Wilder average loss at the last close
+        """
+        closes = list(closes)[-max(SMA_WINDOWS) :]
+        self._averages = [RollingSMA(window) for window in SMA_WINDOWS]
+        self._rsi = RollingRSI(RSI_PERIOD)
+        for close in closes:
+            for average in self._averages:
+                average.append(close)
+        if gain is None:
+            for close in closes:
+                self._rsi.append(close)
+        else:
+            self._rsi.resume(closes[-1], gain, loss)
+
+    def append(self, close: float) -> tuple:
+        """
+        :param close: the next bar's close, None or NaN for a bar without one
+        :return: the bar's values in INDICATOR_COLUMNS order
+        """
+        if close is None or math.isnan(close):
+            return (math.nan,) * len(INDICATOR_COLUMNS)
+        averages = tuple(average.append(close) for average in self._averages)
+        return averages + (self._rsi.append(close), self._rsi.gain, self._rsi.loss)
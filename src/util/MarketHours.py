@@ -0,0 +1,239 @@
+from collections import namedtuple
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Iterable
+
+from pytz import timezone
+
+OPEN = "open"
+EXTENDED = "extended"
+CLOSED = "closed"
+
+MON, TUE, WED, THU, FRI, SAT, SUN = range(7)
+
+Exchange = namedtuple(
+    "Exchange", ["name", "tz", "pre", "open", "close", "post", "holidays"]
+)
+
+
+def easter(year: int) -> date:
+    """
+    :return: Easter Sunday of the Gregorian year (anonymous Gregorian algorithm)
+    """
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = divmod(b, 4)
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """
+    :param n: 1 for the first such weekday of the month, -1 for the last
+    """
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def observed(day: date) -> date:
+    # a holiday on a weekend is taken on the nearest weekday
+    if day.weekday() == SAT:
+        return day - timedelta(days=1)
+    if day.weekday() == SUN:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year: int) -> dict:
+    """
+    :return: dict of date to closing time, None when closed all day
+    """
+    holidays = {
+        nth_weekday(year, 1, MON, 3): None,
+        nth_weekday(year, 2, MON, 3): None,
+        easter(year) - timedelta(days=2): None,
+        nth_weekday(year, 5, MON, -1): None,
+        observed(date(year, 7, 4)): None,
+        nth_weekday(year, 9, MON, 1): None,
+        nth_weekday(year, 11, THU, 4): None,
+        observed(date(year, 12, 25)): None,
+    }
+    # NYSE does not close on Dec 31 for a New Year's Day falling on Saturday
+    if date(year, 1, 1).weekday() != SAT:
+        holidays[observed(date(year, 1, 1))] = None
+    if year >= 2022:
+        holidays[observed(date(year, 6, 19))] = None
+    early = time(13, 0)
+    for day in (
+        date(year, 7, 3),
+        nth_weekday(year, 11, THU, 4) + timedelta(days=1),
+        date(year, 12, 24),
+    ):
+        if day.weekday() < SAT and day not in holidays:
+            holidays[day] = early
+    return holidays
+
+
+def tsx_holidays(year: int) -> dict:
+    """
+    :return: dict of date to closing time, None when closed all day
+    """
+    christmas, boxing_day = date(year, 12, 25), date(year, 12, 26)
+    if christmas.weekday() == SAT:
+        christmas, boxing_day = date(year, 12, 27), date(year, 12, 28)
+    elif christmas.weekday() == SUN:
+        christmas, boxing_day = date(year, 12, 26), date(year, 12, 27)
+    elif boxing_day.weekday() == SAT:
+        boxing_day = date(year, 12, 28)
+    new_year = date(year, 1, 1)
+    canada_day = date(year, 7, 1)
+    holidays = {
+        new_year + timedelta(days={SAT: 2, SUN: 1}.get(new_year.weekday(), 0)): None,
+        nth_weekday(year, 2, MON, 3): None,
+        easter(year) - timedelta(days=2): None,
+        # Victoria Day is the Monday before May 25
+        date(year, 5, 24) - timedelta(days=date(year, 5, 24).weekday()): None,
+        canada_day
+        + timedelta(days={SAT: 2, SUN: 1}.get(canada_day.weekday(), 0)): None,
+        nth_weekday(year, 8, MON, 1): None,
+        nth_weekday(year, 9, MON, 1): None,
+        nth_weekday(year, 10, MON, 2): None,
+        christmas: None,
+        boxing_day: None,
+    }
+    early = time(13, 0)
+    for day in (date(year, 12, 24), date(year, 12, 31)):
+        if day.weekday() < SAT and day not in holidays:
+            holidays[day] = early
+    return holidays
+
+
+EXCHANGES = {
+    "NYSE": Exchange(
+        "NYSE",
+        timezone("America/New_York"),
+        time(4, 0),
+        time(9, 30),
+        time(16, 0),
+        time(20, 0),
+        nyse_holidays,
+    ),
+    # Yahoo has no extended-hours quotes for TSX listings
+    "TSX": Exchange(
+        "TSX",
+        timezone("America/Toronto"),
+        None,
+        time(9, 30),
+        time(16, 0),
+        None,
+        tsx_holidays,
+    ),
+}
+
+
+@lru_cache(maxsize=64)
+def _holidays(exchange: str, year: int) -> dict:
+    return EXCHANGES[exchange].holidays(year)
+
+
+class MarketHours:
+    """
+    Session calendar for the exchanges the bot quotes, used to pick refresh
+    intervals and cache TTLs: short while a market trades, longer in pre and
+    post market, and while every market is closed, long enough to sleep
+    until the next session starts.
+    """
+
+    def __init__(self, exchanges: Iterable[str] = ("NYSE", "TSX")):
+        self.exchanges = [EXCHANGES[name] for name in exchanges]
+
+    def _boundaries(self, exchange: Exchange, day: date) -> list:
+        """
+        :return: list of (start, session) in local time for a trading day,
+        empty on weekends and holidays
+        """
+        if day.weekday() >= SAT:
+            return []
+        holidays = _holidays(exchange.name, day.year)
+        if day in holidays and holidays[day] is None:
+            return []
+        close = holidays.get(day) or exchange.close
+        post = exchange.post
+        if post and close != exchange.close:
+            # early closes end after-hours trading early as well
+            post = time(17, 0)
+        sessions = []
+        if exchange.pre:
+            sessions.append((exchange.pre, EXTENDED))
+        sessions.append((exchange.open, OPEN))
+        if post:
+            sessions.append((close, EXTENDED))
+        sessions.append((post or close, CLOSED))
+        return [
+            (exchange.tz.localize(datetime.combine(day, start)), session)
+            for start, session in sessions
+        ]
+
+    def _exchange_session(self, exchange: Exchange, now: datetime) -> tuple:
+        """
+        :return: tuple of the exchange's session at now and when it ends
+        """
+        local = now.astimezone(exchange.tz)
+        session = CLOSED
+        for offset in range(-1, 15):
+            for start, next_session in self._boundaries(
+                exchange, local.date() + timedelta(days=offset)
+            ):
+                if start > now:
+                    return session, start
+                session = next_session
+        return session, now + timedelta(days=14)
+
+    def session(self, now: datetime = None) -> str:
+        """
+        :return: OPEN if any exchange trades, EXTENDED if any is in pre or
+        post market, otherwise CLOSED
+        """
+        now = now or datetime.now(tz=self.exchanges[0].tz)
+        sessions = {self._exchange_session(e, now)[0] for e in self.exchanges}
+        for session in (OPEN, EXTENDED):
+            if session in sessions:
+                return session
+        return CLOSED
+
+    def until_change(self, now: datetime = None) -> float:
+        """
+        :return: seconds until any exchange's session changes
+        """
+        now = now or datetime.now(tz=self.exchanges[0].tz)
+        change = min(self._exchange_session(e, now)[1] for e in self.exchanges)
+        return (change - now).total_seconds()
+
+    def pick(
+        self,
+        open_value: float,
+        extended_value: float,
+        closed_max: float,
+        now: datetime = None,
+    ) -> float:
+        """
+        picks a refresh interval or TTL for the current session
+        :param open_value: used while any market trades
+        :param extended_value: used in pre and post market
+        :param closed_max: cap while every market is closed, where the value
+        otherwise lasts until the next session starts
+        """
+        now = now or datetime.now(tz=self.exchanges[0].tz)
+        session = self.session(now)
+        if session == OPEN:
+            return open_value
+        if session == EXTENDED:
+            return extended_value
+        return max(min(self.until_change(now), closed_max), open_value)
@@ -0,0 +1,184 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Callable
+
+import discord
+from discord.ext import tasks
+
+from src.util.TimerWheel import TimerWheel
+
+FIRST, PREVIOUS, NEXT, LAST, CLOSE = "⏮", "◀", "▶", "⏭", "❌"
+CONTROLS = (FIRST, PREVIOUS, NEXT, LAST, CLOSE)
+
+
+class PageSession:
+    def __init__(
+        self,
+        message: discord.Message,
+        user_id: int,
+        count: int,
+        render: Callable[[int], str],
+    ):
+        self.message = message
+        self.user_id = user_id
+        self.count = count
+        self.render = render
+        self.index = 0
+
+    def turn(self, emoji: str) -> int:
+        """
+        :return: page index the control leads to
+        """
+        return {
+            FIRST: 0,
+            PREVIOUS: max(self.index - 1, 0),
+            NEXT: min(self.index + 1, self.count - 1),
+            LAST: self.count - 1,
+        }.get(emoji, self.index)
+
+
+class ChannelQueue:
+    """
+    Pending message requests of one channel, which share Discord's rate
+    limit buckets. Requests are keyed, so a newer request for the same key
+    replaces the queued one instead of being sent after it.
+    """
+
+    def __init__(self):
+        self.pending = OrderedDict()
+        self.worker = None
+
+    def put(self, key: tuple, call: Callable):
+        self.pending[key] = call
+
+    def drop(self, message_id: int):
+        for key in [k for k in self.pending if k[1] == message_id]:
+            del self.pending[key]
+
+
+class Paginator:
+    """
+    Reaction controls for every paginated message, driven by the bot's
+    on_reaction_add events instead of a wait_for per message.
+    Sessions are looked up by message id, idle ones expire through a timer
+    wheel, and the edits and reaction removals they cause are queued per
+    channel: each channel's requests go out one at a time, and page turns
+    made while a request is in flight collapse into a single edit.
+    """
+
+    def __init__(self, timeout: float = 30.0, resolution: float = 1.0):
+        """
+        :param timeout: idle seconds before a session's controls are removed
+        :param resolution: seconds between expiry checks
+        """
+        self.sessions = {}
+        self.timeout = timeout
+        self._wheel = TimerWheel(time.monotonic(), resolution)
+        self._queues = {}
+        self.expire = tasks.loop(seconds=resolution)(self._expire)
+
+    async def start(
+        self,
+        message: discord.Message,
+        user_id: int,
+        count: int,
+        render: Callable[[int], str],
+    ):
+        """
+        adds page controls to a message showing page 0
+        :param user_id: only this user's reactions turn pages
+        :param count: number of pages
+        :param render: returns the message content of a page index
+        """
+        self.sessions[message.id] = PageSession(message, user_id, count, render)
+        self._wheel.schedule(message.id, time.monotonic() + self.timeout)
+        if not self.expire.is_running():
+            self.expire.start()
+        for emoji in CONTROLS:
+            await message.add_reaction(emoji)
+
+    async def on_reaction_add(self, reaction: discord.Reaction, user: discord.User):
+        session = self.sessions.get(reaction.message.id)
+        if session is None or user.id != session.user_id:
+            return
+        emoji = str(reaction.emoji)
+        if emoji == CLOSE:
+            return self.close(reaction.message.id)
+        self._wheel.schedule(session.message.id, time.monotonic() + self.timeout)
+        index = session.turn(emoji)
+        if index != session.index:
+            session.index = index
+            # rendered when sent, so only the latest page is drawn
+            self._submit(
+                session.message,
+                ("edit", session.message.id),
+                lambda: session.message.edit(content=session.render(session.index)),
+            )
+        self._submit(
+            session.message,
+            ("remove", session.message.id, emoji, user.id),
+            lambda: session.message.remove_reaction(reaction.emoji, user),
+        )
+
+    def close(self, message_id: int):
+        """
+        ends a session and removes its controls
+        """
+        session = self.sessions.pop(message_id, None)
+        if session is None:
+            return
+        self._wheel.cancel(message_id)
+        queue = self._queues.get(self._channel_id(session.message))
+        if queue:
+            queue.drop(message_id)
+        self._submit(
+            session.message,
+            ("clear", message_id),
+            session.message.clear_reactions,
+        )
+
+    async def flush(self):
+        """
+        waits until every queued request was sent
+        """
+        workers = [q.worker for q in self._queues.values() if q.worker]
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    @staticmethod
+    def _channel_id(message: discord.Message):
+        channel = getattr(message, "channel", None)
+        return getattr(channel, "id", None)
+
+    def _submit(self, message: discord.Message, key: tuple, call: Callable):
+        channel_id = self._channel_id(message)
+        queue = self._queues.get(channel_id)
+        if queue is None:
+            queue = self._queues[channel_id] = ChannelQueue()
+        queue.put(key, call)
+        if queue.worker is None:
+            queue.worker = asyncio.ensure_future(self._drain(channel_id, queue))
+
+    async def _drain(self, channel_id, queue: ChannelQueue):
+        try:
+            while queue.pending:
+                key, call = queue.pending.popitem(last=False)
+                try:
+                    await call()
+                except discord.NotFound:
+                    # the message is gone, so is its session
+                    self.sessions.pop(key[1], None)
+                    self._wheel.cancel(key[1])
+                    queue.drop(key[1])
+                except discord.HTTPException as e:
+                    print(f"paginator request failed: {e}")
+        finally:
+            queue.worker = None
+            if not queue.pending:
+                self._queues.pop(channel_id, None)
+
+    async def _expire(self):
+        for message_id in self._wheel.advance(time.monotonic()):
+            self.close(message_id)
+        if not self.sessions:
+            self.expire.stop()
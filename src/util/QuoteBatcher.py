@@ -0,0 +1,134 @@
+import threading
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List
+
+
+class QuoteBatcher:
+    """
+    Micro-batches quote lookups.
+    Every fetch arriving within `window` seconds of the first pending one is
+    merged into a single multi-symbol upstream request, and each caller gets
+    back only the quotes it asked for.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[List[str]], Dict[str, dict]],
+        executor: Executor,
+        window: float = 0.05,
+        max_batch: int = 100,
+        isolate_errors: tuple = (Exception,),
+        missing_error: Callable[[str], BaseException] = KeyError,
+    ):
+        """
+        :param loader: blocking callable taking symbols, returning {symbol: quote}
+        :param executor: executor the loader runs on
+        :param window: seconds to wait for more lookups before flushing
+        :param max_batch: symbols per upstream request; reaching it flushes early
+        :param isolate_errors: loader errors that trigger bisecting retries
+        :param missing_error: builds the error for a symbol the loader
+        returned no quote for
+        """
+        self._loader = loader
+        self._executor = executor
+        self._window = window
+        self._max_batch = max_batch
+        self._isolate_errors = isolate_errors
+        self._missing_error = missing_error
+        self._lock = threading.Lock()
+        self._pending = []
+        self._symbols = {}
+        self._timer = None
+        self.batches = 0
+        self.requests = 0
+        self.symbols_fetched = 0
+
+    def fetch(self, symbols: List[str]) -> Future:
+        """
+        queues symbols for the next batch
+        :param symbols: list of upper-cased ticker symbols
+        :return: future resolving to {symbol: quote} for exactly these symbols
+        """
+        future = Future()
+        with self._lock:
+            self.requests += 1
+            self._pending.append((symbols, future))
+            self._symbols.update(dict.fromkeys(symbols))
+            if len(self._symbols) >= self._max_batch:
+                self._flush_locked()
+            elif self._timer is None:
+                self._timer = threading.Timer(self._window, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+        return future
+
+    def flush(self):
+        with self._lock:
+            self._flush_locked()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "batches": self.batches,
+                "batched_requests": self.requests,
+                "average_batch_size": (
+                    self.symbols_fetched / self.batches if self.batches else 0.0
+                ),
+            }
+
+    def _flush_locked(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        pending = self._pending
+        self._pending, self._symbols = [], {}
+        chunk, waiters = {}, []
+        for symbols, future in pending:
+            new = [s for s in symbols if s not in chunk]
+            if waiters and len(chunk) + len(new) > self._max_batch:
+                self._submit(list(chunk), waiters)
+                chunk, waiters = {}, []
+            chunk.update(dict.fromkeys(symbols))
+            waiters.append((symbols, future))
+        self._submit(list(chunk), waiters)
+
+    def _submit(self, symbols: List[str], waiters: list):
+        self.batches += 1
+        self.symbols_fetched += len(symbols)
+        self._executor.submit(self._run, symbols, waiters)
+
+    def _run(self, symbols: List[str], waiters: list):
+        results, errors = {}, {}
+        try:
+            results = self._loader(symbols)
+        # financelite's DataRequestException derives from BaseException
+        except BaseException as e:
+            self._isolate(symbols, e, results, errors)
+        finally:
+            # every waiter is settled, whatever the loader raised
+            for wanted, future in waiters:
+                missing = [s for s in wanted if s not in results]
+                if missing:
+                    future.set_exception(
+                        errors.get(missing[0]) or self._missing_error(missing[0])
+                    )
+                else:
+                    future.set_result({s: results[s] for s in wanted})
+
+    def _isolate(self, symbols: List[str], error, results: dict, errors: dict):
+        """
+        one bad symbol fails a whole upstream request, so a failed request is
+        split in halves until the bad symbols are found: k bad symbols out of
+        n cost O(k log n) requests instead of n
+        """
+        if len(symbols) == 1 or not isinstance(error, self._isolate_errors):
+            errors.update(dict.fromkeys(symbols, error))
+            return
+        half = len(symbols) // 2
+        for part in (symbols[:half], symbols[half:]):
+            try:
+                results.update(self._loader(part))
+            except BaseException as part_error:
+                self._isolate(part, part_error, results, errors)
@@ -0,0 +1,154 @@
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from functools import partial
+from typing import Callable, Dict, List
+
+
+class QuoteCache:
+    """
+    Process-wide quote cache keyed by symbol.
+    Entries expire after a TTL chosen by ttl_func at insertion time, the least
+    recently used entry is evicted once max_size is exceeded, and concurrent
+    misses for the same symbol share one in-flight upstream fetch. A symbol
+    whose own fetch failed with one of cache_errors keeps failing from the
+    cache for error_ttl seconds instead of being fetched again.
+    Safe to use from the event loop and from worker threads alike.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[List[str]], Future],
+        ttl_func: Callable[[], float],
+        max_size: int = 1024,
+        clock: Callable[[], float] = time.monotonic,
+        cache_errors: tuple = (),
+        error_ttl: float = 0.0,
+    ):
+        """
+        :param fetch: takes symbols, returns a future resolving to {symbol: quote}
+        :param ttl_func: returns the TTL in seconds for entries stored now
+        :param max_size: maximum number of cached symbols
+        :param clock: monotonic time source
+        :param cache_errors: fetch errors that mark a symbol as failed
+        :param error_ttl: seconds a failed symbol is served its error
+        """
+        self._fetch = fetch
+        self._ttl_func = ttl_func
+        self._max_size = max_size
+        self._clock = clock
+        self._cache_errors = cache_errors
+        self._error_ttl = error_ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.fetches = 0
+
+    def get(self, symbols: List[str]) -> Dict[str, Future]:
+        """
+        looks up symbols, scheduling one upstream fetch for all misses
+        :param symbols: list of ticker symbols
+        :return: dict of upper-cased symbol to a future resolving to its quote
+        """
+        futures = {}
+        missing = []
+        now = self._clock()
+        with self._lock:
+            for symbol in symbols:
+                symbol = symbol.upper()
+                if symbol in futures:
+                    continue
+                entry = self._entries.get(symbol)
+                if entry and entry[0] > now:
+                    self._entries.move_to_end(symbol)
+                    self.hits += 1
+                    future = Future()
+                    if isinstance(entry[1], BaseException):
+                        future.set_exception(entry[1])
+                    else:
+                        future.set_result(entry[1])
+                elif symbol in self._in_flight:
+                    self.coalesced += 1
+                    future = self._in_flight[symbol]
+                else:
+                    self.misses += 1
+                    future = Future()
+                    self._in_flight[symbol] = future
+                    missing.append(symbol)
+                futures[symbol] = future
+            if missing:
+                self.fetches += 1
+        if missing:
+            self._fetch(missing).add_done_callback(partial(self._loaded, missing))
+        return futures
+
+    def get_one(self, symbol: str) -> Future:
+        return self.get([symbol])[symbol.upper()]
+
+    def invalidate(self, symbol: str = None):
+        with self._lock:
+            if symbol is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(symbol.upper(), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "in_flight": len(self._in_flight),
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "fetches": self.fetches,
+                "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+            }
+
+    def _loaded(self, symbols: List[str], fetched: Future):
+        error = fetched.exception()
+        if error is None:
+            return self.put(fetched.result(), resolve=symbols)
+        with self._lock:
+            futures = [self._in_flight.pop(s) for s in symbols]
+            # a batch of several symbols can fail for any one of them
+            if len(symbols) == 1 and isinstance(error, self._cache_errors):
+                self._store(symbols[0], self._clock() + self._error_ttl, error)
+        for future in futures:
+            future.set_exception(error)
+
+    def put(self, quotes: Dict[str, dict], resolve: List[str] = ()):
+        """
+        stores quotes and resolves the in-flight futures of the given symbols
+        :param quotes: dict of symbol to quote
+        :param resolve: symbols whose in-flight futures should be completed
+        """
+        quotes = {symbol.upper(): quote for symbol, quote in quotes.items()}
+        expires_at = self._clock() + self._ttl_func()
+        resolved = []
+        with self._lock:
+            for symbol, quote in quotes.items():
+                self._store(symbol, expires_at, quote)
+            for symbol in resolve:
+                future = self._in_flight.pop(symbol, None)
+                if future is not None:
+                    resolved.append((symbol, future, quotes.get(symbol)))
+        for symbol, future, quote in resolved:
+            if quote is None:
+                future.set_exception(KeyError(f"No quote returned for {symbol}"))
+            else:
+                future.set_result(quote)
+
+    def _store(self, symbol: str, expires_at: float, value):
+        # caller holds the lock
+        self._entries[symbol] = (expires_at, value)
+        self._entries.move_to_end(symbol)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
@@ -0,0 +1,130 @@
+import random
+from typing import Hashable, List, Optional
+
+
+class _Node:
+    __slots__ = ("key", "priority", "left", "right", "size")
+
+    def __init__(self, key: tuple):
+        self.key = key
+        self.priority = random.random()
+        self.left = None
+        self.right = None
+        self.size = 1
+
+
+def _size(node: Optional[_Node]) -> int:
+    return node.size if node else 0
+
+
+def _update(node: _Node) -> _Node:
+    node.size = 1 + _size(node.left) + _size(node.right)
+    return node
+
+
+def _split(node: Optional[_Node], key: tuple) -> tuple:
+    # nodes before key go left, the rest right
+    if node is None:
+        return None, None
+    if node.key < key:
+        left, right = _split(node.right, key)
+        node.right = left
+        return _update(node), right
+    left, right = _split(node.left, key)
+    node.left = right
+    return left, _update(node)
+
+
+def _merge(left: Optional[_Node], right: Optional[_Node]) -> Optional[_Node]:
+    if left is None or right is None:
+        return left or right
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        return _update(left)
+    right.left = _merge(left, right.left)
+    return _update(right)
+
+
+def _remove(node: Optional[_Node], key: tuple) -> Optional[_Node]:
+    if node is None:
+        return None
+    if key == node.key:
+        return _merge(node.left, node.right)
+    if key < node.key:
+        node.left = _remove(node.left, key)
+    else:
+        node.right = _remove(node.right, key)
+    return _update(node)
+
+
+class RankTree:
+    """
+    Order-statistic treap of members ranked by score, highest first, with
+    ties broken by member. Setting or removing a score and finding a
+    member's rank take O(log n); the top n are read in O(log n + n).
+    """
+
+    def __init__(self):
+        self._root = None
+        self._scores = {}
+
+    def __len__(self) -> int:
+        return len(self._scores)
+
+    def __contains__(self, member: Hashable) -> bool:
+        return member in self._scores
+
+    @staticmethod
+    def _key(member: Hashable, score: float) -> tuple:
+        return -score, member
+
+    def score(self, member: Hashable) -> Optional[float]:
+        return self._scores.get(member)
+
+    def set(self, member: Hashable, score: float):
+        """
+        inserts a member or moves it to its new score
+        """
+        if member in self._scores:
+            if self._scores[member] == score:
+                return
+            self.remove(member)
+        self._scores[member] = score
+        key = self._key(member, score)
+        left, right = _split(self._root, key)
+        self._root = _merge(_merge(left, _Node(key)), right)
+
+    def remove(self, member: Hashable):
+        score = self._scores.pop(member, None)
+        if score is not None:
+            self._root = _remove(self._root, self._key(member, score))
+
+    def rank(self, member: Hashable) -> Optional[int]:
+        """
+        :return: 1-based rank of the member, None when it has no score
+        """
+        if member not in self._scores:
+            return None
+        key = self._key(member, self._scores[member])
+        node, rank = self._root, 1
+        while node.key != key:
+            if key < node.key:
+                node = node.left
+            else:
+                rank += _size(node.left) + 1
+                node = node.right
+        return rank + _size(node.left)
+
+    def top(self, n: int) -> List[tuple]:
+        """
+        :return: list of (member, score) of the n best ranked members
+        """
+        ranked, stack, node = [], [], self._root
+        while (stack or node) and len(ranked) < n:
+            while node:
+                stack.append(node)
+                node = node.left
+            node = stack.pop()
+            ranked.append((node.key[1], -node.key[0]))
+            node = node.right
+        return ranked
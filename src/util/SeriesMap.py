@@ -0,0 +1,133 @@
+import json
+import os
+import threading
+from collections import namedtuple
+
+import numpy as np
+
+MAGIC = b"SBSERIE2"
+# column name and dtype, stored one after the other in this order
+LAYOUT = (
+    ("Timestamp", np.int64),
+    ("Open", np.float64),
+    ("High", np.float64),
+    ("Low", np.float64),
+    ("Close", np.float64),
+    ("Volume", np.int64),
+    ("SMA50", np.float64),
+    ("SMA100", np.float64),
+    ("SMA200", np.float64),
+)
+
+# what a render worker needs to find a published series: the file and the
+# first and last bar of the chart it was published for
+SeriesRef = namedtuple("SeriesRef", ["path", "start", "end"])
+
+
+class SeriesMap:
+    """
+    Processed OHLCV series persisted as fixed-layout files that any process
+    can memory-map and read without copying: a header holding the bar count
+    and the chart meta, then one contiguous column per LAYOUT entry.
+    One file holds the longest series seen per (symbol, interval); updates
+    write a new file next to it and rename it into place, so readers always
+    see either the old or the new series in full.
+    """
+
+    def __init__(self, directory: str, max_open: int = 64):
+        """
+        :param directory: where series files are kept
+        :param max_open: maps kept open per process
+        """
+        # absolute, so render workers resolve the same files
+        self._directory = os.path.abspath(directory)
+        self._max_open = max_open
+        self._lock = threading.Lock()
+        self._maps = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self._directory, f"{symbol.upper()}-{interval}.bin")
+
+    def publish(self, symbol: str, interval: str, meta: dict, columns: dict):
+        """
+        merges freshly processed bars into the stored series; stored bars
+        from the first new bar on are replaced
+        :param meta: chart meta to keep with the series
+        :param columns: dict of LAYOUT column name to array
+        :return: SeriesRef to the bars that were published
+        """
+        timestamps = np.asarray(columns["Timestamp"], dtype=np.int64)
+        path = self.path(symbol, interval)
+        with self._lock:
+            try:
+                stored = self.read(path)
+            except ValueError:
+                # written with an older layout, replaced as a whole
+                stored = None
+            merged = {name: np.asarray(columns[name], dtype) for name, dtype in LAYOUT}
+            if stored is not None and len(timestamps):
+                old = stored[1]
+                keep = np.searchsorted(old["Timestamp"], timestamps[0])
+                if keep:
+                    merged = {
+                        name: np.concatenate([old[name][:keep], merged[name]])
+                        for name, _ in LAYOUT
+                    }
+            self._write(path, meta, merged)
+        if not len(timestamps):
+            return SeriesRef(path, 0, -1)
+        return SeriesRef(path, int(timestamps[0]), int(timestamps[-1]))
+
+    def _write(self, path: str, meta: dict, columns: dict):
+        raw_meta = json.dumps(meta).encode()
+        raw_meta += b" " * (-len(raw_meta) % 8)
+        count = len(columns["Timestamp"])
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.array([count, len(raw_meta)], dtype=np.int64).tobytes())
+            f.write(raw_meta)
+            for name, dtype in LAYOUT:
+                f.write(np.ascontiguousarray(columns[name], dtype=dtype).tobytes())
+        os.replace(tmp, path)
+
+    def read(self, path: str):
+        """
+        maps a series file, reusing the map until the file is replaced
+        :return: tuple of meta and dict of read-only column arrays, None when
+        the file does not exist
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        cached = self._maps.get(path)
+        if cached and cached[0] == version:
+            return cached[1]
+        data = np.memmap(path, dtype=np.uint8, mode="r")
+        if bytes(data[:8]) != MAGIC:
+            raise ValueError(f"{path} is not a series file")
+        count, meta_size = data[8:24].view(np.int64)
+        offset = 24 + meta_size
+        meta = json.loads(bytes(data[24:offset]))
+        columns = {}
+        for name, dtype in LAYOUT:
+            size = count * np.dtype(dtype).itemsize
+            columns[name] = data[offset : offset + size].view(dtype)
+            offset += size
+        if len(self._maps) >= self._max_open:
+            self._maps.pop(next(iter(self._maps)))
+        self._maps[path] = version, (meta, columns)
+        return meta, columns
+
+    def slice(self, ref: SeriesRef):
+        """
+        :return: tuple of meta and column views covering the referenced bars
+        """
+        meta, columns = self.read(ref.path)
+        timestamps = columns["Timestamp"]
+        start = np.searchsorted(timestamps, ref.start)
+        end = np.searchsorted(timestamps, ref.end, side="right")
+        return meta, {name: values[start:end] for name, values in columns.items()}
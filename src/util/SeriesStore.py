@@ -0,0 +1,279 @@
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+from src.util.Indicators import (
+    INDICATOR_COLUMNS,
+    SMA_WINDOWS,
+    IndicatorState,
+    series_indicators,
+)
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+# before any bar, so a series fetched with range=max covers every start
+EARLIEST = -(2**62)
+# indicators returned with the bars, the rest only resume a series
+TECHNICAL = tuple(f"sma{window}" for window in SMA_WINDOWS) + ("rsi",)
+
+
+class SeriesStore:
+    """
+    Local store of OHLCV bars per (symbol, interval), kept in one SQLite file
+    so fetched history survives restarts. Each series remembers the earliest
+    time it is known to be complete from, so a later request inside that span
+    only needs the bars after the last stored one. The INDICATOR_COLUMNS of
+    every bar are stored next to it and advanced from the previous bar's when a
+    tail is appended.
+    """
+
+    def __init__(self, path: str):
+        """
+        :param path: SQLite file, created on first use
+        """
+        self._path = path
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self._path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self._path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript("""
+                CREATE TABLE IF NOT EXISTS series (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    covered_from INTEGER NOT NULL,
+                    last_ts INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    meta TEXT NOT NULL,
+                    PRIMARY KEY (symbol, interval)
+                );
+                CREATE TABLE IF NOT EXISTS bars (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL,
+                    volume INTEGER,
+                    PRIMARY KEY (symbol, interval, ts)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS indicators (
+                    symbol TEXT NOT NULL,
+                    interval TEXT NOT NULL,
+                    ts INTEGER NOT NULL,
+                    %s,
+                    PRIMARY KEY (symbol, interval, ts)
+                ) WITHOUT ROWID;
+                """ % ", ".join(f"{column} REAL" for column in INDICATOR_COLUMNS))
+            self._connection = connection
+        return self._connection
+
+    def coverage(self, symbol: str, interval: str) -> Optional[tuple]:
+        """
+        :return: tuple of covered_from, last_ts and fetched_at, None when the
+        series was never stored
+        """
+        with self._lock:
+            return (
+                self._connect()
+                .execute(
+                    "SELECT covered_from, last_ts, fetched_at FROM series "
+                    "WHERE symbol = ? AND interval = ?",
+                    (symbol, interval),
+                )
+                .fetchone()
+            )
+
+    def close_at(self, symbol: str, interval: str, ts: int) -> Optional[float]:
+        with self._lock:
+            row = (
+                self._connect()
+                .execute(
+                    "SELECT close FROM bars "
+                    "WHERE symbol = ? AND interval = ? AND ts = ?",
+                    (symbol, interval, ts),
+                )
+                .fetchone()
+            )
+        return row[0] if row else None
+
+    def write(
+        self,
+        symbol: str,
+        interval: str,
+        chart: dict,
+        fetched_at: float,
+        covered_from: int = None,
+    ):
+        """
+        stores the bars of a fetched chart
+        :param chart: chart dict from Stock.get_chart
+        :param fetched_at: epoch of the fetch
+        :param covered_from: epoch the chart is complete from, which replaces
+        the whole stored series; None appends the chart as a tail, replacing
+        stored bars from its first bar on since the newest one may still have
+        been forming
+        """
+        result = chart.get("result")[-1]
+        timestamps = result.get("timestamp") or []
+        quote = result.get("indicators").get("quote")[-1]
+        rows = list(
+            zip(
+                [symbol] * len(timestamps),
+                [interval] * len(timestamps),
+                timestamps,
+                *(quote.get(column) for column in COLUMNS),
+            )
+        )
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                stored = connection.execute(
+                    "SELECT covered_from, last_ts FROM series "
+                    "WHERE symbol = ? AND interval = ?",
+                    (symbol, interval),
+                ).fetchone()
+                since = timestamps[0] if timestamps else None
+                if covered_from is not None:
+                    self._delete(connection, symbol, interval, EARLIEST)
+                    last_ts = timestamps[-1] if timestamps else covered_from
+                    since = EARLIEST
+                elif stored and timestamps:
+                    covered_from = stored[0]
+                    self._delete(connection, symbol, interval, since)
+                    last_ts = timestamps[-1]
+                elif stored:
+                    covered_from, last_ts = stored
+                else:
+                    return
+                connection.executemany(
+                    "INSERT INTO bars VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                if rows:
+                    self._index(connection, symbol, interval, since)
+                connection.execute(
+                    "INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?, ?)",
+                    (
+                        symbol,
+                        interval,
+                        covered_from,
+                        last_ts,
+                        fetched_at,
+                        json.dumps(result.get("meta")),
+                    ),
+                )
+
+    @staticmethod
+    def _index(connection, symbol: str, interval: str, since: int):
+        # indicators of the bars from since on, resumed from the bars before
+        previous = connection.execute(
+            "SELECT b.close, i.rsi_gain, i.rsi_loss FROM bars b "
+            "LEFT JOIN indicators i USING (symbol, interval, ts) "
+            "WHERE b.symbol = ? AND b.interval = ? AND b.ts < ? "
+            "AND b.close IS NOT NULL ORDER BY b.ts DESC LIMIT ?",
+            (symbol, interval, since, max(SMA_WINDOWS)),
+        ).fetchall()
+        if previous and previous[0][1] is None:
+            # RSI not seeded yet, or bars stored before indicators were
+            connection.execute(
+                "DELETE FROM indicators WHERE symbol = ? AND interval = ?",
+                (symbol, interval),
+            )
+            since = EARLIEST
+        bars = connection.execute(
+            "SELECT ts, close FROM bars WHERE symbol = ? AND interval = ? "
+            "AND ts >= ? ORDER BY ts",
+            (symbol, interval, since),
+        ).fetchall()
+        if since == EARLIEST or not previous:
+            columns = series_indicators([close for _, close in bars]).values()
+            values = zip(*(column.tolist() for column in columns))
+        else:
+            state = IndicatorState(
+                [close for close, _, _ in reversed(previous)], *previous[0][1:]
+            )
+            values = (state.append(close) for _, close in bars)
+        connection.executemany(
+            f"INSERT INTO indicators VALUES "
+            f"(?, ?, ?, {', '.join('?' * len(INDICATOR_COLUMNS))})",
+            ((symbol, interval, ts, *row) for (ts, _), row in zip(bars, values)),
+        )
+
+    @staticmethod
+    def _delete(connection, symbol: str, interval: str, since: int):
+        for table in ("bars", "indicators"):
+            connection.execute(
+                f"DELETE FROM {table} WHERE symbol = ? AND interval = ? AND ts >= ?",
+                (symbol, interval, since),
+            )
+
+    def drop(self, symbol: str, interval: str):
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                self._delete(connection, symbol, interval, EARLIEST)
+                connection.execute(
+                    "DELETE FROM series WHERE symbol = ? AND interval = ?",
+                    (symbol, interval),
+                )
+
+    def read(
+        self, symbol: str, interval: str, start: int = None, bars: int = None
+    ) -> Optional[dict]:
+        """
+        :param start: epoch of the first bar returned, None for all of them
+        :param bars: only return the newest `bars` bars
+        :return: chart dict shaped like Stock.get_chart's output with the
+        stored TECHNICAL indicators added under indicators.technical, None
+        when the series was never stored
+        """
+        query = (
+            "SELECT ts, open, high, low, close, volume, %s FROM bars "
+            "LEFT JOIN indicators USING (symbol, interval, ts) "
+            "WHERE symbol = ? AND interval = ? AND ts >= ? ORDER BY ts"
+        ) % ", ".join(TECHNICAL)
+        params = (symbol, interval, start if start is not None else EARLIEST)
+        if bars:
+            query = f"SELECT * FROM ({query} DESC LIMIT ?) ORDER BY ts"
+            params += (bars,)
+        with self._lock:
+            connection = self._connect()
+            meta = connection.execute(
+                "SELECT meta FROM series WHERE symbol = ? AND interval = ?",
+                (symbol, interval),
+            ).fetchone()
+            if meta is None:
+                return None
+            rows = connection.execute(query, params).fetchall()
+        columns = list(zip(*rows)) or [()] * (1 + len(COLUMNS) + len(TECHNICAL))
+        quote, technical = columns[1 : 1 + len(COLUMNS)], columns[1 + len(COLUMNS) :]
+        return {
+            "result": [
+                {
+                    "meta": json.loads(meta[0]),
+                    "timestamp": list(columns[0]),
+                    "indicators": {
+                        "quote": [
+                            {
+                                column: list(values)
+                                for column, values in zip(COLUMNS, quote)
+                            }
+                        ],
+                        "technical": [
+                            {
+                                column: list(values)
+                                for column, values in zip(TECHNICAL, technical)
+                            }
+                        ],
+                    },
+                }
+            ],
+            "error": None,
+        }
@@ -0,0 +1,58 @@
+import math
+from typing import Hashable, List
+
+
+class TimerWheel:
+    """
+    Hashed timer wheel: deadlines are bucketed into ticks of `resolution`
+    seconds laid out on a ring of slots. Scheduling, rescheduling and
+    cancelling are O(1), and advancing only visits the slots of the ticks
+    passed since the last advance, whatever the number of pending timers.
+    """
+
+    def __init__(self, now: float, resolution: float = 1.0, slots: int = 64):
+        """
+        :param now: current time on the clock deadlines are given in
+        :param resolution: seconds per tick; timers fire up to one tick late
+        :param slots: number of slots on the ring
+        """
+        self.resolution = resolution
+        self._slots = [dict() for _ in range(slots)]
+        self._ticks = {}
+        self._tick = math.floor(now / resolution)
+
+    def __len__(self) -> int:
+        return len(self._ticks)
+
+    def schedule(self, key: Hashable, deadline: float):
+        """
+        sets the key's timer, replacing any it had
+        """
+        self.cancel(key)
+        # a past deadline fires at the next tick
+        tick = max(math.ceil(deadline / self.resolution), self._tick + 1)
+        self._ticks[key] = tick
+        self._slots[tick % len(self._slots)][key] = tick
+
+    def cancel(self, key: Hashable):
+        tick = self._ticks.pop(key, None)
+        if tick is not None:
+            del self._slots[tick % len(self._slots)][key]
+
+    def advance(self, now: float) -> List[Hashable]:
+        """
+        :return: keys whose deadline passed, removed from the wheel
+        """
+        target = math.floor(now / self.resolution)
+        expired = []
+        # past a full turn every slot is visited once
+        first = max(self._tick + 1, target - len(self._slots) + 1)
+        for tick in range(first, target + 1):
+            slot = self._slots[tick % len(self._slots)]
+            due = [key for key, at in slot.items() if at <= target]
+            for key in due:
+                del slot[key]
+                del self._ticks[key]
+            expired += due
+        self._tick = max(self._tick, target)
+        return expired
@@ -0,0 +1,117 @@
+"""
+Portfolio valuation.
+
+Positions and their quotes are turned into parallel NumPy arrays and valued in
+one vectorized pass: live totals, P/L, P/L% and per-currency aggregates.
+Nothing here formats; callers render the arrays however they display them.
+"""
+
+from typing import List, Sequence
+
+import numpy as np
+
+# index of each currency in the per-currency aggregates; anything that is
+# not USD is booked as CAD, the only other currency positions can be bought in
+CURRENCIES = ("USD", "CAD")
+
+
+def currency_codes(currencies: List[str]) -> np.ndarray:
+    """
+    :return: array of indexes into CURRENCIES
+    """
+    return np.array([c != "USD" for c in currencies], dtype=np.intp)
+
+
+class Valuation:
+    """
+    Valued positions as parallel arrays, one element per position.
+    """
+
+    def __init__(
+        self,
+        symbols: Sequence[str],
+        amount,
+        book_value,
+        average,
+        live,
+        currency,
+    ):
+        """
+        :param symbols: sequence of the symbol of each position
+        :param amount: shares held
+        :param book_value: total price paid
+        :param average: average price paid per share
+        :param live: live price per share
+        :param currency: indexes into CURRENCIES, see currency_codes
+        """
+        self.symbols = symbols
+        self.amount = np.asarray(amount, dtype=np.int64)
+        self.book_value = np.asarray(book_value, dtype=np.float64)
+        self.average = np.asarray(average, dtype=np.float64)
+        self.live = np.asarray(live, dtype=np.float64)
+        self.currency = np.asarray(currency, dtype=np.intp)
+        self.live_total = self.live * self.amount
+        self.pl = self.live_total - self.book_value
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.pl_percent = np.where(
+                self.book_value != 0, self.pl / self.book_value * 100, 0.0
+            )
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def slice(self, start: int, stop: int) -> "Valuation":
+        """
+        :return: Valuation of the positions from start up to stop
+        """
+        return Valuation(
+            self.symbols[start:stop],
+            self.amount[start:stop],
+            self.book_value[start:stop],
+            self.average[start:stop],
+            self.live[start:stop],
+            self.currency[start:stop],
+        )
+
+    def by_currency(self) -> tuple:
+        """
+        :return: tuple of book value and live total arrays, indexed like
+        CURRENCIES
+        """
+        return self.by_group(self.currency, len(CURRENCIES))
+
+    def by_group(self, groups, size: int, rates=None) -> tuple:
+        """
+        sums book values and live totals per group
+        :param groups: group index of each position
+        :param size: number of groups
+        :param rates: optional array indexed like CURRENCIES that converts
+        each currency into a common one before summing
+        :return: tuple of book value and live total arrays, indexed by group
+        """
+        book_value, live_total = self.book_value, self.live_total
+        if rates is not None:
+            rate = np.asarray(rates, dtype=np.float64)[self.currency]
+            book_value, live_total = book_value * rate, live_total * rate
+        return (
+            np.bincount(groups, weights=book_value, minlength=size),
+            np.bincount(groups, weights=live_total, minlength=size),
+        )
+
+
+def value_positions(pos_dict: dict, live_info: List[dict]) -> Valuation:
+    """
+    :param pos_dict: dict of symbol to book_value, average and amount, as
+    returned by positions.load_positions
+    :param live_info: quotes with symbol, regularMarketPrice and currency
+    """
+    symbols = [info.get("symbol") for info in live_info]
+    positions = [pos_dict[symbol] for symbol in symbols]
+    return Valuation(
+        symbols,
+        amount=[p["amount"] for p in positions],
+        book_value=[p["book_value"] for p in positions],
+        average=[p["average"] for p in positions],
+        live=[info.get("regularMarketPrice") for info in live_info],
+        currency=currency_codes([info.get("currency") for info in live_info]),
+    )
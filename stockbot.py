@@ -6,11 +6,16 @@ from src.util.SentryHelper import uncaught
 from src.database import connect
 from src.cogs.positions_cog import Positions
 from src.cogs.information_cog import Information
+from src.cogs.alerts_cog import Alerts
+from src.util.GraphHandler import start_renderers
+from src.asynctasks import movers_snapshot, alert_engine, refresh_forex, paginator
 import sentry_sdk
 
 TOKEN = os.getenv("TOKEN")
 DATABASE_URL = os.getenv("DATABASE_URL")
 SENTRY_DSN = os.getenv("SENTRY_DSN")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
 dev_prefix = os.getenv("DEV_PREFIX")
 prefix = "!" if not dev_prefix else dev_prefix
 bot = commands.Bot(
@@ -32,13 +37,25 @@ async def on_command_error(ctx, error: Exception):
 @bot.event
 async def on_ready():
     sentry_sdk.init(SENTRY_DSN, traces_sample_rate=1.0)
-    connect(DATABASE_URL)
+    start_renderers()
+    if not movers_snapshot.refresh.is_running():
+        movers_snapshot.refresh.start()
+    if not refresh_forex.is_running():
+        refresh_forex.start()
+    await alert_engine.start(bot)
     await bot.change_presence(activity=discord.Game(f"{prefix}help"))
     print("We are online!")
     print("Name: {}".format(bot.user.name))
     print("ID: {}".format(bot.user.id))
 
 
-bot.add_cog(Positions(bot))
-bot.add_cog(Information(bot))
-bot.run(TOKEN)
+if __name__ == "__main__":
+    # chart render workers are spawned processes that re-import this module
+    # on_ready fires again after every reconnect, so the database connects
+    # and migrates once here, before the event loop runs
+    connect(DATABASE_URL, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+    bot.add_cog(Positions(bot))
+    bot.add_cog(Information(bot))
+    bot.add_cog(Alerts(bot))
+    bot.add_listener(paginator.on_reaction_add, "on_reaction_add")
+    bot.run(TOKEN)
@@ -58,3 +58,19 @@ def runbot(c):
     Runs the bot
     """
     compose(c, "exec stockbot python /apps/stockbot/stockbot.py")
+
+
+@invoke.task
+def migrate(c):
+    """
+    Upgrades the database schema to the latest version
+    """
+    compose(c, "exec stockbot python -m src.migrations")
+
+
+@invoke.task
+def rebuild_positions(c):
+    """
+    Rebuilds every position by replaying the trade ledger
+    """
+    compose(c, "exec stockbot python -m src.ledger")
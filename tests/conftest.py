@@ -0,0 +1,78 @@
+from src import marketdata
+from src.database import connect
+import src.database as db
+import math
+import pytest
+
+# live price and currency of each symbol the database fixture serves
+PRICES = {"GME": (100.0, "USD"), "BB": (10.0, "CAD")}
+
+
+def build_chart(bars: int = 300, interval: int = 300, start: int = 1622640600):
+    """
+    builds a chart dict shaped like Stock.get_chart's output
+    :param bars: number of bars
+    :param interval: seconds between bars
+    :param start: epoch of the first bar
+    """
+    closes = [100 + 10 * math.sin(i / 15) + i * 0.05 for i in range(bars)]
+    opens = [closes[i - 1] if i else closes[0] - 0.5 for i in range(bars)]
+    return {
+        "result": [
+            {
+                "meta": {
+                    "currency": "USD",
+                    "symbol": "GME",
+                    "exchangeTimezoneName": "America/New_York",
+                    "timezone": "EDT",
+                },
+                "timestamp": [start + i * interval for i in range(bars)],
+                "indicators": {
+                    "quote": [
+                        {
+                            "open": opens,
+                            "close": closes,
+                            "high": [max(o, c) + 0.3 for o, c in zip(opens, closes)],
+                            "low": [min(o, c) - 0.3 for o, c in zip(opens, closes)],
+                            "volume": [1000 + (i * 37) % 500 for i in range(bars)],
+                        }
+                    ]
+                },
+            }
+        ],
+        "error": None,
+    }
+
+
+@pytest.fixture
+def chart():
+    return build_chart
+
+
+@pytest.fixture
+def prices():
+    """
+    prices served by the database fixture; parametrize prices to override
+    """
+    return dict(PRICES)
+
+
+@pytest.fixture
+def database(tmp_path, monkeypatch, prices):
+    """
+    connects a fresh sqlite database and serves live prices from prices
+    """
+
+    async def get_live(symbol):
+        return prices[symbol.upper()]
+
+    async def get_quotes(symbols, cherrypicks=None):
+        return [
+            {"symbol": s, "regularMarketPrice": prices[s][0], "currency": prices[s][1]}
+            for s in symbols
+        ]
+
+    connect(f"sqlite:///{tmp_path / 'stockbot.db'}")
+    monkeypatch.setattr(db, "symbol_cache", db.SymbolCache())
+    monkeypatch.setattr(marketdata, "get_live", get_live)
+    monkeypatch.setattr(marketdata, "get_quotes", get_quotes)
@@ -0,0 +1,94 @@
+from src import alerts
+from src.asynctasks import AlertEngine
+from src.util.AlertBook import ABOVE, BELOW, Alert, AlertBook
+import asyncio
+import pytest
+
+ALERT_PRICES = [{"GME": (40.0, "USD")}]
+
+
+class FakeUser:
+    def __init__(self):
+        self.sent = []
+
+    async def send(self, embed):
+        self.sent.append(embed)
+
+
+class FakeBot:
+    def __init__(self):
+        self.users = {}
+
+    def get_user(self, user_id):
+        return self.users.setdefault(user_id, FakeUser())
+
+
+def test_book_fires_crossed_thresholds_only():
+    book = AlertBook()
+    book.add(Alert(1, "7", "GME", ABOVE, 50.0))
+    book.add(Alert(2, "7", "GME", ABOVE, 45.0))
+    book.add(Alert(3, "7", "GME", BELOW, 30.0))
+    book.add(Alert(4, "8", "GME", BELOW, 35.0))
+    book.add(Alert(5, "8", "BB", ABOVE, 10.0))
+    assert [a.alert_id for a in book.trigger("GME", 40.0)] == []
+    assert [a.alert_id for a in book.trigger("GME", 45.0)] == [2]
+    assert [a.alert_id for a in book.trigger("GME", 32.0)] == [4]
+    assert book.symbols() == ["GME", "BB"]
+    book.remove(1)
+    assert [a.alert_id for a in book.trigger("GME", 60.0)] == []
+    assert [a.alert_id for a in book.trigger("GME", 10.0)] == [3]
+    assert book.symbols() == ["BB"] and len(book) == 1
+
+
+def test_book_handles_equal_thresholds():
+    book = AlertBook()
+    for alert_id in range(1000):
+        book.add(Alert(alert_id, "7", "GME", BELOW, 30.0 + alert_id % 10))
+    book.remove(5)
+    fired = book.trigger("GME", 35.0)
+    assert len(fired) == 499 and all(a.price >= 35.0 for a in fired)
+    assert len(book) == 500
+
+
+@pytest.mark.parametrize("prices", ALERT_PRICES)
+def test_create_list_and_cancel(database):
+    above, _, _ = asyncio.run(alerts.create_alert("7", "tester", "gme", 50.0))
+    below, live, currency = asyncio.run(alerts.create_alert("7", "tester", "GME", 30.0))
+    assert (above.direction, below.direction) == (ABOVE, BELOW)
+    assert (live, currency) == (40.0, "USD")
+    assert asyncio.run(alerts.get_alerts("7")) == [above, below]
+    assert asyncio.run(alerts.get_alerts("8")) == []
+    with pytest.raises(alerts.AlertNotFound):
+        asyncio.run(alerts.cancel_alert("8", above.alert_id))
+    asyncio.run(alerts.cancel_alert("7", above.alert_id))
+    assert asyncio.run(alerts.get_alerts("7")) == [below]
+
+
+@pytest.mark.parametrize("prices", ALERT_PRICES)
+def test_alert_limit(database, monkeypatch):
+    monkeypatch.setattr(alerts, "MAX_ALERTS_PER_USER", 2)
+    asyncio.run(alerts.create_alert("7", "tester", "GME", 50.0))
+    asyncio.run(alerts.create_alert("7", "tester", "GME", 60.0))
+    with pytest.raises(alerts.TooManyAlerts):
+        asyncio.run(alerts.create_alert("7", "tester", "GME", 70.0))
+
+
+@pytest.mark.parametrize("prices", ALERT_PRICES)
+def test_engine_fires_and_messages(database):
+    async def scenario():
+        engine = AlertEngine()
+        first, _, _ = await alerts.create_alert("7", "tester", "GME", 50.0)
+        await alerts.create_alert("8", "other", "GME", 30.0)
+        bot = FakeBot()
+        await engine.start(bot)
+        engine.refresh.cancel()
+        assert await engine.check({"GME": 45.0}) == []
+        fired = await engine.check({"GME": 51.0})
+        return bot, first, fired
+
+    bot, first, fired = asyncio.run(scenario())
+    assert fired == [first]
+    assert len(bot.users[7].sent) == 1 and 8 not in bot.users
+    assert "GME" in bot.users[7].sent[0].description
+    assert [a.user_id for a in asyncio.run(alerts.get_alerts("8"))] == ["8"]
+    assert asyncio.run(alerts.get_alerts("7")) == []
@@ -0,0 +1,71 @@
+import os
+from src.util.ChartCache import ChartCache
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_chart_cache_request_ttl(chart):
+    clock = FakeClock()
+    cache = ChartCache(clock=clock)
+    key = cache.content_key("gme", "1d", "5m", chart(), "style")
+    assert cache.get_fresh("GME", "1d", "5m", "style") is None
+    cache.put(key, b"png", "gme", "1d", "5m", "style")
+    assert cache.get_fresh("GME", "1d", "5m", "style") == b"png"
+    clock.now = 61
+    assert cache.get_fresh("GME", "1d", "5m", "style") is None
+    assert cache.get(key) == b"png"
+    assert cache.stats()["hits"] == 1 and cache.stats()["content_hits"] == 1
+
+
+def test_chart_cache_content_key_tracks_last_bar(chart):
+    key = ChartCache.content_key("gme", "1d", "5m", chart(bars=10), "style")
+    assert key == ChartCache.content_key("GME", "1d", "5m", chart(bars=10), "style")
+    assert key != ChartCache.content_key("gme", "1d", "5m", chart(bars=11), "style")
+    assert key != ChartCache.content_key("gme", "1d", "5m", chart(bars=10), "other")
+
+
+def test_chart_cache_evicts_by_bytes():
+    cache = ChartCache(max_bytes=10)
+    cache.put("a", b"123456", "a", "1d", "5m", "s")
+    cache.put("b", b"123456", "b", "1d", "5m", "s")
+    assert cache.get("a") is None
+    assert cache.get("b") == b"123456"
+    assert cache.stats()["bytes_held"] == 6
+
+
+def test_chart_cache_disk_tier(tmp_path):
+    ChartCache(directory=str(tmp_path)).put("a", b"png", "a", "1d", "5m", "s")
+    cache = ChartCache(directory=str(tmp_path))
+    assert cache.get("a") == b"png"
+    assert cache.stats()["disk_hits"] == 1
+
+
+def test_chart_cache_sweeps_expired_requests():
+    clock = FakeClock()
+    cache = ChartCache(clock=clock)
+    for i in range(1023):
+        cache.put("a", b"png", f"s{i}", "1d", "5m", "s")
+    clock.now = 61
+    # the 1024th request sweeps the expired ones
+    cache.put("a", b"png", "gme", "1d", "5m", "s")
+    assert len(cache._index) == 1
+    assert cache.get_fresh("GME", "1d", "5m", "s") == b"png"
+
+
+def test_chart_cache_prunes_least_recently_read(tmp_path):
+    cache = ChartCache(max_bytes=4, directory=str(tmp_path), max_disk_bytes=9)
+    assert not any(tmp_path.iterdir())
+    cache.put("old", b"1234", "a", "1d", "5m", "s")
+    cache.put("new", b"1234", "b", "1d", "5m", "s")
+    os.utime(tmp_path / "old.png", (1, 1))
+    os.utime(tmp_path / "new.png", (2, 2))
+    # read back from disk, so it is now the most recently used file
+    assert cache.get("old") == b"1234"
+    cache.put("third", b"1234", "c", "1d", "5m", "s")
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["old.png", "third.png"]
@@ -0,0 +1,69 @@
+from src.util.ForexRates import ForexRates
+import io
+import os
+import pytest
+import requests
+import zipfile
+
+ECB_CSV = (
+    "Date,USD,JPY,CAD,\n"
+    "2021-06-04,1.2166,133.31,1.4696,\n"
+    "2021-06-03,1.2127,133.50,1.4675,\n"
+)
+
+
+class Response:
+    def __init__(self, content):
+        self.content = content
+
+    def raise_for_status(self):
+        pass
+
+
+def ecb_zip() -> bytes:
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr("eurofxref-hist.csv", ECB_CSV)
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def downloads(monkeypatch):
+    calls = []
+
+    def get(url, timeout=None):
+        calls.append(url)
+        return Response(ecb_zip())
+
+    monkeypatch.setattr(requests, "get", get)
+    return calls
+
+
+def offline(url, timeout=None):
+    raise requests.ConnectionError("offline")
+
+
+def test_downloads_once_and_looks_up_latest_rates(tmp_path, downloads):
+    forex = ForexRates("https://ecb/hist.zip", str(tmp_path / "ecb.zip"))
+    assert forex.rate("USD", "USD") == 1.0
+    assert forex.rate("USD", "CAD") == pytest.approx(1.4696 / 1.2166)
+    assert forex.convert(10.0, "CAD", "USD") == pytest.approx(10 * 1.2166 / 1.4696)
+    assert downloads == ["https://ecb/hist.zip"]
+    ForexRates("https://ecb/hist.zip", str(tmp_path / "ecb.zip")).load()
+    assert len(downloads) == 1
+
+
+def test_stale_copy_is_used_offline(tmp_path, downloads, monkeypatch):
+    path = str(tmp_path / "ecb.zip")
+    ForexRates("https://ecb/hist.zip", path).load()
+    os.utime(path, (0, 0))
+    monkeypatch.setattr(requests, "get", offline)
+    forex = ForexRates("https://ecb/hist.zip", path)
+    assert forex.stale()
+    assert forex.rate("CAD", "USD") == pytest.approx(1.2166 / 1.4696)
+
+
+def test_missing_copy_offline_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(requests, "get", offline)
+    with pytest.raises(requests.ConnectionError):
+        ForexRates("https://ecb/hist.zip", str(tmp_path / "ecb.zip")).rate("USD", "CAD")
@@ -0,0 +1,135 @@
+from concurrent.futures import Executor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from src.util import GraphHandler
+from src.util.GraphHandler import plot, plot_fast, process_chart_data, CHART_MAX_BARS
+from src.util.Downsample import lttb, resample_ohlc
+from matplotlib.testing.compare import compare_images
+import asyncio
+import os
+import logging
+import numpy as np
+import matplotlib.pyplot as plt
+import pytest
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline")
+
+
+def test_plot_returns_png(chart):
+    image = plot(chart())
+    assert image.startswith(b"\x89PNG")
+
+
+def test_plot_closes_figures(chart):
+    plot(chart())
+    plot(chart())
+    assert plt.get_fignums() == []
+
+
+def test_process_chart_data_drops_null_bars(chart):
+    data = chart(bars=5)
+    quote = data["result"][0]["indicators"]["quote"][0]
+    quote["close"][2] = None
+    quote["volume"][3] = None
+    symbol, currency, tz, df = process_chart_data(data)
+    assert (symbol, currency, tz) == ("GME", "USD", "EDT")
+    assert len(df) == 4
+    assert df["Volume"].iloc[2] == 0
+    assert str(df.index.tz) == "America/New_York"
+    assert len(data["result"]) == 1
+
+
+def test_process_chart_data_float32(chart):
+    df = process_chart_data(chart(bars=5), dtype=np.float32)[3]
+    assert df["Close"].dtype == np.float32
+
+
+def test_resample_ohlc_aggregates_buckets(chart):
+    df = process_chart_data(chart(bars=10))[3]
+    resampled = resample_ohlc(df, 4)
+    assert len(resampled) == 4
+    first = df.iloc[:3]
+    assert resampled.index[0] == df.index[0]
+    assert resampled["Open"].iloc[0] == first["Open"].iloc[0]
+    assert resampled["Close"].iloc[0] == first["Close"].iloc[-1]
+    assert resampled["High"].iloc[0] == first["High"].max()
+    assert resampled["Low"].iloc[0] == first["Low"].min()
+    assert resampled["Volume"].sum() == df["Volume"].sum()
+    assert resampled["Close"].iloc[-1] == df["Close"].iloc[-1]
+
+
+def test_stored_moving_averages_kept_at_bucket_close(chart):
+    data = chart(bars=10)
+    data["result"][0]["indicators"]["technical"] = [{"sma50": list(range(10))}]
+    df = process_chart_data(data)[3]
+    assert df["SMA50"].tolist() == list(range(10))
+    assert np.isnan(df["SMA100"]).all()
+    assert resample_ohlc(df, 4)["SMA50"].tolist() == [2, 5, 8, 9]
+
+
+def test_lttb_keeps_endpoints_and_extremes():
+    y = np.sin(np.linspace(0, 20, 5000))
+    y[1234] = 10.0
+    kept = lttb(y, 200)
+    assert len(kept) == 200
+    assert kept[0] == 0 and kept[-1] == 4999
+    assert np.all(np.diff(kept) > 0)
+    assert 1234 in kept
+
+
+def test_plot_downsamples_long_ranges(chart, caplog):
+    with caplog.at_level(logging.DEBUG, logger="src.util.GraphHandler"):
+        image = plot(chart(bars=2000), "max", "line")
+    assert image.startswith(b"\x89PNG")
+    assert f"drawing {CHART_MAX_BARS} of 2000 bars" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "name, kwargs, args",
+    [
+        ("fast_candle_1d", {"bars": 78}, ("1d",)),
+        (
+            "fast_line_max",
+            {"bars": 2000, "interval": 7 * 86400, "start": 1000000000},
+            ("max", "line"),
+        ),
+    ],
+)
+def test_plot_fast_matches_baseline(chart, tmp_path, name, kwargs, args):
+    actual = tmp_path / f"{name}.png"
+    actual.write_bytes(plot_fast(chart(**kwargs), *args))
+    expected = os.path.join(BASELINE, f"{name}.png")
+    assert compare_images(expected, str(actual), tol=2) is None
+
+
+def test_plot_fast_reuses_figure_cleanly(chart):
+    first = plot_fast(chart(bars=78), "1d")
+    plot_fast(chart(bars=300), "5d", "line")
+    # mplfinance leaves its style in rcParams, the fast path must ignore it
+    plot(chart(bars=78), "1d")
+    assert plot_fast(chart(bars=78), "1d") == first
+    assert plt.get_fignums() == []
+
+
+def test_render_replaces_broken_pool(chart, monkeypatch):
+    class BrokenPool(Executor):
+        def __init__(self):
+            self.shut_down = False
+
+        def submit(self, fn, *args, **kwargs):
+            raise BrokenProcessPool("worker died")
+
+        def shutdown(self, wait=True, cancel_futures=False):
+            self.shut_down = True
+
+    broken = BrokenPool()
+    monkeypatch.setattr(GraphHandler, "_render_pool", broken)
+    monkeypatch.setattr(
+        GraphHandler,
+        "ProcessPoolExecutor",
+        lambda max_workers, **kwargs: ThreadPoolExecutor(max_workers),
+    )
+    image = asyncio.run(GraphHandler.render(chart(), renderer="fast"))
+    assert image.startswith(b"\x89PNG")
+    assert broken.shut_down
+    assert GraphHandler._render_pool is not broken
+    GraphHandler._render_pool.shutdown()
@@ -0,0 +1,94 @@
+from src.util.Indicators import (
+    sma,
+    ema,
+    vwap,
+    rsi,
+    series_indicators,
+    IndicatorState,
+    INDICATOR_COLUMNS,
+    RollingSMA,
+    RollingEMA,
+    RollingVWAP,
+    RollingRSI,
+)
+import numpy as np
+import pandas as pd
+
+rng = np.random.default_rng(7)
+CLOSES = 100 + rng.standard_normal(500).cumsum()
+VOLUMES = rng.integers(1000, 5000, 500).astype(np.float64)
+
+
+def test_sma_matches_pandas():
+    expected = pd.Series(CLOSES).rolling(50).mean().to_numpy()
+    np.testing.assert_allclose(sma(CLOSES, 50), expected, equal_nan=True)
+    assert np.isnan(sma(CLOSES[:10], 50)).all()
+
+
+def test_ema_seeded_with_sma():
+    result = ema(CLOSES, 20)
+    assert np.isnan(result[:19]).all()
+    assert result[19] == CLOSES[:20].mean()
+    assert np.isclose(
+        result[20], result[19] + 2 / 21 * (CLOSES[20] - result[19]), rtol=1e-12
+    )
+
+
+def test_vwap_is_cumulative():
+    highs, lows = CLOSES + 1, CLOSES - 1
+    result = vwap(highs, lows, CLOSES, VOLUMES)
+    assert np.isclose(result[-1], np.sum(CLOSES * VOLUMES) / VOLUMES.sum())
+
+
+def test_rsi_bounds():
+    result = rsi(CLOSES)
+    assert np.isnan(result[:14]).all()
+    assert ((result[14:] >= 0) & (result[14:] <= 100)).all()
+    assert rsi(np.arange(30.0))[-1] == 100.0
+
+
+def test_ema_matches_recurrence_over_long_series():
+    closes = 100 + rng.standard_normal(20000).cumsum()
+    for span in (1, 2, 14, 200):
+        alpha = 2 / (span + 1)
+        expected = np.full(len(closes), np.nan)
+        current = expected[span - 1] = closes[:span].mean()
+        for i in range(span, len(closes)):
+            current += alpha * (closes[i] - current)
+            expected[i] = current
+        np.testing.assert_allclose(
+            ema(closes, span), expected, rtol=1e-9, equal_nan=True
+        )
+
+
+def test_rolling_matches_batch():
+    highs, lows = CLOSES + 1, CLOSES - 1
+    rolling = {
+        "sma": (RollingSMA(50), sma(CLOSES, 50)),
+        "ema": (RollingEMA(20), ema(CLOSES, 20)),
+        "rsi": (RollingRSI(14), rsi(CLOSES, 14)),
+    }
+    for name, (indicator, expected) in rolling.items():
+        appended = [indicator.append(c) for c in CLOSES]
+        np.testing.assert_allclose(appended, expected, equal_nan=True, err_msg=name)
+    running = RollingVWAP()
+    appended = [running.append(*bar) for bar in zip(highs, lows, CLOSES, VOLUMES)]
+    np.testing.assert_allclose(appended, vwap(highs, lows, CLOSES, VOLUMES))
+
+
+def test_resumed_state_matches_whole_series():
+    closes = list(CLOSES)
+    closes[100] = closes[420] = None
+    expected = series_indicators(closes)
+    assert np.isnan(expected["rsi"][100]) and np.isnan(expected["sma50"][420])
+    split = 400
+    state = IndicatorState(
+        [c for c in closes[:split] if c is not None],
+        expected["rsi_gain"][split - 1],
+        expected["rsi_loss"][split - 1],
+    )
+    appended = np.array([state.append(c) for c in closes[split:]])
+    for i, column in enumerate(INDICATOR_COLUMNS):
+        np.testing.assert_allclose(
+            appended[:, i], expected[column][split:], equal_nan=True, err_msg=column
+        )
@@ -0,0 +1,104 @@
+from src import leaderboard
+from src.util.RankTree import RankTree
+import src.database as db
+import src.positions as positions
+import asyncio
+import random
+import pytest
+
+# quotes the rankings are rescored with; trades go through the database fixture
+QUOTES = {
+    "GME": {"regularMarketPrice": 150.0, "currency": "USD"},
+    "BB": {"regularMarketPrice": 5.0, "currency": "CAD"},
+}
+
+
+def load(user_ids=None):
+    return asyncio.run(db.run_in_session(leaderboard.load_holdings, user_ids=user_ids))
+
+
+def buy(user_id, symbol, amount, price):
+    asyncio.run(
+        positions.buy_position(user_id, f"user{user_id}", symbol, amount, price)
+    )
+
+
+def test_rank_tree_matches_sorted_order():
+    rng = random.Random(7)
+    tree, scores = RankTree(), {}
+    for _ in range(2000):
+        member = rng.randrange(300)
+        if rng.random() < 0.2:
+            tree.remove(member)
+            scores.pop(member, None)
+        else:
+            score = float(rng.randrange(-50, 50))
+            tree.set(member, score)
+            scores[member] = score
+    expected = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    assert len(tree) == len(scores)
+    assert tree.top(10) == expected[:10]
+    assert tree.top(len(scores) + 5) == expected
+    for rank, (member, _) in enumerate(expected, 1):
+        assert tree.rank(member) == rank
+    assert tree.rank(-1) is None
+
+
+def test_rankings_value_in_usd(database):
+    buy("1", "GME", 2, 100.0)
+    buy("2", "GME", 1, 200.0)
+    buy("3", "BB", 10, 4.0)
+    rankings = leaderboard.Rankings()
+    rankings.load(load())
+    assert sorted(rankings.symbols()) == ["BB", "GME"]
+    assert rankings.rescore(QUOTES, rates=(1.0, 0.5)) == 3
+    assert [(u, s) for u, _, s in rankings.top(3)] == [
+        ("1", 50.0),
+        ("3", 25.0),
+        ("2", -25.0),
+    ]
+    assert rankings.rank("2") == (3, -25.0)
+    assert rankings.top(1)[0][1] == "user1"
+    # unchanged prices move nobody
+    assert rankings.rescore(QUOTES, rates=(1.0, 0.5)) == 0
+
+
+def test_rankings_reload_only_changed_users(database):
+    buy("1", "GME", 2, 100.0)
+    buy("2", "GME", 1, 200.0)
+    rankings = leaderboard.Rankings()
+    rankings.load(load())
+    rankings.rescore(QUOTES, rates=(1.0, 1.0))
+    asyncio.run(positions.sell_position("1", "user1", "GME", 2, None))
+    buy("2", "GME", 1, 100.0)
+    rankings.load(load(["1", "2"]), ["1", "2"])
+    assert rankings.rescore(QUOTES, rates=(1.0, 1.0)) == 2
+    assert rankings.rank("1") is None
+    assert rankings.top(5) == [("2", "user2", 0.0)]
+
+
+def test_missing_quote_counts_at_book_value(database):
+    buy("1", "GME", 2, 100.0)
+    rankings = leaderboard.Rankings()
+    rankings.load(load())
+    rankings.rescore({}, rates=(1.0, 1.0))
+    assert rankings.rank("1") == (1, 0.0)
+
+
+def test_missing_quote_keeps_known_currency(database):
+    buy("1", "GME", 2, 100.0)
+    buy("1", "BB", 10, 4.0)
+    rankings = leaderboard.Rankings()
+    rankings.load(load())
+    assert [row[5] for row in load()] == ["USD", "CAD"]
+    # before any quote arrived the ledger's currency is used
+    rankings.rescore({}, rates=(1.0, 0.5))
+    assert rankings.rank("1") == (1, 0.0)
+    rankings.rescore(QUOTES, rates=(1.0, 0.5))
+    score = rankings.rank("1")[1]
+    # GME's quote failing must not book its USD value at the CAD rate
+    rankings.rescore({"BB": QUOTES["BB"]}, rates=(1.0, 0.5))
+    gme_book, bb_book, bb_live = 200.0, 40.0 * 0.5, 50.0 * 0.5
+    expected = (gme_book + bb_live - gme_book - bb_book) / (gme_book + bb_book) * 100
+    assert rankings.rank("1")[1] == pytest.approx(expected)
+    assert score != rankings.rank("1")[1]
@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from financelite import DataRequestException
+from src import asynctasks, marketdata
+from src.util.QuoteBatcher import QuoteBatcher
+from src.util.QuoteCache import QuoteCache
+import asyncio
+import pytest
+
+
+class FakeMessage:
+    def __init__(self):
+        self.id = 1
+        self.embeds = []
+
+    async def edit(self, embed=None):
+        self.embeds.append(embed)
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    prices = {"AAPL": 100.0, "MSFT": 200.0}
+    bad = set()
+
+    def loader(symbols):
+        if bad.intersection(symbols) or not set(symbols) <= set(prices):
+            raise DataRequestException(",".join(symbols))
+        return {
+            s: {"symbol": s, "regularMarketPrice": prices[s], "currency": "USD"}
+            for s in symbols
+        }
+
+    batcher = QuoteBatcher(
+        loader=loader,
+        executor=ThreadPoolExecutor(max_workers=2),
+        window=0.01,
+        isolate_errors=(DataRequestException,),
+    )
+    # every lookup misses, so each refresh goes upstream
+    cache = QuoteCache(fetch=batcher.fetch, ttl_func=lambda: 0.0)
+    monkeypatch.setattr(marketdata, "quote_cache", cache)
+    return prices, bad
+
+
+def test_failed_symbol_keeps_last_value(upstream):
+    prices, bad = upstream
+
+    async def run():
+        ticker = asynctasks.LiveTicker()
+        message = FakeMessage()
+        await ticker.subscribe(message, ["aapl", "msft"])
+        ticker.refresh.cancel()
+        prices["AAPL"] = 101.0
+        bad.add("MSFT")
+        await ticker._refresh()
+        return ticker.boards[message.id], message
+
+    board, message = asyncio.run(run())
+    assert board.values == ((101.0, "USD"), (200.0, "USD"))
+    assert len(message.embeds) == 2
+
+
+def test_refresh_survives_data_request_exception(upstream):
+    async def fail(symbols):
+        raise DataRequestException(",".join(symbols))
+
+    async def run():
+        ticker = asynctasks.LiveTicker()
+        await ticker.subscribe(FakeMessage(), ["AAPL"])
+        ticker.refresh.cancel()
+        ticker._fetch = fail
+        await ticker._refresh()
+        return ticker
+
+    assert len(asyncio.run(run()).boards) == 1
+
+
+def test_subscribe_rejects_invalid_ticker(upstream):
+    async def run():
+        ticker = asynctasks.LiveTicker()
+        await ticker.subscribe(FakeMessage(), ["AAPL", "NOPE"])
+
+    with pytest.raises(DataRequestException):
+        asyncio.run(run())
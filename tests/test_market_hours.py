@@ -0,0 +1,84 @@
+from src.util.MarketHours import (
+    MarketHours,
+    easter,
+    nyse_holidays,
+    tsx_holidays,
+    OPEN,
+    EXTENDED,
+    CLOSED,
+)
+from datetime import date, datetime, time
+from pytz import timezone
+import pytest
+
+est = timezone("America/New_York")
+
+
+def at(*args) -> datetime:
+    return est.localize(datetime(*args))
+
+
+def test_easter():
+    assert [easter(y) for y in (2021, 2024, 2025, 2038)] == [
+        date(2021, 4, 4),
+        date(2024, 3, 31),
+        date(2025, 4, 20),
+        date(2038, 4, 25),
+    ]
+
+
+def test_nyse_holidays():
+    holidays = nyse_holidays(2021)
+    assert holidays[date(2021, 4, 2)] is None  # Good Friday
+    assert holidays[date(2021, 7, 5)] is None  # July 4th on a Sunday
+    assert holidays[date(2021, 12, 24)] is None  # Christmas on a Saturday
+    assert holidays[date(2021, 11, 26)] == time(13, 0)
+    # New Year's Day 2022 is a Saturday and the market stays open on Dec 31
+    assert date(2021, 12, 31) not in holidays
+    assert date(2021, 6, 18) not in holidays  # before Juneteenth was observed
+    assert nyse_holidays(2023)[date(2023, 6, 19)] is None
+
+
+def test_tsx_holidays():
+    holidays = tsx_holidays(2021)
+    assert holidays[date(2021, 5, 24)] is None  # Victoria Day
+    assert holidays[date(2021, 8, 2)] is None  # Civic Holiday
+    assert holidays[date(2021, 10, 11)] is None  # Thanksgiving
+    assert holidays[date(2021, 12, 27)] is None  # Christmas on a Saturday
+    assert holidays[date(2021, 12, 28)] is None  # Boxing Day on a Sunday
+
+
+@pytest.mark.parametrize(
+    "now, session",
+    [
+        (at(2021, 6, 2, 10, 0), OPEN),
+        (at(2021, 6, 2, 5, 0), EXTENDED),
+        (at(2021, 6, 2, 17, 0), EXTENDED),
+        (at(2021, 6, 2, 21, 0), CLOSED),
+        (at(2021, 6, 5, 12, 0), CLOSED),  # Saturday
+        (at(2021, 4, 2, 12, 0), CLOSED),  # Good Friday on both exchanges
+        (at(2021, 11, 26, 14, 0), OPEN),  # NYSE closed early, TSX still open
+        (at(2021, 5, 24, 12, 0), OPEN),  # Victoria Day, NYSE open
+        (at(2021, 10, 11, 3, 0), CLOSED),
+    ],
+)
+def test_session(now, session):
+    assert MarketHours().session(now) == session
+
+
+def test_closed_values_last_until_next_session():
+    hours = MarketHours()
+    saturday = at(2021, 6, 5, 12, 0)
+    # next change is Monday's pre-market at 4:00
+    assert hours.until_change(saturday) == 40 * 3600
+    assert hours.pick(15, 60, 6 * 3600, saturday) == 6 * 3600
+    assert hours.pick(15, 60, 6 * 3600, at(2021, 6, 7, 3, 0)) == 3600
+    assert hours.pick(15, 60, 6 * 3600, at(2021, 6, 7, 3, 59, 59)) == 15
+    assert hours.pick(15, 60, 6 * 3600, at(2021, 6, 7, 10, 0)) == 15
+    assert hours.pick(15, 60, 6 * 3600, at(2021, 6, 7, 18, 0)) == 60
+
+
+def test_nyse_only_early_close():
+    hours = MarketHours(["NYSE"])
+    assert hours.session(at(2021, 11, 26, 14, 0)) == EXTENDED
+    assert hours.session(at(2021, 11, 26, 17, 30)) == CLOSED
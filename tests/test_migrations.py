@@ -0,0 +1,76 @@
+from sqlalchemy import create_engine, inspect, text
+from src import migrations
+from src.database import connect
+import src.database as db
+import pytest
+
+OLD_SCHEMA = [
+    "CREATE TABLE users (id INTEGER PRIMARY KEY, user_id TEXT, username TEXT)",
+    "CREATE TABLE symbols (symbol_id INTEGER PRIMARY KEY, symbol TEXT)",
+    "CREATE TABLE positions (position_id INTEGER PRIMARY KEY, user_id INTEGER, "
+    "symbol_id INTEGER, total_price FLOAT, average_price FLOAT, amount INTEGER)",
+    "INSERT INTO users VALUES (1, '42', 'old name'), (2, '42', 'new name')",
+    "INSERT INTO symbols VALUES (1, 'GME'), (2, 'gme'), (3, 'BB')",
+    "INSERT INTO positions VALUES (1, 1, 1, 100.0, 50.0, 2), (2, 2, 2, 300.0, 150.0, 2), "
+    "(3, 1, 3, 10.0, 10.0, 1), (4, 7, 3, 10.0, 10.0, 1)",
+]
+
+
+def test_upgrade_merges_duplicates_and_adds_indexes(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.execute(text(statement))
+
+    connect(url)
+
+    with engine.connect() as connection:
+        assert migrations.current_version(connection) == migrations.head()
+        users = connection.execute(text("SELECT id FROM users")).all()
+        symbols = connection.execute(text("SELECT symbol FROM symbols")).scalars().all()
+        positions = connection.execute(
+            text(
+                "SELECT user_id, symbol_id, total_price, average_price, amount FROM positions"
+            )
+        ).all()
+    assert users == [(1,)]
+    assert sorted(symbols) == ["BB", "GME"]
+    assert sorted(positions) == [(1, 1, 400.0, 100.0, 4), (1, 3, 10.0, 10.0, 1)]
+    indexes = {i["name"]: i for i in inspect(engine).get_indexes("positions")}
+    assert indexes["ix_positions_user_id_symbol_id"]["unique"]
+
+
+def test_fresh_database_is_stamped(tmp_path):
+    url = f"sqlite:///{tmp_path / 'new.db'}"
+    connect(url)
+    with create_engine(url).connect() as connection:
+        assert migrations.current_version(connection) == migrations.head()
+
+
+def test_upgrade_seeds_trade_ledger(tmp_path):
+    url = f"sqlite:///{tmp_path / 'old.db'}"
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        for statement in OLD_SCHEMA:
+            connection.execute(text(statement))
+
+    connect(url)
+
+    with engine.connect() as connection:
+        trades = connection.execute(
+            text("SELECT user_id, symbol_id, side, amount, price FROM trades")
+        ).all()
+    assert sorted(trades) == [(1, 1, "buy", 4, 100.0), (1, 3, "buy", 1, 10.0)]
+
+
+def test_connect_again_is_a_no_op(tmp_path, monkeypatch):
+    url = f"sqlite:///{tmp_path / 'new.db'}"
+    connect(url)
+    executor, engine = db._executor, db._engine
+    monkeypatch.setattr(migrations, "upgrade", lambda engine: pytest.fail("migrated"))
+    connect(url)
+    assert (db._executor, db._engine) == (executor, engine)
+    monkeypatch.undo()
+    connect(f"sqlite:///{tmp_path / 'other.db'}")
+    assert db._executor is not executor and executor._shutdown
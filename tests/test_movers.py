@@ -0,0 +1,56 @@
+from src import asynctasks, marketdata
+from src.functions import build_movers, MOVERS_ROWS
+import asyncio
+import discord
+import pandas as pd
+
+
+def table(rows: int) -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "Symbol": [f"T{i}" for i in range(rows)],
+            "Name": [f"Company {i}" for i in range(rows)],
+            "Price (Intraday)": [10.0 + i for i in range(rows)],
+            "Change": [1.5 - i for i in range(rows)],
+            "% Change": [3.333 - i for i in range(rows)],
+            "Volume": [1_500_000 * (i + 1) for i in range(rows)],
+        }
+    )
+
+
+def test_build_movers_shows_top_rows():
+    gainers, losers, volume = build_movers(table(25), table(25), table(25))
+    assert len(gainers.fields) == MOVERS_ROWS
+    assert gainers.fields[0].value.startswith("> Ticker: T0\n")
+    assert "> Change: +1.5\n" in gainers.fields[0].value
+    assert "> Change: -0.5\n" in gainers.fields[2].value
+    assert "> Volume: 1.5M" in volume.fields[0].value
+    assert "Volume" not in losers.fields[0].value
+
+
+def test_build_movers_with_short_tables():
+    gainers, losers, volume = build_movers(table(3), table(0), table(6))
+    assert (len(gainers.fields), len(losers.fields), len(volume.fields)) == (3, 0, 6)
+
+
+def test_snapshot_shares_one_scrape(monkeypatch):
+    calls = []
+
+    async def get_movers():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return tuple(discord.Embed(title=t) for t in ("g", "l", "v"))
+
+    monkeypatch.setattr(marketdata, "get_movers", get_movers)
+
+    async def run():
+        snapshot = asynctasks.MoversSnapshot()
+        first, second = await asyncio.gather(snapshot.get(), snapshot.get())
+        snapshot.refresh.cancel()
+        return snapshot, first, second
+
+    snapshot, first, second = asyncio.run(run())
+    assert len(calls) == 1
+    assert first is second
+    assert first[0].footer.text.startswith("Data as of ")
+    assert snapshot.as_of is not None
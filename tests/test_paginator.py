@@ -0,0 +1,115 @@
+from src.util.Paginator import CLOSE, NEXT, LAST, PREVIOUS, Paginator
+from src.util.TimerWheel import TimerWheel
+import asyncio
+
+
+class FakeChannel:
+    def __init__(self, channel_id):
+        self.id = channel_id
+
+
+class FakeMessage:
+    def __init__(self, message_id, channel_id=1):
+        self.id = message_id
+        self.channel = FakeChannel(channel_id)
+        self.content = None
+        self.edits = 0
+        self.reactions = []
+        self.removed = []
+
+    async def add_reaction(self, emoji):
+        self.reactions.append(emoji)
+
+    async def edit(self, content):
+        self.edits += 1
+        self.content = content
+
+    async def remove_reaction(self, emoji, user):
+        self.removed.append((emoji, user.id))
+
+    async def clear_reactions(self):
+        self.reactions = []
+
+
+class FakeReaction:
+    def __init__(self, message, emoji):
+        self.message = message
+        self.emoji = emoji
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+
+def test_sessions_turn_pages_independently():
+    async def scenario():
+        paginator = Paginator(timeout=30.0)
+        first, second = FakeMessage(1), FakeMessage(2, channel_id=2)
+        await paginator.start(first, 7, 3, lambda i: f"first {i}")
+        await paginator.start(second, 8, 2, lambda i: f"second {i}")
+        await paginator.on_reaction_add(FakeReaction(first, NEXT), FakeUser(7))
+        await paginator.on_reaction_add(FakeReaction(second, LAST), FakeUser(8))
+        # other users can't turn someone else's pages
+        await paginator.on_reaction_add(FakeReaction(first, LAST), FakeUser(8))
+        await paginator.flush()
+        await paginator.on_reaction_add(FakeReaction(second, PREVIOUS), FakeUser(8))
+        await paginator.on_reaction_add(FakeReaction(first, CLOSE), FakeUser(7))
+        await paginator.flush()
+        paginator.expire.cancel()
+        return paginator, first, second
+
+    paginator, first, second = asyncio.run(scenario())
+    assert first.content == "first 1" and first.reactions == []
+    assert second.content == "second 0"
+    assert second.removed == [("⏭", 8), ("◀", 8)]
+    assert list(paginator.sessions) == [2]
+
+
+def test_queued_page_turns_collapse_into_one_edit():
+    async def scenario():
+        paginator = Paginator()
+        message = FakeMessage(1)
+        await paginator.start(message, 7, 10, lambda i: f"page {i}")
+        for _ in range(4):
+            await paginator.on_reaction_add(FakeReaction(message, NEXT), FakeUser(7))
+        await paginator.flush()
+        paginator.expire.cancel()
+        return message
+
+    message = asyncio.run(scenario())
+    assert message.edits == 1 and message.content == "page 4"
+    assert message.removed == [("▶", 7)]
+
+
+def test_idle_sessions_expire():
+    async def scenario():
+        paginator = Paginator(timeout=0.0, resolution=0.01)
+        message = FakeMessage(1)
+        await paginator.start(message, 7, 2, str)
+        paginator.expire.cancel()
+        await asyncio.sleep(0.03)
+        await paginator._expire()
+        await paginator.flush()
+        return paginator, message
+
+    paginator, message = asyncio.run(scenario())
+    assert paginator.sessions == {} and message.reactions == []
+
+
+def test_timer_wheel_fires_each_timer_once_on_time():
+    wheel = TimerWheel(now=0.0, resolution=1.0, slots=8)
+    wheel.schedule("a", 2.5)
+    wheel.schedule("b", 9.0)
+    wheel.schedule("c", 3.0)
+    wheel.schedule("a", 4.0)
+    wheel.cancel("c")
+    assert wheel.advance(3.9) == []
+    assert wheel.advance(4.0) == ["a"]
+    # b shares a's slot one turn later
+    assert wheel.advance(8.99) == []
+    assert wheel.advance(100.0) == ["b"]
+    assert len(wheel) == 0
+    wheel.schedule("late", 50.0)
+    assert wheel.advance(100.5) == []
+    assert wheel.advance(101.0) == ["late"]
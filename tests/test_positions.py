@@ -0,0 +1,113 @@
+from src import ledger
+import src.database as db
+import src.positions as positions
+import asyncio
+import pytest
+
+pytestmark = pytest.mark.usefixtures("database")
+
+
+@pytest.fixture(autouse=True)
+def same_currency(monkeypatch):
+    monkeypatch.setattr(
+        positions.CurrencyWallet, "_forex", lambda self, init, final, value: value
+    )
+
+
+def test_buy_and_portfolio():
+    asyncio.run(positions.buy_position("1", "tester", "GME", 2, 50.0))
+    asyncio.run(positions.buy_position("1", "tester", "GME", 2, None))
+    asyncio.run(positions.buy_position("1", "tester", "BB", 10, None))
+    table, summary = asyncio.run(positions.get_portfolio("1", "tester", mobile=False))
+    assert len(table) == 1
+    assert "+GME" in table[0] and "x 4" in table[0] and "75.00" in table[0]
+    assert "Total in USD" in summary
+    assert db.symbol_cache.get_symbol(db.symbol_cache.get_id("BB")) == "BB"
+
+
+def test_sell_position():
+    asyncio.run(positions.buy_position("1", "tester", "GME", 4, 50.0))
+    asyncio.run(positions.sell_position("1", "tester", "GME", 1, None))
+    with pytest.raises(positions.NotEnoughPositionsToSell):
+        asyncio.run(positions.sell_position("1", "tester", "GME", 5, None))
+    asyncio.run(positions.sell_position("1", "tester", "GME", 3, None))
+    with pytest.raises(positions.NoPositionsException):
+        asyncio.run(positions.get_portfolio("1", "tester", mobile=False))
+
+
+def test_sell_keeps_average_cost():
+    asyncio.run(positions.buy_position("1", "tester", "GME", 4, 50.0))
+    asyncio.run(positions.sell_position("1", "tester", "GME", 1, 100.0))
+    pos_dict = asyncio.run(db.run_in_session(positions.load_positions, user_id="1"))
+    assert pos_dict["GME"] == dict(book_value=150.0, average=50.0, amount=3)
+
+
+def test_concurrent_buys_are_not_lost():
+    async def buy_many():
+        await asyncio.gather(
+            *(positions.buy_position("1", "tester", "GME", 1, 10.0) for _ in range(20))
+        )
+
+    asyncio.run(buy_many())
+    pos_dict = asyncio.run(db.run_in_session(positions.load_positions, user_id="1"))
+    assert pos_dict["GME"]["amount"] == 20
+    assert pos_dict["GME"]["book_value"] == 200.0
+
+
+def test_rebuild_positions_from_ledger():
+    asyncio.run(positions.buy_position("1", "tester", "GME", 4, 50.0))
+    asyncio.run(positions.buy_position("1", "tester", "GME", 2, 80.0))
+    asyncio.run(positions.sell_position("1", "tester", "GME", 3, 120.0))
+    asyncio.run(positions.buy_position("2", "other", "BB", 5, None))
+    asyncio.run(positions.sell_position("2", "other", "BB", 5, None))
+    before = asyncio.run(db.run_in_session(positions.load_positions, user_id="1"))
+    assert asyncio.run(db.run_in_session(ledger.rebuild_positions, batch_size=2)) == 1
+    after = asyncio.run(db.run_in_session(positions.load_positions, user_id="1"))
+    assert after == before == {"GME": dict(book_value=180.0, average=60.0, amount=3)}
+
+
+def test_portfolio_pages_render_on_demand(monkeypatch):
+    rendered = []
+    tabulate = positions.tabulate
+
+    def counting_tabulate(rows, **kwargs):
+        rendered.append([row[0] for row in rows])
+        return tabulate(rows, **kwargs)
+
+    monkeypatch.setattr(positions, "tabulate", counting_tabulate)
+    symbols = [f"S{i:02}" for i in range(25)]
+    pages = positions.PortfolioPages(
+        positions.valuation.Valuation(
+            symbols, [1] * 25, [10.0] * 25, [10.0] * 25, [11.0] * 25, [0] * 25
+        ),
+        cache_size=2,
+    )
+    assert len(pages) == 3 and rendered == []
+    assert "+S20" in pages[-1] and "+S19" not in pages[-1]
+    assert pages[0] is pages[0]
+    pages[1]
+    # only two pages are kept, so the last page was dropped and is drawn again
+    pages[2]
+    assert [rows[0] for rows in rendered] == ["+S20", "+S00", "+S10", "+S20"]
+    with pytest.raises(IndexError):
+        pages[3]
+
+
+def test_rolled_back_trade_leaves_symbol_cache_empty(monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError("ledger down")
+
+    monkeypatch.setattr(ledger, "record_trade", fail)
+    with pytest.raises(RuntimeError):
+        asyncio.run(positions.buy_position("1", "tester", "GME", 1, 10.0))
+    assert db.symbol_cache.get_id("GME") is None
+
+
+def test_sell_never_creates_symbols_or_users():
+    def count(session):
+        return session.query(db.Symbols).count(), session.query(db.Users).count()
+
+    with pytest.raises(positions.NotEnoughPositionsToSell):
+        asyncio.run(positions.sell_position("1", "tester", "GME", 1, None))
+    assert asyncio.run(db.run_in_session(count)) == (0, 0)
+    assert db.symbol_cache.get_id("GME") is None
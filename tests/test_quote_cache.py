@@ -0,0 +1,223 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from financelite import DataRequestException
+from src.util.QuoteBatcher import QuoteBatcher
+from src.util.QuoteCache import QuoteCache
+import threading
+import pytest
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(loader, max_size=10, ttl=15.0):
+    clock = FakeClock()
+    cache = QuoteCache(
+        fetch=partial(ThreadPoolExecutor(max_workers=2).submit, loader),
+        ttl_func=lambda: ttl,
+        max_size=max_size,
+        clock=clock,
+    )
+    return cache, clock
+
+
+def test_quote_cache_hit_miss():
+    calls = []
+
+    def loader(symbols):
+        calls.append(symbols)
+        return {s: {"symbol": s, "regularMarketPrice": 1.0} for s in symbols}
+
+    cache, clock = make_cache(loader)
+    assert cache.get_one("gme").result()["symbol"] == "GME"
+    assert cache.get_one("GME").result()["symbol"] == "GME"
+    assert calls == [["GME"]]
+    assert cache.hits == 1 and cache.misses == 1
+    clock.now = 20.0
+    cache.get_one("gme").result()
+    assert len(calls) == 2
+
+
+def test_quote_cache_lru_eviction():
+    cache, _ = make_cache(lambda symbols: {s: {} for s in symbols}, max_size=2)
+    for symbol in ["a", "b", "a", "c"]:
+        cache.get_one(symbol).result()
+    assert cache.evictions == 1
+    assert cache.stats()["size"] == 2
+    cache.get_one("a").result()
+    assert cache.hits == 2
+
+
+def test_quote_cache_coalescing():
+    release = threading.Event()
+    calls = []
+
+    def loader(symbols):
+        calls.append(symbols)
+        release.wait(5)
+        return {s: {} for s in symbols}
+
+    cache, _ = make_cache(loader)
+    first = cache.get(["gme", "bb"])
+    second = cache.get(["bb", "gme"])
+    release.set()
+    assert first["GME"].result(5) is second["GME"].result(5)
+    assert calls == [["GME", "BB"]]
+    assert cache.coalesced == 2
+
+
+def test_quote_cache_error_propagates():
+    def loader(symbols):
+        raise ValueError("upstream")
+
+    cache, _ = make_cache(loader)
+    with pytest.raises(ValueError):
+        cache.get_one("gme").result(5)
+    assert cache.stats()["in_flight"] == 0
+
+
+def test_quote_batcher_merges_requests():
+    calls = []
+
+    def loader(symbols):
+        calls.append(sorted(symbols))
+        return {s: {"symbol": s} for s in symbols}
+
+    batcher = QuoteBatcher(
+        loader=loader, executor=ThreadPoolExecutor(max_workers=2), window=0.05
+    )
+    first = batcher.fetch(["GME"])
+    second = batcher.fetch(["BB", "GME"])
+    assert first.result(5) == {"GME": {"symbol": "GME"}}
+    assert set(second.result(5)) == {"BB", "GME"}
+    assert calls == [["BB", "GME"]]
+
+
+def test_quote_batcher_isolates_bad_symbol():
+    def loader(symbols):
+        if "BAD" in symbols:
+            raise LookupError("BAD")
+        return {s: {} for s in symbols}
+
+    batcher = QuoteBatcher(
+        loader=loader, executor=ThreadPoolExecutor(max_workers=2), window=0.05
+    )
+    good = batcher.fetch(["GME"])
+    bad = batcher.fetch(["BAD"])
+    assert good.result(5) == {"GME": {}}
+    with pytest.raises(LookupError):
+        bad.result(5)
+
+
+def test_data_request_exception_settles_every_waiter():
+    def loader(symbols):
+        if "BAD" in symbols:
+            raise DataRequestException("BAD")
+        return {s: {"symbol": s} for s in symbols}
+
+    batcher = QuoteBatcher(
+        loader=loader,
+        executor=ThreadPoolExecutor(max_workers=2),
+        window=0.05,
+        isolate_errors=(DataRequestException,),
+    )
+    good = batcher.fetch(["AAPL"])
+    bad = batcher.fetch(["BAD"])
+    assert good.result(5) == {"AAPL": {"symbol": "AAPL"}}
+    with pytest.raises(DataRequestException):
+        bad.result(5)
+
+    cache = QuoteCache(fetch=batcher.fetch, ttl_func=lambda: 15.0)
+    futures = cache.get(["AAPL", "BAD"])
+    for future in futures.values():
+        with pytest.raises(DataRequestException):
+            future.result(5)
+    # nothing is left in flight, so later lookups fetch again instead of hanging
+    assert cache.stats()["in_flight"] == 0
+    assert cache.get_one("AAPL").result(5) == {"symbol": "AAPL"}
+
+    unisolated = QuoteBatcher(
+        loader=loader, executor=ThreadPoolExecutor(max_workers=2), window=0.05
+    )
+    with pytest.raises(DataRequestException):
+        unisolated.fetch(["AAPL", "BAD"]).result(5)
+
+
+def test_quote_batcher_fails_unmatched_symbols_individually():
+    def loader(symbols):
+        # upstream dropped BAD from its answer
+        return {s: {"symbol": s} for s in symbols if s != "BAD"}
+
+    batcher = QuoteBatcher(
+        loader=loader,
+        executor=ThreadPoolExecutor(max_workers=2),
+        window=0.05,
+        missing_error=DataRequestException,
+    )
+    good = batcher.fetch(["AAPL"])
+    bad = batcher.fetch(["BAD"])
+    assert good.result(5) == {"AAPL": {"symbol": "AAPL"}}
+    with pytest.raises(DataRequestException):
+        bad.result(5)
+
+
+def test_quote_batcher_bisects_failed_batch():
+    calls = []
+
+    def loader(symbols):
+        calls.append(symbols)
+        if "BAD" in symbols:
+            raise DataRequestException("BAD")
+        return {s: {"symbol": s} for s in symbols}
+
+    symbols = [f"S{i:03}" for i in range(99)] + ["BAD"]
+    batcher = QuoteBatcher(
+        loader=loader,
+        executor=ThreadPoolExecutor(max_workers=2),
+        window=0.05,
+        isolate_errors=(DataRequestException,),
+    )
+    futures = [batcher.fetch([s]) for s in symbols]
+    for future in futures[:-1]:
+        future.result(5)
+    with pytest.raises(DataRequestException):
+        futures[-1].result(5)
+    # the failed batch, then two halves per level down to the bad symbol
+    assert len(calls) == 1 + 2 * 7
+
+
+def test_quote_cache_remembers_failed_symbol():
+    calls = []
+
+    def loader(symbols):
+        calls.append(symbols)
+        bad = [s for s in symbols if s.startswith("BAD")]
+        if bad:
+            raise DataRequestException(bad[0])
+        return {s: {"symbol": s} for s in symbols}
+
+    clock = FakeClock()
+    cache = QuoteCache(
+        fetch=partial(ThreadPoolExecutor(max_workers=2).submit, loader),
+        ttl_func=lambda: 15.0,
+        clock=clock,
+        cache_errors=(DataRequestException,),
+        error_ttl=60.0,
+    )
+    for _ in range(3):
+        with pytest.raises(DataRequestException):
+            cache.get_one("BAD").result(5)
+    assert calls == [["BAD"]]
+    # a batch failing for another symbol's sake is not remembered
+    with pytest.raises(DataRequestException):
+        cache.get(["AAPL", "BAD2"])["AAPL"].result(5)
+    assert cache.get_one("AAPL").result(5) == {"symbol": "AAPL"}
+    clock.now = 61.0
+    with pytest.raises(DataRequestException):
+        cache.get_one("BAD").result(5)
+    assert calls[-1] == ["BAD"] and len(calls) == 4
@@ -0,0 +1,64 @@
+from src.util import GraphHandler
+from src.util.GraphHandler import load_series, plot_fast
+from src.util.SeriesMap import SeriesMap
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def series_map(tmp_path, monkeypatch):
+    series_map = SeriesMap(str(tmp_path))
+    monkeypatch.setattr(GraphHandler, "series_map", series_map)
+    return series_map
+
+
+def daily(chart, bars, start=1622640600):
+    data = chart(bars=bars, interval=86400, start=start)
+    data["result"][0]["meta"]["dataGranularity"] = "1d"
+    return data
+
+
+def test_published_series_reads_back_as_views(chart, series_map):
+    data = daily(chart, 50)
+    ref = GraphHandler.publish(data)
+    symbol, currency, tz, df = load_series(ref)
+    expected = GraphHandler.process_chart_data(data)[3]
+    assert (symbol, currency, tz) == ("GME", "USD", "EDT")
+    assert df.equals(expected)
+    mapped = series_map.read(ref.path)[1]["Close"]
+    assert np.shares_memory(df["Close"].to_numpy(), mapped)
+    assert not mapped.flags.writeable
+
+
+def test_publish_appends_and_replaces_forming_bar(chart, series_map):
+    GraphHandler.publish(daily(chart, 50))
+    tail = daily(chart, 5, start=1622640600 + 48 * 86400)
+    tail["result"][0]["indicators"]["quote"][0]["close"][0] = 1.0
+    ref = GraphHandler.publish(tail)
+    meta, columns = series_map.read(ref.path)
+    assert len(columns["Timestamp"]) == 53
+    assert np.all(np.diff(columns["Timestamp"]) > 0)
+    assert columns["Close"][48] == 1.0
+    # the reference only covers the bars the tail chart held
+    assert len(series_map.slice(ref)[1]["Close"]) == 5
+
+
+def test_replaced_file_leaves_open_maps_intact(chart, series_map):
+    ref = GraphHandler.publish(daily(chart, 50))
+    before = series_map.slice(ref)[1]["Close"].copy()
+    old = series_map.read(ref.path)[1]["Close"]
+    replacement = daily(chart, 50)
+    replacement["result"][0]["indicators"]["quote"][0]["close"] = [1.0] * 50
+    GraphHandler.publish(replacement)
+    assert np.array_equal(old, before)
+    assert np.all(series_map.slice(ref)[1]["Close"] == 1.0)
+
+
+def test_renderers_accept_published_series(chart, series_map):
+    data = daily(chart, 300)
+    assert plot_fast(GraphHandler.publish(data), "1y") == plot_fast(data, "1y")
+
+
+def test_charts_without_granularity_are_not_published(chart, series_map):
+    data = chart(bars=5)
+    assert GraphHandler.publish(data) is data
@@ -0,0 +1,173 @@
+from src import marketdata
+from src.util.Indicators import series_indicators
+from src.util.SeriesStore import SeriesStore, TECHNICAL
+import numpy as np
+import pytest
+import time
+
+DAY = 86400
+FIRST = 1262304000  # 2010-01-01
+
+
+class Upstream:
+    """
+    stands in for Yahoo: one daily bar per day from FIRST up to `now`
+    """
+
+    def __init__(self, now: float):
+        self.now = now
+        self.scale = 1.0
+        self.requests = []
+
+    def bars(self):
+        return list(range(FIRST, int(self.now), DAY))
+
+    def chart(self, timestamps):
+        # a weekly dip so the RSI sees losses too
+        closes = [
+            self.scale * (100 + (ts - FIRST) / DAY - (ts - FIRST) // DAY % 7)
+            for ts in timestamps
+        ]
+        # the newest bar is still forming
+        if timestamps and timestamps[-1] + DAY > self.now:
+            closes[-1] += (self.now - timestamps[-1]) / DAY
+        return {
+            "result": [
+                {
+                    "meta": {"symbol": "GME", "currency": "USD"},
+                    "timestamp": timestamps,
+                    "indicators": {
+                        "quote": [
+                            {
+                                "open": closes,
+                                "high": closes,
+                                "low": closes,
+                                "close": closes,
+                                "volume": [100] * len(closes),
+                            }
+                        ]
+                    },
+                }
+            ],
+            "error": None,
+        }
+
+    def stock(self, ticker):
+        upstream = self
+
+        class Stock:
+            def get_chart(self, interval, range):
+                upstream.requests.append(range)
+                start, bars = marketdata.range_start(range, upstream.now)
+                timestamps = [ts for ts in upstream.bars() if ts >= start]
+                return upstream.chart(timestamps[-bars:] if bars else timestamps)
+
+        return Stock()
+
+
+@pytest.fixture
+def upstream(tmp_path, monkeypatch):
+    upstream = Upstream(now=FIRST + 3000 * DAY + 3600)
+    monkeypatch.setattr(marketdata, "Stock", upstream.stock)
+    monkeypatch.setattr(
+        marketdata, "series_store", SeriesStore(str(tmp_path / "series.sqlite3"))
+    )
+    return upstream
+
+
+def closes(chart):
+    return chart["result"][0]["indicators"]["quote"][0]["close"]
+
+
+def technical(chart):
+    return chart["result"][0]["indicators"]["technical"][0]
+
+
+def assert_indicators_match_full_series(store):
+    stored = store.read("GME", "1d")
+    expected = series_indicators(closes(stored))
+    for column in TECHNICAL:
+        np.testing.assert_allclose(
+            np.array(technical(stored)[column], dtype=np.float64),
+            expected[column],
+            equal_nan=True,
+            err_msg=column,
+        )
+
+
+def test_covered_range_only_fetches_tail(upstream):
+    first = marketdata.load_chart("gme", "1d", "5y", now=upstream.now)
+    upstream.now += 2 * DAY
+    chart = marketdata.load_chart("GME", "1d", "5y", now=upstream.now)
+    assert upstream.requests == ["5y", "5d"]
+    expected = upstream.stock("GME").get_chart("1d", "5y")
+    assert chart["result"][0]["timestamp"] == expected["result"][0]["timestamp"]
+    assert closes(chart) == closes(expected)
+    assert chart["result"][0]["timestamp"][-1] == upstream.bars()[-1]
+    assert first["result"][0]["timestamp"][-1] == upstream.bars()[-3]
+
+
+def test_shorter_range_and_refresh_window_served_locally(upstream):
+    marketdata.load_chart("GME", "1d", "5y", now=upstream.now)
+    chart = marketdata.load_chart("GME", "1d", "1y", now=upstream.now + 1)
+    assert upstream.requests == ["5y"]
+    start, _ = marketdata.range_start("1y", upstream.now + 1)
+    assert chart["result"][0]["timestamp"][0] >= start
+    assert chart["result"][0]["meta"]["currency"] == "USD"
+
+
+def test_longer_range_fetches_everything(upstream):
+    marketdata.load_chart("GME", "1d", "1y", now=upstream.now)
+    chart = marketdata.load_chart("GME", "1d", "max", now=upstream.now + 1)
+    assert upstream.requests == ["1y", "max"]
+    assert chart["result"][0]["timestamp"][0] == FIRST
+
+
+def test_adjusted_history_is_refetched(upstream):
+    marketdata.load_chart("GME", "1d", "2y", now=upstream.now)
+    upstream.now += 3 * DAY
+    upstream.scale = 0.5
+    chart = marketdata.load_chart("GME", "1d", "2y", now=upstream.now)
+    assert upstream.requests == ["2y", "5d", "2y"]
+    assert closes(chart) == closes(upstream.stock("GME").get_chart("1d", "2y"))
+
+
+def test_trading_day_count(upstream, tmp_path):
+    upstream.now = time.time()
+    hist = marketdata.load_hist("GME", "13d")
+    assert len(hist["hist"]) == 13
+    assert upstream.requests == ["1mo"]
+    # a restarted bot reads the same file
+    marketdata.series_store = SeriesStore(str(tmp_path / "series.sqlite3"))
+    assert marketdata.series_store.coverage("GME", "1d") is not None
+
+
+def test_tail_advances_stored_indicators(upstream):
+    first = marketdata.load_chart("GME", "1d", "5y", now=upstream.now)
+    assert technical(first)["sma200"][-1] is not None
+    upstream.now += 3 * DAY
+    chart = marketdata.load_chart("GME", "1d", "5y", now=upstream.now)
+    assert upstream.requests == ["5y", "5d"]
+    assert len(technical(chart)["rsi"]) == len(closes(chart))
+    assert_indicators_match_full_series(marketdata.series_store)
+    # series stored before indicators were are computed in full once
+    store = marketdata.series_store
+    with store._connect() as connection:
+        connection.execute("DELETE FROM indicators")
+    upstream.now += 2 * DAY
+    marketdata.load_chart("GME", "1d", "5y", now=upstream.now)
+    assert_indicators_match_full_series(store)
+
+
+def test_hist_reads_stored_rsi(upstream):
+    upstream.now = time.time()
+    hist = marketdata.load_hist("GME", "13d")
+    stored = technical(marketdata.series_store.read("GME", "1d"))["rsi"]
+    assert hist["rsi"] == stored[-1] is not None
+
+
+def test_hist_without_bars_is_invalid(upstream):
+    # the symbol has no bars at all yet
+    upstream.now = FIRST - DAY
+    with pytest.raises(marketdata.DataRequestException):
+        marketdata.load_hist("GME", "5y")
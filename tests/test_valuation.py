@@ -0,0 +1,40 @@
+from src import valuation
+from src.positions import calculate_pl
+import numpy as np
+
+POSITIONS = {
+    "GME": {"amount": 4, "book_value": 400.0, "average": 100.0},
+    "BB": {"amount": 10, "book_value": 120.0, "average": 12.0},
+    "AC.TO": {"amount": 3, "book_value": 60.0, "average": 20.0},
+}
+QUOTES = [
+    {"symbol": "GME", "regularMarketPrice": 150.0, "currency": "USD"},
+    {"symbol": "BB", "regularMarketPrice": 9.0, "currency": "USD"},
+    {"symbol": "AC.TO", "regularMarketPrice": 20.0, "currency": "CAD"},
+]
+
+
+def test_matches_scalar_pl():
+    positions = valuation.value_positions(POSITIONS, QUOTES)
+    assert positions.symbols == ["GME", "BB", "AC.TO"]
+    for i, quote in enumerate(QUOTES):
+        held = POSITIONS[quote["symbol"]]
+        live_total = quote["regularMarketPrice"] * held["amount"]
+        pl, pl_percent = calculate_pl(live_total, held["book_value"])
+        assert positions.live_total[i] == live_total
+        assert np.isclose(positions.pl[i], pl)
+        assert np.isclose(positions.pl_percent[i], pl_percent)
+
+
+def test_aggregates_per_currency():
+    book_value, live = valuation.value_positions(POSITIONS, QUOTES).by_currency()
+    assert book_value.tolist() == [520.0, 60.0]
+    assert live.tolist() == [690.0, 60.0]
+
+
+def test_empty_and_zero_book_value():
+    empty = valuation.Valuation([], [], [], [], [], [])
+    assert len(empty) == 0
+    assert [a.tolist() for a in empty.by_currency()] == [[0.0, 0.0], [0.0, 0.0]]
+    free = valuation.Valuation(["GME"], [1], [0.0], [0.0], [5.0], [0])
+    assert free.pl_percent.tolist() == [0.0]